@@ -0,0 +1,555 @@
+"""
+ODD 流程基准套件：分别测量每个步骤，并在本地假 LLM 服务上端到端运行
+
+测量项 (结果键):
+  match_artifact_type/<N>      合成标准库 N 个产出物，需求命中最后一个
+  match_ngram/<N>              同上，ngram 匹配器 (需要 numpy)
+  match_many/<matcher>/<N>     批量匹配 1000 条需求 (ngram 为一次矩阵乘法)，附带 top-1 命中率
+  generate_contract/<N>
+  build_user_prompt            内置标准库的契约 (需要 openai SDK)
+  verify/<mode>/<size>         substring / ast 两种模式，代码语料 1KB ~ 1MB (ast 每次重新解析)
+  verify_tree/<serial|parallel|incremental>
+                               FileVerifier 验证 VERIFY_TREE_FILES 个 VERIFY_TREE_FILE_SIZE 的文件：单进程 / 多进程 /
+                               缓存已预热的增量模式
+  seal/<backend>/<size>        json / sqlite 封存后端
+  seal_concurrent/<backend>/<direct|writer>
+                               16 个线程并发封存 256 条 1KB 记录：各自直接写入 / 经 SealWriter 按组提交
+  end_to_end/offline           契约 → 固定代码 → 验证 → 封存，不经过 LLM
+  end_to_end/offline_traced    同上，开启追踪 (与 offline 对比即追踪开销)
+  end_to_end/generate          run_odd_demo 经 OPENAI_BASE_URL 指向假服务 (需要 openai、rich)
+  end_to_end/stream            同上，流式生成
+  resilience/<no_hedge|hedge>  假服务 3% 的请求额外延迟 500ms，逐个调用 generate_code，对比关闭/开启对冲的
+                               延迟分位数 (含 p99) 与对冲次数 (需要 openai)
+  resilience/retry             假服务 20% 的请求返回 503，报告重试次数与成功率
+  regenerate/<full|patch>      封存一份违反「禁止明文存储密码」的代码 (约 6KB) 后，假服务按 --tokens-per-s
+                               (默认 REGEN_TOKENS_PER_S) 限速输出：完整重新生成 vs 只请求补丁并增量验证，均含封存 (需要 openai)
+  composite/<sequential|decompose>
+                               「登录 + 增删改查」需求，假服务首 token 延迟默认 COMPOSITE_LATENCY_MS：两个产出物依次
+                               各跑一遍 run_odd_demo vs --decompose 并发生成、分别封存并写组合封存 (需要 openai、rich)
+
+结果以 JSON 输出；--baseline 与保存的基线逐项比较，中位数变慢超过 --tolerance 即判为回归并以退出码 1 结束。
+
+用法:
+  python benchmarks/bench_pipeline.py --output bench.json
+  python benchmarks/bench_pipeline.py --save-baseline benchmarks/.data/baseline.json
+  python benchmarks/bench_pipeline.py --baseline benchmarks/.data/baseline.json --tolerance 0.2
+  python benchmarks/bench_pipeline.py --quick --only verify,seal
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_llm import DEFAULT_CODE, FakeLLMServer
+from benchmarks.synthetic import build_code, cached_library, format_size, matching_requirement, parse_size
+from odd.contract_generator import ContractGenerator
+from odd.contract_verifier import ContractVerifier
+from odd.file_verifier import FileVerifier
+from odd.seal_manager import SealManager
+from odd.seal_store import JsonSealBackend, SQLiteSealBackend
+from odd.seal_writer import SealWriter
+from odd.telemetry import Tracer
+from odd import ast_verifier
+
+DATA_DIR = Path(__file__).parent / ".data"
+RESULTS_VERSION = 1
+
+DEFAULT_LIBRARIES = "10,1000,10000"
+DEFAULT_SIZES = "1k,10k,100k,1m"
+QUICK_LIBRARIES = "10,1000"
+QUICK_SIZES = "1k,10k,100k"
+MATCH_BATCH = 1000
+
+RESILIENCE_CALLS = 200
+RESILIENCE_WARMUP = 30
+RESILIENCE_LATENCY_MS = 20.0
+RESILIENCE_SLOW_MS = 500.0
+
+# 补丁模式的收益主要来自输出 token 减少，基准中假服务限速输出；原代码在登录 API 之外另有 40 个路由，
+# 修复只改动其中 3 行
+REGEN_TOKENS_PER_S = 4000.0
+
+# composite 基准：组合需求及其按产出物拆开的单项需求；未指定 --llm-latency-ms 时假服务的首 token 延迟
+COMPOSITE_LATENCY_MS = 200.0
+
+# verify_tree 基准的目录规模
+VERIFY_TREE_FILES = 200
+VERIFY_TREE_FILE_SIZE = "64k"
+COMPOSITE_REQUIREMENT = "创建用户登录API，并提供用户的增删改查接口"
+COMPOSITE_SPLIT = ("创建用户登录API", "提供用户的增删改查接口")
+REGEN_PARENT_CODE = DEFAULT_CODE.replace("\n\nif __name__", "".join(
+    f"\n\n@app.route('/api/items/{i}', methods=['GET'])\ndef get_item_{i}():\n"
+    f"    return jsonify({{\"id\": {i}, \"name\": \"item-{i}\"}}), 200\n" for i in range(40)) + "\n\nif __name__")
+REGEN_FIXED_CODE = (REGEN_PARENT_CODE.replace("password = data.get('password')", "raw_pw = data.get('password')")
+                    .replace("not password", "not raw_pw").replace("password.encode()", "raw_pw.encode()"))
+
+
+def measure(fn, repeat: int, setup=None, min_sample_s: float = 0.002) -> dict:
+    """取 repeat 个样本的统计 (毫秒/次)；单次很快的操作在一个样本内循环多次以超过计时精度"""
+    if setup:
+        setup()
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter() - start
+    number = 1 if setup or once >= min_sample_s else max(1, math.ceil(min_sample_s / max(once, 1e-9)))
+
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 6),
+        "p95_ms": round(samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)], 6),
+        "min_ms": round(samples[0], 6),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def _throughput(stats: dict, size: int) -> dict:
+    stats["mb_per_s"] = round(size / 1024 / 1024 / (stats["median_ms"] / 1000), 3) if stats["median_ms"] else None
+    return stats
+
+
+class Suite:
+    def __init__(self, args):
+        self.args = args
+        self.results = {}
+        self.skipped = {}
+        self.only = set(args.only.split(",")) if args.only else None
+
+    def enabled(self, group: str) -> bool:
+        return self.only is None or group in self.only
+
+    def record(self, key: str, stats: dict):
+        self.results[key] = stats
+        extra = f"  {stats['mb_per_s']:>9.2f} MB/s" if stats.get("mb_per_s") else ""
+        print(f"  {key:<36} {stats['median_ms']:>12.4f} ms  (p95 {stats['p95_ms']:.4f}){extra}", flush=True)
+
+    def skip(self, key: str, reason: str):
+        self.skipped[key] = reason
+        print(f"  {key:<36} skipped: {reason}", flush=True)
+
+    # --- 单步骤 ---
+
+    def bench_contract(self):
+        for n in self.args.library_sizes:
+            path = cached_library(n, self.args.data_dir)
+            generator = ContractGenerator(str(path), matcher="keyword")
+            requirement = matching_requirement(n)
+            assert generator.match_artifact_type(requirement), f"合成库 {n} 未命中需求"
+            if self.enabled("match_artifact_type"):
+                self.record(f"match_artifact_type/{n}",
+                            measure(lambda: generator.match_artifact_type(requirement), self.args.repeat))
+            if self.enabled("generate_contract"):
+                self.record(f"generate_contract/{n}",
+                            measure(lambda: generator.generate_contract(requirement), self.args.repeat))
+            self.bench_match(n, path, generator, requirement)
+
+    def bench_match(self, n: int, path: Path, keyword_generator: ContractGenerator, requirement: str):
+        if not (self.enabled("match_ngram") or self.enabled("match_many")):
+            return
+        try:
+            import numpy  # noqa: F401  ngram 匹配器的可选依赖
+        except ImportError:
+            self.skip(f"match_ngram/{n}", "缺少依赖 (numpy)")
+            return
+        generator = ContractGenerator(str(path), matcher="ngram")
+        if self.enabled("match_ngram"):
+            self.record(f"match_ngram/{n}", measure(lambda: generator.match_artifact_type(requirement), self.args.repeat))
+        if self.enabled("match_many"):
+            indices = list(range(0, n, max(1, n // MATCH_BATCH)))[:MATCH_BATCH]
+            requirements = [matching_requirement(i + 1) for i in indices]
+            for name, gen in (("keyword", keyword_generator), ("ngram", generator)):
+                stats = measure(lambda: gen.match_many(requirements), max(3, self.args.repeat // 5))
+                matched = gen.match_many(requirements)
+                hits = sum(1 for i, top in zip(indices, matched) if top and top[0]["artifact_type"].endswith(f"_{i}"))
+                stats["top1_accuracy"] = round(hits / len(indices), 4)
+                self.record(f"match_many/{name}/{n}", stats)
+
+    def bench_prompt(self, contract: dict):
+        if not self.enabled("build_user_prompt"):
+            return
+        try:
+            from odd.code_generator import CodeGenerator
+        except ImportError as e:
+            self.skip("build_user_prompt", f"缺少依赖 ({e.name})")
+            return
+        generator = CodeGenerator(api_key="benchmark", use_cache=False)
+        self.record("build_user_prompt", measure(lambda: generator._build_user_prompt(contract), self.args.repeat))
+
+    def bench_verify(self, contract: dict, corpora: dict):
+        if not self.enabled("verify"):
+            return
+        hints = contract['contract'].get('verification_hints', {})
+        for mode in ("substring", "ast"):
+            verifier = ContractVerifier(mode=mode)
+            # ast 模式按代码哈希缓存语法树，每个样本前清空以测量完整解析
+            setup = ast_verifier._trees.clear if mode == "ast" else None
+            for size, code in corpora.items():
+                stats = measure(lambda: verifier.verify(code, hints), self.args.repeat, setup=setup)
+                self.record(f"verify/{mode}/{format_size(size)}", _throughput(stats, len(code.encode('utf-8'))))
+
+    def bench_seal(self, contract: dict, corpora: dict, tmp: Path):
+        if not self.enabled("seal"):
+            return
+        verification = ContractVerifier().verify(DEFAULT_CODE, contract['contract'].get('verification_hints', {}))
+        backends = {
+            "json": JsonSealBackend(tmp / "seals_json"),
+            "sqlite": SQLiteSealBackend(tmp / "seals.sqlite"),
+        }
+        for name, backend in backends.items():
+            sealer = SealManager(tmp, backend=backend)
+            for size, code in corpora.items():
+                stats = measure(lambda: sealer.seal(contract['requirement_original'], contract, code, verification),
+                                self.args.repeat)
+                self.record(f"seal/{name}/{format_size(size)}", _throughput(stats, len(code.encode('utf-8'))))
+        code = corpora[min(corpora)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            for name, backend in backends.items():
+                with SealWriter(backend) as writer:
+                    for mode, sealer in (("direct", SealManager(tmp, backend=backend)),
+                                         ("writer", SealManager(tmp, writer=writer))):
+                        def burst():
+                            list(pool.map(lambda i: sealer.seal(contract['requirement_original'], contract, code,
+                                                                verification), range(256)))
+                        self.record(f"seal_concurrent/{name}/{mode}", measure(burst, max(3, self.args.repeat // 10)))
+
+    # --- 端到端 ---
+
+    def bench_offline(self, tmp: Path):
+        if not self.enabled("end_to_end"):
+            return
+        generator = ContractGenerator()
+        verifier = ContractVerifier()
+        sealer = SealManager(tmp, backend=JsonSealBackend(tmp / "seals_e2e"))
+
+        def run():
+            contract = generator.generate_contract("创建一个用户登录API")
+            verification = verifier.verify(DEFAULT_CODE, contract['contract'].get('verification_hints', {}))
+            sealer.seal(contract['requirement_original'], contract, DEFAULT_CODE, verification)
+
+        self.record("end_to_end/offline", measure(run, self.args.repeat))
+
+        def run_traced():
+            tracer = Tracer()
+            with tracer.trace("odd.run"):
+                run()
+
+        self.record("end_to_end/offline_traced", measure(run_traced, self.args.repeat))
+
+    def bench_llm(self, tmp: Path):
+        if not self.enabled("end_to_end"):
+            return
+        try:
+            import openai  # noqa: F401
+            import rich  # noqa: F401
+            import main as odd_main
+        except ImportError as e:
+            for key in ("end_to_end/generate", "end_to_end/stream"):
+                self.skip(key, f"缺少依赖 ({e.name})")
+            return
+        backend = JsonSealBackend(tmp / "seals_llm")
+        with FakeLLMServer(latency_ms=self.args.llm_latency_ms, tokens_per_s=self.args.tokens_per_s) as server:
+            env = {"OPENAI_API_KEY": "benchmark", "OPENAI_BASE_URL": server.base_url, "OPENAI_MODEL": "fake-model"}
+            saved = {k: os.environ.get(k) for k in env}
+            os.environ.update(env)
+            try:
+                for key, stream in (("end_to_end/generate", False), ("end_to_end/stream", True)):
+                    def run():
+                        result = odd_main.run_odd_demo("创建一个用户登录API", save_code=False, quiet=True,
+                                                       use_cache=False, seal_backend=backend, stream=stream)
+                        if result.get('error'):
+                            raise RuntimeError(result.get('message'))
+                    self.record(key, measure(run, self.args.repeat))
+            finally:
+                for k, v in saved.items():
+                    if v is None:
+                        os.environ.pop(k, None)
+                    else:
+                        os.environ[k] = v
+
+    def bench_resilience(self, contract: dict):
+        if not self.enabled("resilience"):
+            return
+        try:
+            from odd.code_generator import CodeGenerator
+            from odd.resilience import ResiliencePolicy
+        except ImportError as e:
+            for key in ("resilience/no_hedge", "resilience/hedge", "resilience/retry"):
+                self.skip(key, f"缺少依赖 ({e.name})")
+            return
+        scenarios = (
+            ("resilience/no_hedge", {"slow_fraction": 0.03, "slow_ms": RESILIENCE_SLOW_MS}, ResiliencePolicy(hedge=False)),
+            ("resilience/hedge", {"slow_fraction": 0.03, "slow_ms": RESILIENCE_SLOW_MS}, ResiliencePolicy(hedge=True)),
+            ("resilience/retry", {"error_rate": 0.2}, ResiliencePolicy(hedge=False, backoff_base=0.01)),
+        )
+        saved = {k: os.environ.get(k) for k in ("OPENAI_BASE_URL", "OPENAI_MODEL")}
+        try:
+            for key, faults, policy in scenarios:
+                # 每个场景一个新的假服务 (端口不同即不同端点)，延迟窗口与熔断器互不影响
+                with FakeLLMServer(latency_ms=RESILIENCE_LATENCY_MS, seed=0, **faults) as server:
+                    os.environ.update({"OPENAI_BASE_URL": server.base_url, "OPENAI_MODEL": "fake-model"})
+                    gen = CodeGenerator(api_key="benchmark", use_cache=False, resilience=policy)
+                    for _ in range(RESILIENCE_WARMUP):
+                        gen.generate_code(contract)
+                    samples, counts, failed = [], {"requests": 0, "retries": 0, "hedges": 0, "hedge_won": 0}, 0
+                    for _ in range(RESILIENCE_CALLS):
+                        start = time.perf_counter()
+                        result = gen.generate_code(contract)
+                        samples.append((time.perf_counter() - start) * 1000)
+                        failed += bool(result.get('error'))
+                        for name in counts:
+                            counts[name] += int(result['resilience'][name])
+                samples.sort()
+                quantile = lambda q: round(samples[min(len(samples) - 1, math.ceil(q * len(samples)) - 1)], 6)
+                self.record(key, {"median_ms": round(statistics.median(samples), 6), "p95_ms": quantile(0.95),
+                                  "p99_ms": quantile(0.99), "min_ms": round(samples[0], 6), "repeat": RESILIENCE_CALLS,
+                                  "number": 1, "success_rate": round(1 - failed / RESILIENCE_CALLS, 4), **counts})
+        finally:
+            for k, v in saved.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+
+    def bench_regenerate(self, contract: dict, tmp: Path):
+        if not self.enabled("regenerate"):
+            return
+        try:
+            from odd.code_generator import CodeGenerator
+            from odd.regenerator import Regenerator
+        except ImportError as e:
+            for key in ("regenerate/full", "regenerate/patch"):
+                self.skip(key, f"缺少依赖 ({e.name})")
+            return
+        hints = contract['contract']['verification_hints']
+        sealer = SealManager(tmp / "regenerate", backend="json")
+        parent = sealer.seal(contract['requirement_original'], contract, REGEN_PARENT_CODE,
+                             ContractVerifier().verify(REGEN_PARENT_CODE, hints))
+        saved = {k: os.environ.get(k) for k in ("OPENAI_BASE_URL", "OPENAI_MODEL")}
+        try:
+            with FakeLLMServer(code=REGEN_FIXED_CODE, tokens_per_s=self.args.tokens_per_s or REGEN_TOKENS_PER_S) as server:
+                os.environ.update({"OPENAI_BASE_URL": server.base_url, "OPENAI_MODEL": "fake-model"})
+                gen = CodeGenerator(api_key="benchmark", use_cache=False)
+                regenerator = Regenerator(sealer, ContractGenerator().library, gen)
+                last = {}
+
+                def full():
+                    # 与补丁模式对等：生成 → 完整验证 → 封存
+                    result = gen.generate_code(contract)
+                    last["tokens_used"] = result['tokens_used']
+                    sealer.seal(contract['requirement_original'], contract, result['code'],
+                                ContractVerifier().verify(result['code'], hints))
+
+                def patch():
+                    last["tokens_used"] = regenerator.regenerate(parent['seal_id'])['tokens_used']
+
+                for key, fn in (("regenerate/full", full), ("regenerate/patch", patch)):
+                    self.record(key, {**measure(fn, self.args.repeat, min_sample_s=0), **last})
+        finally:
+            for k, v in saved.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+
+    def bench_verify_tree(self, contract: dict, tmp: Path):
+        if not self.enabled("verify_tree"):
+            return
+        hints = contract['contract'].get('verification_hints', {})
+        root = tmp / "verify_tree"
+        code = build_code(parse_size(VERIFY_TREE_FILE_SIZE))
+        for i in range(VERIFY_TREE_FILES):
+            path = root / f"pkg_{i % 10}" / f"module_{i}.py"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(code, encoding='utf-8')
+        size = VERIFY_TREE_FILES * len(code.encode('utf-8'))
+        cache = tmp / "verify_tree.sqlite"
+        FileVerifier(hints, cache_path=cache).run([root])
+        for key, verifier in (("verify_tree/serial", FileVerifier(hints, workers=1)),
+                              ("verify_tree/parallel", FileVerifier(hints)),
+                              ("verify_tree/incremental", FileVerifier(hints, cache_path=cache))):
+            stats = _throughput(measure(lambda: verifier.run([root]), max(3, self.args.repeat // 2)), size)
+            stats["files"] = VERIFY_TREE_FILES
+            stats["workers"] = verifier.workers
+            self.record(key, stats)
+
+    def bench_composite(self, tmp: Path):
+        if not self.enabled("composite"):
+            return
+        try:
+            import openai  # noqa: F401
+            import rich  # noqa: F401
+            import main as odd_main
+        except ImportError as e:
+            for key in ("composite/sequential", "composite/decompose"):
+                self.skip(key, f"缺少依赖 ({e.name})")
+            return
+        backend = JsonSealBackend(tmp / "seals_composite")
+        with FakeLLMServer(latency_ms=self.args.llm_latency_ms or COMPOSITE_LATENCY_MS,
+                           tokens_per_s=self.args.tokens_per_s) as server:
+            env = {"OPENAI_API_KEY": "benchmark", "OPENAI_BASE_URL": server.base_url, "OPENAI_MODEL": "fake-model"}
+            saved = {k: os.environ.get(k) for k in env}
+            os.environ.update(env)
+
+            def check(result: dict):
+                if result.get('error'):
+                    raise RuntimeError(result.get('message'))
+
+            def sequential():
+                for requirement in COMPOSITE_SPLIT:
+                    check(odd_main.run_odd_demo(requirement, save_code=False, quiet=True, use_cache=False,
+                                                seal_backend=backend))
+
+            def decompose():
+                check(odd_main.run_odd_demo(COMPOSITE_REQUIREMENT, save_code=False, quiet=True, use_cache=False,
+                                            seal_backend=backend, decompose=True))
+
+            try:
+                for key, fn in (("composite/sequential", sequential), ("composite/decompose", decompose)):
+                    self.record(key, {**measure(fn, self.args.repeat), "parts": len(COMPOSITE_SPLIT)})
+            finally:
+                for k, v in saved.items():
+                    if v is None:
+                        os.environ.pop(k, None)
+                    else:
+                        os.environ[k] = v
+
+    def run(self) -> dict:
+        contract = ContractGenerator().generate_contract("创建一个用户登录API")
+        corpora = {size: build_code(size) for size in self.args.code_sizes}
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            self.bench_contract()
+            self.bench_prompt(contract)
+            self.bench_verify(contract, corpora)
+            self.bench_verify_tree(contract, tmp)
+            self.bench_seal(contract, corpora, tmp)
+            self.bench_offline(tmp)
+            self.bench_llm(tmp)
+            self.bench_resilience(contract)
+            self.bench_regenerate(contract, tmp)
+            self.bench_composite(tmp)
+        return {
+            "version": RESULTS_VERSION,
+            "meta": _meta(self.args),
+            "results": self.results,
+            "skipped": self.skipped,
+        }
+
+
+def _meta(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "library_sizes": args.library_sizes,
+        "code_sizes": args.code_sizes,
+        "llm_latency_ms": args.llm_latency_ms,
+        "tokens_per_s": args.tokens_per_s,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float, noise_ms: float) -> list:
+    """逐项比较中位数：返回 [(键, 基线 ms, 当前 ms, 比值, 状态)]；绝对差低于 noise_ms 的视为持平"""
+    rows = []
+    for key, stats in current["results"].items():
+        old = baseline.get("results", {}).get(key)
+        if old is None:
+            rows.append((key, None, stats["median_ms"], None, "new"))
+            continue
+        before, after = old["median_ms"], stats["median_ms"]
+        ratio = after / before if before else float("inf")
+        if abs(after - before) <= noise_ms:
+            status = "ok"
+        elif ratio > 1 + tolerance:
+            status = "REGRESSION"
+        elif ratio < 1 - tolerance:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((key, before, after, ratio, status))
+    for key in baseline.get("results", {}):
+        if key not in current["results"]:
+            rows.append((key, baseline["results"][key]["median_ms"], None, None, "missing"))
+    return rows
+
+
+def print_comparison(rows: list):
+    print(f"\n{'benchmark':<36} {'baseline ms':>12} {'current ms':>12} {'ratio':>8}  status")
+    for key, before, after, ratio, status in rows:
+        fmt = lambda v: f"{v:12.4f}" if v is not None else f"{'-':>12}"
+        ratio_text = f"{ratio:8.2f}" if ratio is not None else f"{'-':>8}"
+        print(f"{key:<36} {fmt(before)} {fmt(after)} {ratio_text}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ODD 流程基准套件")
+    parser.add_argument("--libraries", default=None, help=f"合成标准库规模，逗号分隔 (默认 {DEFAULT_LIBRARIES})")
+    parser.add_argument("--code-sizes", default=None, help=f"代码语料大小，逗号分隔 (默认 {DEFAULT_SIZES})")
+    parser.add_argument("--quick", action="store_true", help=f"小规模运行 ({QUICK_LIBRARIES} / {QUICK_SIZES})")
+    parser.add_argument("--only", default=None,
+                        help="只运行指定组: match_artifact_type,match_ngram,match_many,generate_contract,build_user_prompt,"
+                             "verify,verify_tree,seal,end_to_end,resilience,regenerate,composite")
+    parser.add_argument("--repeat", type=int, default=7, help="每项样本数")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="假 LLM 服务的首 token 延迟")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="假 LLM 服务的输出速率，0 为不限速")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="合成标准库缓存目录")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="把结果写入 JSON 文件")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="把结果保存为基线")
+    parser.add_argument("--baseline", type=Path, default=None, help="与基线比较，出现回归时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的中位数变慢比例")
+    parser.add_argument("--noise-ms", type=float, default=0.005, help="低于该绝对差异的变化视为噪声")
+    args = parser.parse_args()
+
+    args.library_sizes = [int(n) for n in (args.libraries or (QUICK_LIBRARIES if args.quick else DEFAULT_LIBRARIES)).split(",")]
+    args.code_sizes = [parse_size(s) for s in (args.code_sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)).split(",")]
+
+    report = Suite(args).run()
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding='utf-8')
+            print(f"results written to {path}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        rows = compare(report, baseline, args.tolerance, args.noise_ms)
+        print_comparison(rows)
+        regressions = [row for row in rows if row[4] == "REGRESSION"]
+        if regressions:
+            print(f"FAIL: {len(regressions)} 项回归超过 {args.tolerance:.0%}")
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
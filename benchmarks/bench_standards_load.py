@@ -0,0 +1,113 @@
+"""
+标准库加载基准：YAML 冷解析 vs 磁盘快照 vs 进程内缓存，单文件布局 vs 分片布局 (只加载索引，首次使用时读取一个分片)
+
+用法: python benchmarks/bench_standards_load.py [--artifacts 500] [--repeat 20]
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from odd import standard_library
+from odd.contract_generator import ContractGenerator
+from benchmarks.synthetic import build_library, matching_requirement
+
+
+def measure(fn, repeat: int) -> float:
+    """返回 repeat 次调用的中位耗时 (毫秒)"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def peak_kib(fn) -> float:
+    """fn 执行期间 Python 分配的峰值内存 (KiB)"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="标准库冷/热加载基准")
+    parser.add_argument("--artifacts", type=int, default=500, help="合成标准库的产出物数量")
+    parser.add_argument("--repeat", type=int, default=20, help="每项重复次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_library(args.artifacts, Path(tmp))
+
+        def cold():
+            standard_library.clear_cache()
+            standard_library.load_standard_library(path, use_snapshot=False)
+
+        def snapshot():
+            standard_library.clear_cache()
+            standard_library.load_standard_library(path)
+
+        def warm():
+            standard_library.load_standard_library(path)
+
+        def construct():
+            ContractGenerator(str(path))
+
+        shards = Path(tmp) / "sharded"
+        standard_library.shard_library(path, shards)
+        requirement = matching_requirement(args.artifacts)
+
+        def sharded_cold():
+            standard_library.clear_cache()
+            standard_library.load_standard_library(shards, use_snapshot=False)
+
+        def sharded_snapshot():
+            standard_library.clear_cache()
+            standard_library.load_standard_library(shards)
+
+        def first_contract(source):
+            def run():
+                standard_library.clear_cache()
+                ContractGenerator(str(source)).generate_contract(requirement)
+            return run
+
+        size = path.stat().st_size
+        snapshot()  # 生成磁盘快照
+        sharded_snapshot()
+        results = {
+            "cold (YAML parse)": measure(cold, args.repeat),
+            "snapshot (pickle)": measure(snapshot, args.repeat),
+            "warm (in-process)": measure(warm, args.repeat),
+            "ContractGenerator()": measure(construct, args.repeat),
+            "sharded cold (index)": measure(sharded_cold, args.repeat),
+            "sharded snapshot": measure(sharded_snapshot, args.repeat),
+            "contract (single)": measure(first_contract(path), args.repeat),
+            "contract (sharded)": measure(first_contract(shards), args.repeat),
+        }
+        memory = {
+            "single cold": peak_kib(cold),
+            "sharded cold": peak_kib(sharded_cold),
+            "single snapshot": peak_kib(snapshot),
+            "sharded snapshot": peak_kib(sharded_snapshot),
+        }
+
+    print(f"standard library: {args.artifacts} artifacts, {size} bytes")
+    baseline = results["cold (YAML parse)"]
+    for name, ms in results.items():
+        print(f"  {name:<24} {ms:10.3f} ms   x{baseline / ms if ms else float('inf'):,.0f}")
+    print("peak memory while loading:")
+    for name, kib in memory.items():
+        print(f"  {name:<24} {kib:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+CLI 启动基准：测量 `main.py contract` 的冷启动耗时，并检查快速路径没有加载重量级依赖
+
+超出预算或加载了禁止的模块时以退出码 1 结束，可直接用于 CI。
+
+用法: python benchmarks/bench_startup.py [--repeat 10] [--budget-ms 150]
+预算也可通过环境变量 ODD_STARTUP_BUDGET_MS 设置。
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+MAIN = ROOT / "main.py"
+
+# contract 快速路径不应加载的模块
+FORBIDDEN_MODULES = ("openai", "httpx", "rich", "dotenv", "yaml")
+
+# 在子进程中运行 main.py contract，结束后输出已加载的禁止模块
+PROBE = """
+import sys, runpy, io, contextlib
+sys.argv = [{main!r}, "contract", sys.argv[1]]
+with contextlib.redirect_stdout(io.StringIO()):
+    runpy.run_path({main!r}, run_name="__main__")
+print(__import__("json").dumps(sorted(m for m in {forbidden!r} if m in sys.modules)))
+"""
+
+
+def time_once(requirement: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(MAIN), "contract", requirement],
+                   stdout=subprocess.DEVNULL, check=True, cwd=ROOT)
+    return time.perf_counter() - start
+
+
+def loaded_forbidden(requirement: str) -> list:
+    code = PROBE.format(main=str(MAIN), forbidden=FORBIDDEN_MODULES)
+    out = subprocess.run([sys.executable, "-c", code, requirement],
+                         capture_output=True, text=True, check=True, cwd=ROOT).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("ODD_STARTUP_BUDGET_MS", "150")))
+    parser.add_argument("--requirement", default="用户登录")
+    args = parser.parse_args()
+
+    # 预热一次：生成 __pycache__ 与标准库快照，测量的是常规冷进程启动而非首次编译
+    time_once(args.requirement)
+    # 基线：裸解释器启动耗时
+    baseline = statistics.median(
+        _time_cmd([sys.executable, "-c", "pass"]) for _ in range(args.repeat))
+    samples = [time_once(args.requirement) for _ in range(args.repeat)]
+    median = statistics.median(samples)
+    forbidden = loaded_forbidden(args.requirement)
+
+    print(f"python -c pass          median {baseline * 1000:8.1f} ms")
+    print(f"main.py contract        median {median * 1000:8.1f} ms  "
+          f"(min {min(samples) * 1000:.1f}, max {max(samples) * 1000:.1f}, n={args.repeat})")
+    print(f"budget                         {args.budget_ms:8.1f} ms")
+    print(f"forbidden modules loaded: {forbidden or 'none'}")
+
+    failed = False
+    if median * 1000 > args.budget_ms:
+        print(f"FAIL: 启动耗时 {median * 1000:.1f} ms 超出预算 {args.budget_ms:.1f} ms")
+        failed = True
+    if forbidden:
+        print(f"FAIL: contract 快速路径加载了 {', '.join(forbidden)}")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+def _time_cmd(cmd: list) -> float:
+    start = time.perf_counter()
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+验证模式基准：substring vs ast 的吞吐量与误报率
+
+误报/漏报率基于一组人工标注的代码片段，只统计片段所针对的规则。
+用法: python benchmarks/bench_verifier_modes.py [--lines 5000] [--repeat 5]
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from odd import ast_verifier
+from odd.contract_generator import ContractGenerator
+from odd.contract_verifier import ContractVerifier
+
+SAMPLE_CODE = Path(__file__).parent.parent / "output" / "generated_auth_login.py"
+
+# (代码片段, {规则 reason: 期望是否通过})；只标注片段所针对的规则
+LABELLED_AUTH = [
+    ("password = data['password']\nhashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())\n",
+     {"禁止明文存储密码": True}),
+    ("pwd = request.form['pwd']\nuser.pw_hash = generate_password_hash(pwd)\n",
+     {"禁止明文存储密码": True}),
+    ("def login(username, password=None):\n    return check(username, password)\n",
+     {"禁止明文存储密码": True}),
+    ("user.password = password\n", {"禁止明文存储密码": False}),
+    ("users[name] = {'password': password}\n", {"禁止明文存储密码": False}),
+    ("password = 'hunter2'\n", {"禁止明文存储密码": False}),
+    ("db['users'][uid]['password'] = data['password']\n", {"禁止明文存储密码": False}),
+    ("logger.info('login ok for %s', username)\n", {"禁止日志输出密码": True}),
+    ("print(password_params)\n", {"禁止日志输出密码": True}),
+    ("print(password)\n", {"禁止日志输出密码": False}),
+    ("print( password )\n", {"禁止日志输出密码": False}),
+    ("logger.info(f'pw={password}')\n", {"禁止日志输出密码": False}),
+    ("app.logger.debug('payload %s', data['password'])\n", {"禁止日志输出密码": False}),
+    ("import hashlib\n", {"必须使用密码哈希函数": True}),
+    ("from flask_bcrypt import Bcrypt\n", {"必须使用密码哈希函数": True}),
+    ("# TODO: use bcrypt later\nstore(password)\n", {"必须使用密码哈希函数": False}),
+]
+
+
+def error_rates(verifier: ContractVerifier, hints: dict, labelled):
+    """返回 (误报率, 漏报率)：误报 = 合规片段被判违规，漏报 = 违规片段被判通过"""
+    false_pos = false_neg = compliant = violating = 0
+    for code, expected in labelled:
+        results = {c['rule']: c['passed'] for c in verifier.verify(code, hints)['checks']}
+        for rule, passed in expected.items():
+            if passed:
+                compliant += 1
+                false_pos += results.get(rule) is not True
+            else:
+                violating += 1
+                false_neg += results.get(rule) is not False
+    return false_pos / compliant, false_neg / violating
+
+
+def throughput(verifier: ContractVerifier, code: str, hints: dict, repeat: int) -> float:
+    """返回 MB/s；ast 模式每次都清空解析缓存，计入解析开销"""
+    samples = []
+    for _ in range(repeat):
+        ast_verifier._trees.clear()
+        start = time.perf_counter()
+        verifier.verify(code, hints)
+        samples.append(time.perf_counter() - start)
+    return len(code.encode('utf-8')) / statistics.median(samples) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="substring / ast 验证模式对比")
+    parser.add_argument("--lines", type=int, default=5000, help="吞吐量测试代码的大致行数")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    args = parser.parse_args()
+
+    hints = ContractGenerator().generate_contract("用户登录")['contract']['verification_hints']
+    base = SAMPLE_CODE.read_text(encoding='utf-8')
+    code = base * max(1, args.lines // base.count("\n"))
+
+    print(f"{'mode':<10} {'false pos':>10} {'false neg':>10} {'MB/s':>10}   "
+          f"({code.count(chr(10))} lines, {len(code) // 1024} KB)")
+    for mode in ("substring", "ast"):
+        verifier = ContractVerifier(mode=mode)
+        fp, fn = error_rates(verifier, hints, LABELLED_AUTH)
+        print(f"{mode:<10} {fp:>10.1%} {fn:>10.1%} {throughput(verifier, code, hints, args.repeat):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
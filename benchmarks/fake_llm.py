@@ -0,0 +1,293 @@
+"""
+本地 OpenAI 兼容假 LLM 服务 (仅标准库)
+
+实现 POST /v1/chat/completions (含 stream=True 的 SSE 输出与 stream_options.include_usage)，
+按配置的首 token 延迟与 token 速率返回固定代码，并附带 x-ratelimit-* 响应头；补丁请求 (系统提示词要求
+unified diff) 返回把请求中的当前代码改为固定代码的补丁；
+可按比例注入慢请求 (长尾延迟) 与 503 错误，用于测试重试、对冲与熔断。
+CodeGenerator 通过 OPENAI_BASE_URL 指向它即可完全离线运行整个 ODD 流程。
+
+用法:
+    python benchmarks/fake_llm.py --port 8765 --latency-ms 200 --tokens-per-s 80
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python main.py generate "用户登录"
+
+在代码中:
+    with FakeLLMServer(latency_ms=50, tokens_per_s=0) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+"""
+
+import json
+import time
+import uuid
+import random
+import difflib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+# 与 CodeGenerator._estimate_tokens 一致：粗略按 3 字符/token
+CHARS_PER_TOKEN = 3
+
+DEFAULT_CODE = '''from flask import Flask, request, jsonify
+import bcrypt
+import jwt
+import datetime
+
+app = Flask(__name__)
+SECRET_KEY = "change-me"
+users = {}
+
+
+@app.route('/api/login', methods=['POST'])
+def login():
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+    password = data.get('password')
+    if not username or not password:
+        return jsonify({"error": "missing credentials"}), 400
+    user = users.get(username)
+    if user is None or not bcrypt.checkpw(password.encode(), user['password_hash']):
+        return jsonify({"error": "invalid credentials"}), 401
+    token = jwt.encode({"sub": username, "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
+                       SECRET_KEY, algorithm="HS256")
+    return jsonify({"token": token}), 200
+
+
+if __name__ == '__main__':
+    app.run(debug=False)
+'''
+
+
+class FakeLLMConfig:
+    """假服务的行为参数，可在运行中修改 (对后续请求生效)"""
+
+    def __init__(self, code: str = DEFAULT_CODE, latency_ms: float = 0.0, tokens_per_s: float = 0.0,
+                 chunk_chars: int = 24, fence: bool = False, rate_limit_rpm: int = 10000,
+                 rate_limit_tpm: int = 10000000, slow_fraction: float = 0.0, slow_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = None):
+        self.code = code
+        self.latency_ms = latency_ms
+        # 0 表示不限速，一次性返回
+        self.tokens_per_s = tokens_per_s
+        self.chunk_chars = chunk_chars
+        self.fence = fence
+        self.rate_limit_rpm = rate_limit_rpm
+        self.rate_limit_tpm = rate_limit_tpm
+        # slow_fraction 的请求额外延迟 slow_ms；error_rate 的请求返回 503
+        self.slow_fraction = slow_fraction
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def draw(self):
+        """本次请求的 (额外延迟秒数, 是否返回错误)"""
+        with self._random_lock:
+            slow = self._random.random() < self.slow_fraction
+            failed = self._random.random() < self.error_rate
+        return (self.slow_ms / 1000 if slow else 0.0), failed
+
+    def content(self) -> str:
+        return f"```python\n{self.code}\n```" if self.fence else self.code
+
+    def content_for(self, messages: list) -> str:
+        """补丁请求返回把用户消息中最后一个 ```python 代码块改为 code 的 unified diff，其余请求返回 code"""
+        system = next((m.get('content') or "" for m in messages if m.get('role') == "system"), "")
+        if "unified diff" not in system:
+            return self.content()
+        user = (messages[-1].get('content') or "") if messages else ""
+        current = user.rsplit("```python\n", 1)[-1].rsplit("\n```", 1)[0] if "```python\n" in user else ""
+        lines = lambda text: (text if text.endswith("\n") else text + "\n").splitlines(True)
+        patch = "".join(difflib.unified_diff(lines(current), lines(self.code), "a/generated.py", "b/generated.py"))
+        return f"```diff\n{patch}```" if self.fence else patch
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeLLM/0.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _ratelimit_headers(self, tokens: int):
+        cfg = self.server.config
+        self.send_header("x-ratelimit-limit-requests", str(cfg.rate_limit_rpm))
+        self.send_header("x-ratelimit-remaining-requests", str(cfg.rate_limit_rpm - 1))
+        self.send_header("x-ratelimit-reset-requests", "60s")
+        self.send_header("x-ratelimit-limit-tokens", str(cfg.rate_limit_tpm))
+        self.send_header("x-ratelimit-remaining-tokens", str(max(0, cfg.rate_limit_tpm - tokens)))
+        self.send_header("x-ratelimit-reset-tokens", "60s")
+
+    def _send_json(self, status: int, payload: dict, tokens: int = 0):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self._ratelimit_headers(tokens)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {"object": "list", "data": [{"id": "fake-model", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+        self.server.count_request()
+
+        cfg = self.server.config
+        content = cfg.content_for(request.get('messages', []))
+        prompt_tokens = sum(_count_tokens(m.get('content') or "") for m in request.get('messages', []))
+        completion_tokens = _count_tokens(content)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        model = request.get('model', 'fake-model')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        extra, failed = cfg.draw()
+        if cfg.latency_ms or extra:
+            time.sleep(cfg.latency_ms / 1000 + extra)
+        if failed:
+            self.server.count_error()
+            self._send_json(503, {"error": {"message": "injected failure", "type": "server_error"}})
+            return
+        if request.get('stream'):
+            include_usage = (request.get('stream_options') or {}).get('include_usage', False)
+            self._stream(completion_id, model, content, usage if include_usage else None)
+            return
+        if cfg.tokens_per_s:
+            time.sleep(completion_tokens / cfg.tokens_per_s)
+        self._send_json(200, {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        }, tokens=usage['total_tokens'])
+
+    def _stream(self, completion_id: str, model: str, content: str, usage: Optional[dict]):
+        cfg = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self._ratelimit_headers(usage['total_tokens'] if usage else 0)
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: dict, finish_reason=None, chunk_usage=None) -> bytes:
+            choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": choices, "usage": chunk_usage}
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8')
+
+        delay = (cfg.chunk_chars / CHARS_PER_TOKEN) / cfg.tokens_per_s if cfg.tokens_per_s else 0
+        try:
+            self.wfile.write(event({"role": "assistant", "content": ""}))
+            for i in range(0, len(content), cfg.chunk_chars):
+                if delay:
+                    time.sleep(delay)
+                self.wfile.write(event({"content": content[i:i + cfg.chunk_chars]}))
+                self.wfile.flush()
+            self.wfile.write(event({}, finish_reason="stop"))
+            if usage is not None:
+                self.wfile.write(event(None, chunk_usage=usage))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端中止流 (如增量验证发现违规) 属于正常情况
+            self.server.count_abort()
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """在后台线程运行的假 LLM 服务；port=0 时自动分配端口"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: FakeLLMConfig = None, **config_kwargs):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeLLMConfig(**config_kwargs)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.aborted_streams = 0
+        self.errors = 0
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count_request(self):
+        with self._stats_lock:
+            self.requests += 1
+
+    def count_abort(self):
+        with self._stats_lock:
+            self.aborted_streams += 1
+
+    def count_error(self):
+        with self._stats_lock:
+            self.errors += 1
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容假 LLM 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="每个请求的首 token 延迟")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="输出速率，0 为不限速")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="流式输出每块字符数")
+    parser.add_argument("--code", type=str, default=None, help="返回的代码文件 (默认内置的登录 API)")
+    parser.add_argument("--fence", action="store_true", help="用 ```python 代码块包裹输出")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="慢请求比例 (长尾延迟)")
+    parser.add_argument("--slow-ms", type=float, default=0.0, help="慢请求的额外延迟")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的请求比例")
+    args = parser.parse_args()
+
+    code = Path(args.code).read_text(encoding='utf-8') if args.code else DEFAULT_CODE
+    server = FakeLLMServer(args.host, args.port, code=code, latency_ms=args.latency_ms,
+                           tokens_per_s=args.tokens_per_s, chunk_chars=args.chunk_chars, fence=args.fence,
+                           slow_fraction=args.slow_fraction, slow_ms=args.slow_ms, error_rate=args.error_rate)
+    print(f"fake LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+ODD 服务压测：在本地假 LLM 服务上启动 `main.py serve`，用并发 keep-alive 连接发压，报告 RPS 与延迟分位数
+
+用法:
+  python benchmarks/load_test.py --endpoint generate --concurrency 32 --requests 2000 --llm-latency-ms 200
+  python benchmarks/load_test.py --endpoint contract --duration 10
+  python benchmarks/load_test.py --url http://127.0.0.1:8080 --endpoint verify   # 压测已运行的服务
+
+--distinct 控制不同需求的数量：值越小，并发的相同请求越多，合并 (coalescing) 命中越多。
+结束时向服务发送 SIGTERM，验证排空后正常退出。
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_llm import DEFAULT_CODE, FakeLLMServer
+
+REQUIREMENTS = ["创建一个用户登录API", "实现用户认证接口", "商品的增删改查接口", "订单 CRUD API"]
+
+
+def build_body(endpoint: str, i: int, distinct: int) -> dict:
+    n = i % distinct
+    requirement = f"{REQUIREMENTS[n % len(REQUIREMENTS)]} #{n}"
+    if endpoint in ("contract", "generate"):
+        return {"requirement": requirement}
+    if endpoint == "verify":
+        return {"code": f"{DEFAULT_CODE}\n# variant {n}\n", "artifact_type": "auth_login"}
+    raise ValueError(endpoint)
+
+
+class Client:
+    """单个 keep-alive 连接上的最小 HTTP/1.1 客户端"""
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, payload: dict = None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b""
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        head = (await self.reader.readuntil(b"\r\n\r\n")).decode('latin-1')
+        status = int(head.split(" ", 2)[1])
+        headers = {}
+        for line in head.split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1)]
+
+
+async def run_load(host: str, port: int, endpoint: str, concurrency: int, total: int, duration: float,
+                   distinct: int) -> dict:
+    latencies, statuses = [], {}
+    counter = iter(range(total if total else 10 ** 12))
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker():
+        client = Client(host, port)
+        try:
+            for i in counter:
+                if deadline and time.perf_counter() >= deadline:
+                    return
+                start = time.perf_counter()
+                try:
+                    status, _ = await client.request("POST", f"/{endpoint}", build_body(endpoint, i, distinct))
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    status = "conn_error"
+                    await client.close()
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            await client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    health_client = Client(host, port)
+    _, health = await health_client.request("GET", "/health")
+    await health_client.close()
+
+    latencies.sort()
+    ok = statuses.get(200, 0)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "distinct": distinct,
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {name: round(percentile(latencies, q) * 1000, 2)
+                       for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))},
+        "server": json.loads(health),
+    }
+
+
+def wait_ready(host: str, port: int, proc: subprocess.Popen, timeout: float = 30.0):
+    async def probe():
+        client = Client(host, port)
+        try:
+            status, _ = await client.request("GET", "/health")
+            return status == 200
+        finally:
+            await client.close()
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务启动失败，退出码 {proc.returncode}")
+        try:
+            if asyncio.run(probe()):
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("等待服务就绪超时")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ODD 服务压测")
+    parser.add_argument("--url", default=None, help="压测已运行的服务；不指定时自动启动假 LLM 与 main.py serve")
+    parser.add_argument("--endpoint", choices=("generate", "contract", "verify"), default="generate")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-n", "--requests", type=int, default=500, help="总请求数 (指定 --duration 时忽略)")
+    parser.add_argument("-d", "--duration", type=float, default=None, help="按时长压测 (秒)")
+    parser.add_argument("--distinct", type=int, default=50, help="不同请求体的数量")
+    parser.add_argument("--port", type=int, default=8089, help="自动启动服务时使用的端口")
+    parser.add_argument("--workers", type=int, default=4, help="服务的验证/封存线程数")
+    parser.add_argument("--seal-backend", choices=("json", "sqlite"), default="sqlite")
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--tokens-per-s", type=float, default=0.0)
+    parser.add_argument("-o", "--output", type=Path, default=None, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+    total = 0 if args.duration else args.requests
+
+    if args.url:
+        url = urlparse(args.url)
+        report = asyncio.run(run_load(url.hostname, url.port or 80, args.endpoint, args.concurrency, total,
+                                      args.duration, args.distinct))
+    else:
+        with FakeLLMServer(latency_ms=args.llm_latency_ms, tokens_per_s=args.tokens_per_s) as llm, \
+                tempfile.TemporaryDirectory() as tmp:
+            env = {**os.environ, "OPENAI_API_KEY": "load-test", "OPENAI_BASE_URL": llm.base_url,
+                   "OPENAI_MODEL": "fake-model",
+                   "ODD_MAX_CONCURRENCY": str(max(args.concurrency, 8))}
+            proc = subprocess.Popen([sys.executable, str(ROOT / "main.py"), "serve", "--port", str(args.port),
+                                     "--workers", str(args.workers), "--seal-backend", args.seal_backend,
+                                     "--output-dir", tmp, "--no-cache"], env=env, cwd=ROOT, stdout=subprocess.DEVNULL)
+            try:
+                wait_ready("127.0.0.1", args.port, proc)
+                report = asyncio.run(run_load("127.0.0.1", args.port, args.endpoint, args.concurrency, total,
+                                              args.duration, args.distinct))
+                report["llm_requests"] = llm.requests
+            finally:
+                proc.send_signal(signal.SIGTERM if hasattr(signal, "SIGTERM") else signal.SIGINT)
+                try:
+                    report_exit = proc.wait(timeout=60)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    report_exit = "killed"
+            report["server_exit"] = report_exit
+
+    lat = report["latency_ms"]
+    print(f"endpoint      /{report['endpoint']}  concurrency={report['concurrency']}  distinct={report['distinct']}")
+    print(f"requests      {report['requests']} ({report['ok']} ok)  statuses={report['statuses']}")
+    print(f"throughput    {report['rps']} req/s over {report['elapsed_s']} s")
+    print(f"latency ms    p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"coalesced     {report['server'].get('coalesced')}"
+          + (f"  (LLM calls: {report['llm_requests']})" if "llm_requests" in report else ""))
+    if "server_exit" in report:
+        print(f"server exit   {report['server_exit']}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+if __name__ == "__main__":
+    main()
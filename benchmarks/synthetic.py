@@ -0,0 +1,119 @@
+"""
+基准测试用合成数据：任意规模的标准库与任意大小的生成代码语料
+"""
+
+import random
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).parent.parent
+BUILTIN_LIBRARY = ROOT / "artifacts" / "standards" / "standard_library.yaml"
+
+# 有 libyaml 时用 C 实现的 Dumper，万级产出物的库生成时间从分钟级降到秒级
+_YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+def build_library(n_artifacts: int, target: Path) -> Path:
+    """以内置产出物为模板，复制出 n_artifacts 个不同 id/关键词的产出物，写入 target/standard_library.yaml"""
+    with open(BUILTIN_LIBRARY, 'r', encoding='utf-8') as f:
+        base = yaml.safe_load(f)
+    templates = list(base['artifacts'].items())
+    artifacts = {}
+    for i in range(n_artifacts):
+        name, config = templates[i % len(templates)]
+        config = dict(config)
+        config['keywords'] = [f"{kw}_{i}" for kw in config['keywords']]
+        artifacts[f"{name}_{i}"] = config
+    target.mkdir(parents=True, exist_ok=True)
+    path = target / "standard_library.yaml"
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.dump({"version": base['version'], "artifacts": artifacts}, f, Dumper=_YamlDumper, allow_unicode=True)
+    return path
+
+
+def cached_library(n_artifacts: int, data_dir: Path) -> Path:
+    """在 data_dir/library_<n> 下生成 (或复用已生成的) 合成标准库"""
+    path = Path(data_dir) / f"library_{n_artifacts}" / "standard_library.yaml"
+    if path.exists():
+        return path
+    return build_library(n_artifacts, path.parent)
+
+
+def matching_requirement(n_artifacts: int) -> str:
+    """命中合成库中最后一个产出物的需求 (关键词表需完整扫描)"""
+    i = n_artifacts - 1
+    keyword = "登录" if i % 2 == 0 else "增删改查"
+    return f"实现一个{keyword}_{i}接口，返回 JSON"
+
+
+_ROUTE_TEMPLATE = '''
+
+@app.route('/api/{name}', methods=['{method}'])
+def {verb}_{name}():
+    """{verb} {name} #{i}"""
+    try:
+        data = request.get_json(silent=True) or {{}}
+        value = data.get('{field}')
+        if value is None:
+            return jsonify({{"error": "missing {field}"}}), 400
+        cursor = db.execute("SELECT id, {field} FROM {name} WHERE id = ?", (value,))
+        row = cursor.fetchone()
+        if row is None:
+            raise LookupError("{name} not found")
+        return jsonify({{"id": row[0], "{field}": row[1], "seq": {seq}}}), 200
+    except LookupError as e:
+        return jsonify({{"error": str(e)}}), 404
+'''
+
+_HEADER = '''from flask import Flask, request, jsonify
+import sqlite3
+import bcrypt
+import jwt
+
+app = Flask(__name__)
+db = sqlite3.connect(":memory:", check_same_thread=False)
+'''
+
+_FOOTER = '''
+
+if __name__ == '__main__':
+    app.run(debug=False)
+'''
+
+
+def build_code(size_bytes: int, seed: int = 0) -> str:
+    """生成约 size_bytes 字节、语法合法的 Flask 代码 (路由函数重复展开，内容各不相同)"""
+    rng = random.Random(seed)
+    parts = [_HEADER]
+    size = len(_HEADER.encode('utf-8')) + len(_FOOTER)
+    i = 0
+    while size < size_bytes:
+        route = _ROUTE_TEMPLATE.format(
+            name=f"res{i}", i=i, seq=rng.randrange(10 ** 6),
+            verb=rng.choice(["create", "get", "update", "delete", "list"]),
+            method=rng.choice(["GET", "POST", "PUT", "DELETE"]),
+            field=rng.choice(["name", "email", "title", "status"]),
+        )
+        parts.append(route)
+        size += len(route.encode('utf-8'))
+        i += 1
+    parts.append(_FOOTER)
+    return "".join(parts)
+
+
+def parse_size(text: str) -> int:
+    """'1k' / '64KB' / '1m' / '2048' -> 字节数"""
+    text = text.strip().lower().rstrip('b')
+    units = {"k": 1024, "m": 1024 * 1024}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(n: int) -> str:
+    if n >= 1024 * 1024 and n % (1024 * 1024) == 0:
+        return f"{n // (1024 * 1024)}MB"
+    if n >= 1024 and n % 1024 == 0:
+        return f"{n // 1024}KB"
+    return f"{n}B"
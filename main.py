@@ -1,8 +1,14 @@
 """
 ODD Demo 主程序入口
 命令行界面实现
+
+第三方依赖 (rich、dotenv、openai) 与 odd 各模块均在子命令内按需导入：
+`contract` 只加载契约生成器与标准库快照，不会加载 OpenAI SDK。
 """
 
+import time
+_MAIN_LOADED = time.perf_counter()
+
 import os
 import sys
 import json
@@ -13,87 +19,229 @@ from datetime import datetime
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from dotenv import load_dotenv
-load_dotenv()
-
-from rich.console import Console
-from rich.panel import Panel
-from rich.syntax import Syntax
-from rich.table import Table
-
 # Windows 控制台编码修复
-import sys
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-from odd.contract_generator import ContractGenerator
-from odd.code_generator import CodeGenerator
-from odd.contract_verifier import ContractVerifier
-from odd.seal_manager import SealManager
+from odd.timings import Timings
+
+# 与 odd.contract_verifier.VERIFY_MODES / odd.seal_store.BACKENDS / odd.telemetry.PROFILERS /
+# odd.prompt_builder.PROMPT_MODES / odd.contract_generator.MATCHERS 一致；在此重复声明是为了构建参数解析器时不导入这些模块
+VERIFY_MODES = ("substring", "ast")
+SEAL_BACKENDS = ("json", "sqlite")
+PROFILERS = ("cprofile", "tracemalloc")
+PROMPT_MODES = ("standard", "compact")
+MATCHERS = ("keyword", "ngram")
+
+# route 命令每次批量匹配的需求数
+ROUTE_CHUNK = 1024
+
+# 与 odd.file_verifier.DEFAULT_CHUNK_SIZE 一致 (构建参数解析器时不导入该模块)
+VERIFY_CHUNK_SIZE = 4 * 1024 * 1024
+
+timings = Timings()
+timings.started = _MAIN_LOADED
+
+
+def load_env():
+    """加载 .env (仅需要 API Key 或 ODD_* 配置的子命令调用)"""
+    with timings.stage("import dotenv + load .env"):
+        from dotenv import load_dotenv
+        load_dotenv()
+
+
+class LazyConsole:
+    """首次使用时才导入 rich 并创建 Console"""
+
+    _console = None
+
+    def __getattr__(self, name):
+        if LazyConsole._console is None:
+            with timings.stage("import rich"):
+                from rich.console import Console
+                LazyConsole._console = Console()
+        return getattr(LazyConsole._console, name)
+
+
+console = LazyConsole()
+
 
-console = Console()
+class QuietConsole:
+    """静默控制台：直接丢弃输出，跳过 rich 的渲染开销 (Console(quiet=True) 仍会渲染后再丢弃)"""
 
+    def print(self, *args, **kwargs):
+        pass
 
-def run_odd_demo(requirement: str, save_code: bool = True) -> dict:
-    """执行完整 ODD 流程"""
+
+quiet_console = QuietConsole()
+
+
+def run_odd_demo(requirement: str, save_code: bool = True, quiet: bool = False, use_cache: bool = None,
+                 verify_mode: str = "substring", seal_backend: str = None, stream: bool = False,
+                 trace: bool = False, profile: str = None, seal_writer=None, n_candidates: int = 1,
+                 prompt_mode: str = None, token_budget: int = None, matcher: str = None,
+                 dynamic: bool = False, decompose: bool = False, min_score: float = None) -> dict:
+    """执行完整 ODD 流程；quiet=True 时不渲染每一步的 Panel/Table，use_cache=False 时绕过 LLM 响应缓存
+    (None 时由 ODD_LLM_CACHE 决定)；传入 seal_writer (odd.seal_writer.SealWriter) 时封存交给其后台线程按组提交
+    
+    n_candidates > 1 时并发生成 N 个候选 (温度递增) 并逐个验证，有候选通过全部 critical 规则即取消其余请求，
+    按严重度加权得分选出最优候选；全部候选的验证摘要写入 verification["candidates"] 并随之封存。
+    prompt_mode / token_budget 传给 CodeGenerator (None 时读取 ODD_PROMPT_MODE / ODD_PROMPT_TOKEN_BUDGET)，
+    matcher 传给 ContractGenerator (None 时读取 ODD_MATCHER)。
+    dynamic=True 时在静态验证之后，于进程内共享的沙箱工作进程池中导入生成的代码并发送契约声明的探测请求
+    (见 odd.dynamic_verifier)。
+    decompose=True 时取得分不低于 min_score 的全部产出物类型：匹配到多个时并发生成并验证各部分的代码，
+    各部分分别封存后再写一条引用全部组成部分的组合封存 (见 odd.composite)；只匹配到一个时与普通流程相同。
+    
+    trace=True (或指定 profile 为 cprofile/tracemalloc) 时记录各步骤及子操作的 span：
+    追踪数据附加到封存记录的 telemetry 字段与返回值，耗时/token 数记入进程内指标 (odd.telemetry.METRICS)。
+    """
+    if not (trace or profile):
+        return _run_pipeline(requirement, save_code, quiet, use_cache, verify_mode, seal_backend, stream,
+                             seal_writer=seal_writer, n_candidates=n_candidates, prompt_mode=prompt_mode,
+                             token_budget=token_budget, matcher=matcher, dynamic=dynamic, decompose=decompose,
+                             min_score=min_score)
+    
+    from odd.telemetry import METRICS, Tracer
+    tracer = Tracer(profile=profile)
+    with tracer.trace("odd.run"):
+        results = _run_pipeline(requirement, save_code, quiet, use_cache, verify_mode, seal_backend, stream, tracer,
+                                seal_writer, n_candidates, prompt_mode, token_budget, matcher, dynamic, decompose,
+                                min_score)
+    contract = results.get("contract") or {}
+    METRICS.observe_trace(tracer, artifact_type=contract.get("artifact_type"), model=results.get("model"),
+                          tokens_used=results.get("tokens_used"), error=bool(results.get("error")))
+    results["telemetry"] = tracer.to_dict()
+    return results
+
+
+def _run_pipeline(requirement: str, save_code: bool, quiet: bool, use_cache: bool, verify_mode: str,
+                  seal_backend, stream: bool, tracer=None, seal_writer=None, n_candidates: int = 1,
+                  prompt_mode: str = None, token_budget: int = None, matcher: str = None,
+                  dynamic: bool = False, decompose: bool = False, min_score: float = None) -> dict:
+    with timings.stage("import pipeline"):
+        from rich.panel import Panel
+        from rich.table import Table
+        from odd.contract_generator import ContractGenerator
+        from odd.code_generator import CodeGenerator
+        from odd.contract_verifier import ContractVerifier
+        from odd.seal_manager import SealManager
+        from odd.telemetry import span
+    
+    out = quiet_console if quiet else console
     results = {"requirement": requirement, "timestamp": datetime.now().isoformat()}
     
     # Step 1: 契约生成
-    console.print(Panel("[bold cyan]Step 1: 契约生成[/bold cyan]"))
-    contract_gen = ContractGenerator()
-    contract = contract_gen.generate_contract(requirement)
+    out.print(Panel("[bold cyan]Step 1: 契约生成[/bold cyan]"))
+    parts = None
+    with timings.stage("step1.contract"), span("contract", profile=True):
+        contract_gen = ContractGenerator(matcher=matcher)
+        if decompose:
+            parts = contract_gen.decompose(requirement, min_score)
+            contract = parts[0]['contract'] if parts else {
+                "error": True, "message": f"无法匹配需求到已知产出物类型: {requirement}"}
+        else:
+            contract = contract_gen.generate_contract(requirement)
     
     if contract.get('error'):
-        console.print(f"[red]错误: {contract.get('message')}[/red]")
+        out.print(f"[red]错误: {contract.get('message')}[/red]")
         return {"error": True, "message": contract.get('message')}
     
-    console.print(f"[green]✓[/green] 匹配到产出物类型: [bold]{contract['artifact_type']}[/bold]")
-    console.print(f"[green]✓[/green] 契约ID: {contract['contract_id'][:8]}...")
+    if parts and len(parts) > 1:
+        return _run_composite(requirement, parts, out, quiet, save_code, use_cache, verify_mode, seal_backend,
+                              tracer, seal_writer, n_candidates, prompt_mode, token_budget, dynamic)
+    
+    out.print(f"[green]✓[/green] 匹配到产出物类型: [bold]{contract['artifact_type']}[/bold]")
+    out.print(f"[green]✓[/green] 契约ID: {contract['contract_id'][:8]}...")
     results["contract"] = contract
+    verifier = ContractVerifier(mode=verify_mode, dynamic=dynamic)
+    verification = None
     
     # Step 2: 代码生成
-    console.print(Panel("[bold cyan]Step 2: 代码生成 (GPT-4)[/bold cyan]"))
+    out.print(Panel("[bold cyan]Step 2: 代码生成 (GPT-4)[/bold cyan]"))
     try:
-        code_gen = CodeGenerator()
-        code_result = code_gen.generate_code(contract)
+        with timings.stage("step2.generate"), span("generate", profile=True, streamed=stream, candidates=n_candidates):
+            code_gen = CodeGenerator(use_cache=use_cache, prompt_mode=prompt_mode, token_budget=token_budget)
+            if n_candidates > 1:
+                # 候选在返回时即已验证，Step 3 直接使用选中候选的验证结果
+                from odd.candidates import best_of_n
+                code_result, verification = best_of_n(code_gen, contract, verifier, n_candidates)
+            elif stream:
+                code_result = code_gen.generate_code_stream(
+                    contract,
+                    on_chunk=lambda text: out.print(text, end="", markup=False, highlight=False),
+                    on_abort=lambda v, attempt: out.print(
+                        f"\n[red]✗ 第 {attempt} 次生成中止: 违反「{v['rule']}」(检测到 {v['found']!r}，已生成 {v['chars_generated']} 字符)[/red]"),
+                    exclude_reasons=_structural_reasons(contract) if verify_mode == "ast" else ()
+                )
+                out.print()
+            else:
+                code_result = code_gen.generate_code(contract)
         
         if code_result.get('error'):
-            console.print(f"[red]错误: {code_result.get('message')}[/red]")
+            out.print(f"[red]错误: {code_result.get('message')}[/red]")
             return {"error": True, "message": code_result.get('message')}
         
         code = code_result['code']
-        console.print(f"[green]✓[/green] 代码生成完成 (tokens: {code_result.get('tokens_used', 'N/A')})")
+        cache_note = " [dim](缓存命中)[/dim]" if code_result.get('cached') else ""
+        out.print(f"[green]✓[/green] 代码生成完成 (tokens: {code_result.get('tokens_used', 'N/A')}){cache_note}")
+        prompt = code_result.get('prompt')
+        if prompt:
+            dropped = f"，超出预算裁剪: {', '.join(prompt['dropped'])}" if prompt['dropped'] else ""
+            over = " [yellow](仍超出预算)[/yellow]" if prompt['over_budget'] else ""
+            out.print(f"[green]✓[/green] 提示词: {prompt['mode']}，输入 {prompt['total_tokens']} tokens "
+                      f"({prompt['tokenizer']}){dropped}{over}")
+        results["prompt"] = prompt
+        resilience = code_result.get('resilience')
+        if resilience and (resilience['retries'] or resilience['hedges'] or resilience['breaker'] != "closed"):
+            hedge_note = "，对冲请求胜出" if resilience['hedge_won'] else ""
+            out.print(f"[yellow]![/yellow] API 请求 {resilience['requests']} 次 (重试 {resilience['retries']}，"
+                      f"对冲 {resilience['hedges']}{hedge_note})，熔断器: {resilience['breaker']}")
+        results["resilience"] = resilience
+        if verification is not None and not quiet:
+            _print_candidates(verification['candidates'])
         results["code"] = code
+        results["tokens_used"] = code_result.get('tokens_used')
+        results["model"] = code_result.get('model')
     except ValueError as e:
-        console.print(f"[yellow]跳过代码生成: {e}[/yellow]")
+        out.print(f"[yellow]跳过代码生成: {e}[/yellow]")
         code = "# 代码生成跳过 (未配置 API Key)"
         results["code"] = code
     
     # Step 3: 契约验证
-    console.print(Panel("[bold cyan]Step 3: 契约验证[/bold cyan]"))
-    verifier = ContractVerifier()
-    verification = verifier.verify(code, contract['contract'].get('verification_hints', {}))
+    out.print(Panel("[bold cyan]Step 3: 契约验证[/bold cyan]"))
+    if verification is None:
+        with timings.stage("step3.verify"), span("verify", profile=True, mode=verify_mode):
+            verification = verifier.verify(code, contract['contract'].get('verification_hints', {}))
     
-    table = Table(title="验证结果")
-    table.add_column("规则", style="cyan")
-    table.add_column("状态", style="green")
-    table.add_column("详情")
-    
-    for check in verification['checks']:
-        status = "[green]✓ PASS[/green]" if check['passed'] else "[red]✗ FAIL[/red]"
-        table.add_row(check['rule'], status, str(check.get('found', '-')))
-    
-    console.print(table)
+    if not quiet:
+        table = Table(title="验证结果")
+        table.add_column("规则", style="cyan")
+        table.add_column("状态", style="green")
+        table.add_column("详情")
+        
+        for check in verification['checks']:
+            status = "[green]✓ PASS[/green]" if check['passed'] else "[red]✗ FAIL[/red]"
+            table.add_row(check['rule'], status, str(check.get('found', '-')))
+        
+        out.print(table)
     overall = "[green]通过[/green]" if verification['passed'] else "[red]未通过[/red]"
-    console.print(f"整体验证: {overall}")
+    out.print(f"整体验证: {overall}")
+    summary = verification.get('dynamic')
+    if summary:
+        limit = f"，[red]{summary['limit']}[/red]" if summary['limit'] else ""
+        sandbox = summary['sandbox'] or {}
+        out.print(f"[dim]动态验证: {summary['probes']} 个探测请求，耗时 {summary['elapsed_ms']} ms "
+                  f"(网络隔离: {sandbox.get('network', '-')}){limit}[/dim]")
     results["verification"] = verification
     
     # Step 4: 封存
-    console.print(Panel("[bold cyan]Step 4: 封存[/bold cyan]"))
-    sealer = SealManager()
-    seal_result = sealer.seal(requirement, contract, code, verification)
-    console.print(f"[green]✓[/green] 封存完成: {seal_result['file_path']}")
-    console.print(f"[green]✓[/green] 完整性哈希: {seal_result['integrity'][:16]}...")
+    out.print(Panel("[bold cyan]Step 4: 封存[/bold cyan]"))
+    with timings.stage("step4.seal"), span("seal", profile=True):
+        sealer = SealManager(backend=seal_backend, writer=seal_writer)
+        seal_result = sealer.seal(requirement, contract, code, verification, tracer=tracer)
+    out.print(f"[green]✓[/green] 封存完成: {seal_result['file_path']}")
+    out.print(f"[green]✓[/green] 完整性哈希: {seal_result['integrity'][:16]}...")
     results["seal"] = seal_result
     
     # 保存生成的代码
@@ -102,33 +250,686 @@ def run_odd_demo(requirement: str, save_code: bool = True) -> dict:
         code_file = output_dir / f"generated_{contract['artifact_type']}.py"
         with open(code_file, 'w', encoding='utf-8') as f:
             f.write(code)
-        console.print(f"[green]✓[/green] 代码已保存: {code_file}")
+        out.print(f"[green]✓[/green] 代码已保存: {code_file}")
+    
+    return results
+
+
+def _run_composite(requirement: str, parts: list, out, quiet: bool, save_code: bool, use_cache: bool,
+                   verify_mode: str, seal_backend, tracer=None, seal_writer=None, n_candidates: int = 1,
+                   prompt_mode: str = None, token_budget: int = None, dynamic: bool = False) -> dict:
+    """需求匹配到多个产出物类型：并发生成并验证各部分的代码，分别封存后再写组合封存"""
+    from rich.panel import Panel
+    from rich.table import Table
+    from odd.code_generator import CodeGenerator
+    from odd.composite import generate_parts_sync, seal_composite
+    from odd.contract_verifier import ContractVerifier
+    from odd.seal_manager import SealManager
+    from odd.telemetry import span
+    
+    results = {"requirement": requirement, "timestamp": datetime.now().isoformat()}
+    for part in parts:
+        out.print(f"[green]✓[/green] 匹配到产出物类型: [bold]{part['artifact_type']}[/bold] "
+                  f"(得分 {part['score']}，契约ID: {part['contract']['contract_id'][:8]}...)")
+    contracts = [part['contract'] for part in parts]
+    verifier = ContractVerifier(mode=verify_mode, dynamic=dynamic)
+    
+    # Step 2: 各部分并发生成，每个部分返回后即在线程中验证
+    out.print(Panel(f"[bold cyan]Step 2: 代码生成 ({len(parts)} 个产出物并发)[/bold cyan]"))
+    try:
+        with timings.stage("step2.generate"), span("generate", profile=True, parts=len(parts), candidates=n_candidates):
+            code_gen = CodeGenerator(use_cache=use_cache, prompt_mode=prompt_mode, token_budget=token_budget)
+            generated = generate_parts_sync(code_gen, contracts, verifier, n_candidates)
+    except ValueError as e:
+        out.print(f"[yellow]跳过代码生成: {e}[/yellow]")
+        generated = [({"code": "# 代码生成跳过 (未配置 API Key)"}, None) for _ in parts]
+    
+    failed = [(part, result) for part, (result, _) in zip(parts, generated) if result is not None and result.get('error')]
+    if failed:
+        for part, result in failed:
+            out.print(f"[red]错误: {part['artifact_type']}: {result.get('message')}[/red]")
+        message = "; ".join(f"{part['artifact_type']}: {result.get('message')}" for part, result in failed)
+        return {"error": True, "message": f"组成部分代码生成失败 ({message})"}
+    for part, (result, _) in zip(parts, generated):
+        if 'tokens_used' in result:
+            cache_note = " [dim](缓存命中)[/dim]" if result.get('cached') else ""
+            out.print(f"[green]✓[/green] {part['artifact_type']}: 代码生成完成 (tokens: {result.get('tokens_used', 'N/A')}){cache_note}")
     
+    # Step 3: 候选或并发流程中已验证的部分直接使用其验证结果
+    out.print(Panel("[bold cyan]Step 3: 契约验证[/bold cyan]"))
+    with timings.stage("step3.verify"), span("verify", profile=True, mode=verify_mode):
+        verifications = [verification if verification is not None
+                         else verifier.verify(result['code'], contract['contract'].get('verification_hints', {}))
+                         for contract, (result, verification) in zip(contracts, generated)]
+    if not quiet:
+        table = Table(title="验证结果")
+        table.add_column("产出物", style="magenta")
+        table.add_column("规则", style="cyan")
+        table.add_column("状态", style="green")
+        table.add_column("详情")
+        for part, verification in zip(parts, verifications):
+            for check in verification['checks']:
+                status = "[green]✓ PASS[/green]" if check['passed'] else "[red]✗ FAIL[/red]"
+                table.add_row(part['artifact_type'], check['rule'], status, str(check.get('found', '-')))
+        out.print(table)
+    for part, verification in zip(parts, verifications):
+        overall = "[green]通过[/green]" if verification['passed'] else "[red]未通过[/red]"
+        out.print(f"{part['artifact_type']}: {overall}")
+    
+    # Step 4: 各部分封存后再封存组合封存
+    out.print(Panel("[bold cyan]Step 4: 封存[/bold cyan]"))
+    part_records = [{"match": part, "contract": contract, "code": result['code'], "verification": verification}
+                    for part, contract, (result, _), verification in zip(parts, contracts, generated, verifications)]
+    with timings.stage("step4.seal"), span("seal", profile=True, parts=len(parts)):
+        sealer = SealManager(backend=seal_backend, writer=seal_writer)
+        contract, verification, seal_result = seal_composite(sealer, requirement, part_records, tracer=tracer)
+    for record in part_records:
+        out.print(f"[green]✓[/green] {record['contract']['artifact_type']} 封存: {record['seal']['file_path']}")
+    overall = "[green]通过[/green]" if verification['passed'] else "[red]未通过[/red]"
+    out.print(f"整体验证: {overall} ({len(parts)} 个组成部分)")
+    out.print(f"[green]✓[/green] 组合封存完成: {seal_result['file_path']}")
+    out.print(f"[green]✓[/green] 完整性哈希: {seal_result['integrity'][:16]}...")
+    
+    if save_code:
+        output_dir = Path(__file__).parent / "output"
+        for record in part_records:
+            code_file = output_dir / f"generated_{record['contract']['artifact_type']}.py"
+            with open(code_file, 'w', encoding='utf-8') as f:
+                f.write(record['code'])
+            out.print(f"[green]✓[/green] 代码已保存: {code_file}")
+    
+    results.update({
+        "contract": contract,
+        "verification": verification,
+        "seal": seal_result,
+        "tokens_used": sum(result.get('tokens_used') or 0 for result, _ in generated),
+        "model": next((result.get('model') for result, _ in generated if result.get('model')), None),
+        "parts": [{
+            "artifact_type": record['contract']['artifact_type'],
+            "score": record['match']['score'],
+            "contract": record['contract'],
+            "code": record['code'],
+            "tokens_used": result.get('tokens_used'),
+            "resilience": result.get('resilience'),
+            "verification": record['verification'],
+            "seal": record['seal'],
+        } for record, (result, _) in zip(part_records, generated)],
+    })
+    return results
+
+
+def _print_candidates(candidates: list):
+    from rich.table import Table
+    table = Table(title="候选")
+    for column in ("#", "温度", "状态", "得分", "未通过规则", "tokens", "耗时 (ms)"):
+        table.add_column(column)
+    for c in candidates:
+        status = {"verified": "[green]已验证[/green]" if not c.get('critical_failed') else "[red]critical 未通过[/red]",
+                  "error": "[red]失败[/red]", "cancelled": "[dim]已取消[/dim]"}[c['status']]
+        if c.get('selected'):
+            status += " [bold]✓ 选中[/bold]"
+        table.add_row(str(c['index']), str(c['temperature']), status, str(c.get('score', '-')),
+                      ", ".join(c.get('failed_rules', [])) or c.get('message', '-'), str(c.get('tokens_used', '-')),
+                      str(c['elapsed_ms'] if c['elapsed_ms'] is not None else '-'))
+    console.print(table)
+
+
+def _structural_reasons(contract: dict) -> tuple:
+    """ast 模式下已由结构化规则替代的子串规则，流式生成时不据此中止"""
+    hints = contract['contract'].get('verification_hints', {})
+    return tuple(rule.get('reason') for rule in hints.get('structural', []) or [])
+
+
+def run_batch(args) -> dict:
+    """批量执行 JSONL 中的需求"""
+    from rich.table import Table
+    from odd.batch_runner import BatchRunner
+    from odd.seal_manager import SealManager
+    from odd.seal_writer import SealWriter
+
+    output_path = Path(args.output) if args.output else Path(args.input).with_suffix(".results.jsonl")
+    checkpoint_path = args.checkpoint or str(output_path) + ".ckpt"
+
+    def pipeline(requirement: str) -> dict:
+        # 并发运行时多个需求可能对应同一产出物类型，不写 generated_<type>.py 以免互相覆盖
+        return run_odd_demo(requirement, save_code=False, quiet=args.quiet, use_cache=False if args.no_cache else None,
+                            verify_mode=args.verify_mode, seal_backend=args.seal_backend,
+                            trace=args.trace or bool(args.metrics_file), profile=args.profile,
+                            seal_writer=seal_writer, n_candidates=args.candidates, prompt_mode=args.prompt_mode,
+                            token_budget=args.token_budget, matcher=args.matcher, dynamic=args.dynamic,
+                            decompose=args.decompose, min_score=args.min_score)
+
+    def on_result(record: dict):
+        if record.get('error'):
+            console.print(f"[red]✗[/red] {record['id']}: {record.get('message')}")
+        else:
+            status = "[green]PASS[/green]" if record.get('passed') else "[red]FAIL[/red]"
+            console.print(f"[green]✓[/green] {record['id']}: {record.get('artifact_type')} {status} seal={str(record.get('seal_id'))[:8]}")
+
+    # 各工作线程的封存交给同一个后台写入线程，并发完成的封存合并为一次提交/一轮 fsync
+    runner = BatchRunner(pipeline, workers=args.workers, checkpoint_path=checkpoint_path)
+    with SealWriter(SealManager(backend=args.seal_backend).backend, max_queue=args.workers * 2) as seal_writer:
+        summary = runner.run(args.input, str(output_path), resume=not args.no_resume, on_result=on_result)
+    summary["seal_batches"] = seal_writer.stats["batches"]
+
+    table = Table(title="批量运行汇总")
+    table.add_column("指标", style="cyan")
+    table.add_column("数值")
+    for key in ("total", "skipped", "sealed", "passed", "failed", "errors", "seal_batches", "elapsed_s"):
+        table.add_row(key, str(summary[key]))
+    console.print(table)
+    console.print(f"[green]✓[/green] 结果已写入: {output_path}")
+    if args.metrics_file:
+        _write_metrics(args.metrics_file)
+    return summary
+
+
+def _print_trace(telemetry: dict):
+    """以缩进树形式输出各 span 耗时"""
+    from rich.table import Table
+    table = Table(title=f"追踪 {telemetry['trace_id'][:8]}")
+    table.add_column("span", style="cyan")
+    table.add_column("开始 (ms)", justify="right")
+    table.add_column("耗时 (ms)", justify="right")
+    table.add_column("属性")
+
+    def add(node: dict, depth: int):
+        attrs = {k: v for k, v in node.get('attrs', {}).items() if k != 'profile'}
+        duration = node['duration_ms']
+        table.add_row("  " * depth + node['name'], f"{node['start_ms']:.1f}",
+                      "-" if duration is None else f"{duration:.2f}", ", ".join(f"{k}={v}" for k, v in attrs.items()))
+        for child in node.get('children', []):
+            add(child, depth + 1)
+
+    for root in telemetry['spans']:
+        add(root, 0)
+    console.print(table)
+    for node in _iter_spans(telemetry['spans']):
+        profile = node.get('attrs', {}).get('profile')
+        if profile:
+            console.print(f"[bold]{node['name']}[/bold] {profile['kind']}:")
+            console.print_json(json.dumps(profile, ensure_ascii=False))
+
+
+def _iter_spans(nodes: list):
+    for node in nodes:
+        yield node
+        yield from _iter_spans(node.get('children', []))
+
+
+def _write_metrics(path: str):
+    from odd.telemetry import METRICS
+    METRICS.write_prometheus(path)
+    console.print(f"[green]✓[/green] 指标已写入: {path}")
+
+
+def run_audit(args) -> dict:
+    """并行审计全部封存并输出 Merkle 根"""
+    from rich.table import Table
+    from odd.seal_manager import SealManager
+    from odd.seal_auditor import SealAuditor
+
+    output_dir = Path(args.output_dir) if args.output_dir else Path(__file__).parent / "output"
+    backend = SealManager(output_dir, backend=args.seal_backend).backend
+    report = SealAuditor(backend, workers=args.workers).audit(full=args.full)
+
+    table = Table(title="封存审计")
+    table.add_column("指标", style="cyan")
+    table.add_column("数值")
+    for key in ("total", "audited", "skipped", "failed", "elapsed_s"):
+        table.add_row(key, str(report[key]))
+    console.print(table)
+    for failure in report['failures']:
+        console.print(f"[red]✗[/red] {failure['key']}: {'; '.join(failure['errors'])}")
+    console.print(f"Merkle 根: [bold]{report['merkle_root']}[/bold]")
+    changed = report['changed_since_last']
+    if changed and (changed['added'] or changed['removed'] or changed['modified']):
+        console.print(f"[yellow]自上次审计以来: 新增 {len(changed['added'])}，删除 {len(changed['removed'])}，"
+                      f"变化 {len(changed['modified'])}[/yellow]")
+        for seal_id in changed['modified']:
+            console.print(f"[yellow]  变化: {seal_id}[/yellow]")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def run_verify(args) -> dict:
+    """不经过 LLM，按产出物类型的验证规则并行验证已有的代码文件或目录，逐文件输出 JSONL"""
+    from rich.console import Console
+    from rich.table import Table
+    from odd.contract_generator import ContractGenerator
+    from odd.file_verifier import CACHE_FILE, DEFAULT_PATTERNS, FileVerifier
+
+    library = ContractGenerator().library
+    if args.artifact_type not in library.artifacts:
+        console.print(f"[red]错误: 未知的产出物类型: {args.artifact_type}，可选 {', '.join(library.artifacts)}[/red]")
+        return {"error": True}
+    hints = library.artifacts[args.artifact_type].get('verification_hints', {}) or {}
+    cache_path = None
+    if args.incremental:
+        cache_path = Path(args.cache) if args.cache else Path(__file__).parent / "output" / CACHE_FILE
+    verifier = FileVerifier(hints, mode=args.verify_mode, workers=args.workers, chunk_size=args.chunk_size,
+                            cache_path=cache_path)
+
+    # JSONL 写到标准输出时，汇总与逐文件状态改写到标准错误，便于重定向
+    to_stdout = args.output in (None, "-")
+    out = Console(stderr=True) if to_stdout else console
+    out_file = sys.stdout if to_stdout else open(args.output, 'w', encoding='utf-8')
+
+    def on_result(record: dict):
+        out_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if record.get('error'):
+            out.print(f"[red]✗[/red] {record['path']}: {record['message']}")
+        elif not record['passed']:
+            out.print(f"[red]✗[/red] {record['path']}: {', '.join(record['failed_rules'])}")
+
+    try:
+        summary = verifier.run(args.paths, patterns=args.glob or DEFAULT_PATTERNS, on_result=on_result)
+    finally:
+        if not to_stdout:
+            out_file.close()
+
+    table = Table(title=f"文件验证 ({args.artifact_type}, {args.verify_mode})")
+    table.add_column("指标", style="cyan")
+    table.add_column("数值")
+    for key in ("files", "passed", "failed", "errors", "cached", "bytes", "elapsed_s", "mb_per_s"):
+        table.add_row(key, str(summary[key]))
+    out.print(table)
+    if summary['rule_failures']:
+        rules = Table(title="未通过的规则")
+        rules.add_column("规则", style="cyan")
+        rules.add_column("文件数", justify="right")
+        for rule, count in sorted(summary['rule_failures'].items(), key=lambda item: -item[1]):
+            rules.add_row(rule, str(count))
+        out.print(rules)
+    if not to_stdout:
+        out.print(f"[green]✓[/green] 结果已写入: {args.output}")
+    return summary
+
+
+def run_reverify(args) -> dict:
+    """标准库规则变化后，只重新验证受影响的封存"""
+    from rich.table import Table
+    from odd.contract_generator import ContractGenerator
+    from odd.seal_manager import SealManager
+    from odd.reverifier import Reverifier
+
+    output_dir = Path(args.output_dir) if args.output_dir else Path(__file__).parent / "output"
+    backend = SealManager(output_dir, backend=args.seal_backend).backend
+    reverifier = Reverifier(backend, ContractGenerator().library, workers=args.workers, verify_mode=args.verify_mode)
+    try:
+        report = reverifier.run(artifact_type=args.artifact_type, dry_run=args.dry_run)
+    finally:
+        reverifier.close()
+
+    table = Table(title="规则变化 (按产出物类型)")
+    table.add_column("产出物类型", style="cyan")
+    table.add_column("规则已是最新")
+    table.add_column("受影响封存")
+    table.add_column("规则变化")
+    for a_type, entry in report['plan']['artifact_types'].items():
+        changes = []
+        for stale in entry['stale']:
+            for kind, label in (("added", "+"), ("removed", "-"), ("modified", "~")):
+                changes.extend(f"{label}{rule}" for rule in stale['changes'][kind])
+        table.add_row(a_type, str(entry['up_to_date']), str(sum(s['seals'] for s in entry['stale'])),
+                      "\n".join(sorted(set(changes))) or "-")
+    console.print(table)
+    for a_type, count in report['plan']['unknown_types'].items():
+        console.print(f"[yellow]标准库中已没有产出物类型 {a_type}，跳过 {count} 个封存[/yellow]")
+    console.print(f"索引: 新增 {report['synced']['indexed']}，移除 {report['synced']['removed']}；"
+                  f"受影响 {report['affected']}，已重新验证 {report['reverified']} ({report['elapsed_s']}s)")
+    for entry in report['newly_failing']:
+        console.print(f"[red]✗[/red] {entry['parent_seal_id'][:8]} → {entry['seal_id'][:8]} 现在未通过")
+    for entry in report['newly_passing']:
+        console.print(f"[green]✓[/green] {entry['parent_seal_id'][:8]} → {entry['seal_id'][:8]} 现在通过")
+    for error in report['errors']:
+        console.print(f"[red]✗[/red] {error['seal_id']}: {error['error']}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+def run_regenerate(args) -> dict:
+    """以封存中的代码为基础，只请求补丁修复未通过的规则或适配契约变化"""
+    from rich.syntax import Syntax
+    from rich.table import Table
+    from odd.code_generator import CodeGenerator
+    from odd.contract_generator import ContractGenerator
+    from odd.regenerator import Regenerator
+    from odd.seal_manager import SealManager
+
+    output_dir = Path(args.output_dir) if args.output_dir else Path(__file__).parent / "output"
+    regenerator = Regenerator(SealManager(output_dir, backend=args.seal_backend), ContractGenerator().library,
+                              CodeGenerator(use_cache=False if args.no_cache else None), verify_mode=args.verify_mode,
+                              dynamic=args.dynamic, max_attempts=args.max_attempts, fallback=not args.no_fallback)
+    results = regenerator.regenerate(args.seal_id)
+    for attempt in results.get('attempts', []):
+        if attempt['error']:
+            console.print(f"[yellow]![/yellow] 第 {attempt['attempt']} 次补丁无法使用: {attempt['error']}")
+    if results.get('error'):
+        console.print(f"[red]错误: {results.get('message')}[/red]")
+        return results
+
+    for change in results['contract_changes']['rules']:
+        label = {"added": "+", "removed": "-", "modified": "~"}[change['change']]
+        console.print(f"[cyan]契约变化[/cyan] {label}{change['type']}:{change['reason']}")
+    for check in results['failed_rules']:
+        console.print(f"[red]✗[/red] 原封存未通过: {check['rule']} ({check.get('found')})")
+    if results['mode'] == "patch":
+        console.print(Syntax(results['patch'], "diff", theme="ansi_dark"))
+    else:
+        console.print("[yellow]补丁均无法应用，已退回完整生成[/yellow]")
+
+    verification = results['verification']
+    table = Table(title="验证结果")
+    table.add_column("规则", style="cyan")
+    table.add_column("状态", style="green")
+    table.add_column("详情")
+    reverified = set(verification['regeneration']['reverified_rules'])
+    for check in verification['checks']:
+        status = "[green]✓ PASS[/green]" if check['passed'] else "[red]✗ FAIL[/red]"
+        note = "" if check['rule'] in reverified or check['type'] in ("dynamic", "probe") else " [dim](沿用)[/dim]"
+        table.add_row(check['rule'], status + note, str(check.get('found', '-')))
+    console.print(table)
+    overall = "[green]通过[/green]" if verification['passed'] else "[red]未通过[/red]"
+    summary = verification['regeneration']
+    console.print(f"整体验证: {overall} (模式 {results['mode']}，重新验证 {len(summary['reverified_rules'])} 条规则，"
+                  f"沿用 {summary['carried_rules']} 条；tokens: {results['tokens_used']}，{results['elapsed_s']}s)")
+    console.print(f"[green]✓[/green] 封存完成: {results['seal']['file_path']} "
+                  f"(取代 {results['parent_seal_id'][:8]})")
+    if args.output:
+        Path(args.output).write_text(results['code'], encoding='utf-8')
+        console.print(f"[green]✓[/green] 代码已保存: {args.output}")
     return results
 
 
+def run_serve(args):
+    """启动常驻服务，直到 SIGTERM/SIGINT 后排空退出"""
+    import asyncio
+    from odd.server import serve
+
+    def on_ready(server):
+        console.print(f"[green]✓[/green] ODD 服务已启动: http://{server.host}:{server.port} "
+                      f"(verify={args.verify_mode}, seal={server.service.sealer.backend.name}, workers={args.workers})")
+        if server.service.code_gen is None:
+            console.print(f"[yellow]/generate 不可用: {server.service.code_gen_error}[/yellow]")
+
+    try:
+        asyncio.run(serve(args.host, args.port, drain_timeout=args.drain_timeout, on_ready=on_ready,
+                          verify_mode=args.verify_mode, seal_backend=args.seal_backend,
+                          use_cache=False if args.no_cache else None, workers=args.workers, trace=args.trace,
+                          output_dir=args.output_dir, prompt_mode=args.prompt_mode, token_budget=args.token_budget,
+                          matcher=args.matcher, dynamic=args.dynamic))
+    except KeyboardInterrupt:
+        pass
+    console.print("[green]✓[/green] 服务已停止")
+
+
+def run_route(args) -> dict:
+    """只做需求路由：按块批量匹配 JSONL 中的需求，写出每条需求的候选产出物类型"""
+    from odd.batch_runner import BatchRunner
+    from odd.contract_generator import ContractGenerator
+
+    gen = ContractGenerator(matcher=args.matcher)
+    output_path = Path(args.output) if args.output else Path(args.input).with_suffix(".routes.jsonl")
+    summary = {"total": 0, "matched": 0, "unmatched": 0, "matcher": gen.matcher}
+    started = time.perf_counter()
+    items = BatchRunner.iter_requirements(args.input)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        while True:
+            chunk = [item for _, item in zip(range(ROUTE_CHUNK), items)]
+            if not chunk:
+                break
+            for (item_id, requirement), candidates in zip(chunk, gen.match_many([r for _, r in chunk], args.top_k)):
+                f.write(json.dumps({"id": item_id, "requirement": requirement, "candidates": candidates},
+                                   ensure_ascii=False) + "\n")
+                summary["matched" if candidates else "unmatched"] += 1
+            summary["total"] += len(chunk)
+    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+    return summary
+
+
+def _add_matcher_arg(parser):
+    parser.add_argument("--matcher", choices=MATCHERS, default=None,
+                        help="需求匹配器: keyword 或 ngram (字符 n-gram TF-IDF，需要 numpy；默认读取 ODD_MATCHER)")
+
+
+def _add_prompt_args(parser):
+    parser.add_argument("--prompt-mode", choices=PROMPT_MODES, default=None,
+                        help="提示词模式: standard 或 compact (固定章节在前、需求在后、紧凑 JSON；默认读取 ODD_PROMPT_MODE)")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="compact 模式的输入 token 预算，超出时按严重度从低到高裁剪提示 (critical 不裁剪)")
+
+
+def _add_decompose_args(parser):
+    parser.add_argument("--decompose", action="store_true",
+                        help="需求涉及多个产出物类型时分别生成契约，并发生成/验证各部分代码并写组合封存")
+    parser.add_argument("--min-score", type=float, default=None,
+                        help="--decompose 时产出物类型的最低得分 (关键词匹配为命中的关键词数，ngram 为余弦相似度)")
+
+
+def _add_dynamic_arg(parser):
+    parser.add_argument("--dynamic", action="store_true",
+                        help="静态验证之后在沙箱工作进程中导入生成的代码并发送契约声明的探测请求 (进程数默认 CPU 核数)")
+
+
+def _add_telemetry_args(parser):
+    parser.add_argument("--trace", action="store_true", help="记录各步骤及子操作的 span，附加到封存记录的 telemetry 字段")
+    parser.add_argument("--profile", choices=PROFILERS, default=None, help="对每个步骤做 cProfile 或 tracemalloc 剖析 (隐含 --trace)")
+    parser.add_argument("--metrics-file", type=str, default=None, help="把耗时/token 直方图写入 Prometheus 文本文件 (隐含 --trace)")
+
+
 def main():
     parser = argparse.ArgumentParser(description="ODD Demo - Output-Driven Development 概念验证")
+    parser.add_argument("--timings", action="store_true", help="在 stderr 输出模块导入与各阶段耗时")
     subparsers = parser.add_subparsers(dest="command", help="可用命令")
     
     # generate 命令
     gen_parser = subparsers.add_parser("generate", help="执行完整 ODD 流程")
     gen_parser.add_argument("requirement", type=str, help="自然语言需求")
     gen_parser.add_argument("--no-save", action="store_true", help="不保存生成的代码")
+    gen_parser.add_argument("--no-cache", action="store_true", help="绕过 LLM 响应缓存")
+    gen_parser.add_argument("--verify-mode", choices=VERIFY_MODES, default="substring", help="验证模式: substring (子串) 或 ast (语法树结构)")
+    gen_parser.add_argument("--seal-backend", choices=SEAL_BACKENDS, default=None, help="封存后端 (默认读取 ODD_SEAL_BACKEND，未设置时为 json)")
+    gen_parser.add_argument("--stream", action="store_true", help="流式生成并实时显示代码，违反关键规则时立即中止并重试")
+    gen_parser.add_argument("-n", "--candidates", type=int, default=1, help="并发生成的候选数，有候选通过全部 critical 规则即取消其余")
+    _add_prompt_args(gen_parser)
+    _add_matcher_arg(gen_parser)
+    _add_decompose_args(gen_parser)
+    _add_dynamic_arg(gen_parser)
+    _add_telemetry_args(gen_parser)
     
     # contract 命令 (仅生成契约)
     contract_parser = subparsers.add_parser("contract", help="仅生成契约")
     contract_parser.add_argument("requirement", type=str, help="自然语言需求")
+    _add_matcher_arg(contract_parser)
+    
+    # route 命令 (只做需求路由)
+    route_parser = subparsers.add_parser("route", help="批量匹配 JSONL 中的需求到产出物类型 (不生成代码)")
+    route_parser.add_argument("input", type=str, help="需求 JSONL 文件，格式同 batch")
+    route_parser.add_argument("-o", "--output", type=str, default=None, help="结果 JSONL 路径 (默认 <input>.routes.jsonl)")
+    route_parser.add_argument("-k", "--top-k", type=int, default=3, help="每条需求输出的候选数")
+    _add_matcher_arg(route_parser)
+    
+    # batch 命令 (从 JSONL 批量执行)
+    batch_parser = subparsers.add_parser("batch", help="从 JSONL 批量执行 ODD 流程")
+    batch_parser.add_argument("input", type=str, help="需求 JSONL 文件，每行 {\"id\": ..., \"requirement\": ...}")
+    batch_parser.add_argument("-o", "--output", type=str, default=None, help="结果 JSONL 路径 (默认 <input>.results.jsonl)")
+    batch_parser.add_argument("-w", "--workers", type=int, default=4, help="并发工作线程数")
+    batch_parser.add_argument("--checkpoint", type=str, default=None, help="检查点文件路径 (默认 <output>.ckpt)")
+    batch_parser.add_argument("--no-resume", action="store_true", help="忽略已有检查点，从头运行")
+    batch_parser.add_argument("-q", "--quiet", action="store_true", help="不输出每一步的 Panel/Table，只输出每条结果")
+    batch_parser.add_argument("--no-cache", action="store_true", help="绕过 LLM 响应缓存")
+    batch_parser.add_argument("--verify-mode", choices=VERIFY_MODES, default="substring", help="验证模式: substring 或 ast")
+    batch_parser.add_argument("--seal-backend", choices=SEAL_BACKENDS, default=None, help="封存后端: json 或 sqlite")
+    batch_parser.add_argument("-n", "--candidates", type=int, default=1, help="每条需求并发生成的候选数")
+    _add_prompt_args(batch_parser)
+    _add_matcher_arg(batch_parser)
+    _add_decompose_args(batch_parser)
+    _add_dynamic_arg(batch_parser)
+    _add_telemetry_args(batch_parser)
+    
+    # shard-library 命令 (单文件标准库拆分为索引 + 分片)
+    shard_parser = subparsers.add_parser("shard-library", help="把单文件标准库拆分为分片布局 (索引 + 每个产出物一个文件)")
+    shard_parser.add_argument("--src", type=str, default=None, help="单文件标准库 (默认 artifacts/standards/standard_library.yaml)")
+    shard_parser.add_argument("-o", "--output", type=str, default=None, help="分片目录 (默认与 --src 同目录下的 sharded/)")
+    
+    # migrate-seals 命令 (JSON 封存导入 SQLite 封存库)
+    migrate_parser = subparsers.add_parser("migrate-seals", help="把 seal_*.json 导入 SQLite 封存库")
+    migrate_parser.add_argument("--src", type=str, default=None, help="JSON 封存目录 (默认 output/)")
+    migrate_parser.add_argument("--output-dir", type=str, default=None, help="封存库所在目录 (默认与 --src 相同)")
+    
+    # audit 命令 (重新校验全部封存)
+    audit_parser = subparsers.add_parser("audit", help="并行重算全部封存的哈希并生成 Merkle 根")
+    audit_parser.add_argument("--output-dir", type=str, default=None, help="封存目录 (默认 output/)")
+    audit_parser.add_argument("--seal-backend", choices=SEAL_BACKENDS, default=None, help="封存后端: json 或 sqlite")
+    audit_parser.add_argument("-w", "--workers", type=int, default=None, help="工作进程数 (默认 CPU 核数)")
+    audit_parser.add_argument("--full", action="store_true", help="忽略增量状态，重算全部封存")
+    audit_parser.add_argument("--report", type=str, default=None, help="把审计报告写入 JSON 文件")
+    
+    # verify 命令 (不经过 LLM 验证已有代码)
+    verify_parser = subparsers.add_parser("verify", help="按产出物类型的验证规则并行验证已有的代码文件或目录")
+    verify_parser.add_argument("artifact_type", type=str, help="标准库中的产出物类型，如 auth_login")
+    verify_parser.add_argument("paths", nargs="+", help="文件或目录 (目录递归查找 --glob 匹配的文件)")
+    verify_parser.add_argument("-o", "--output", type=str, default=None, help="逐文件结果 JSONL 路径 (默认标准输出)")
+    verify_parser.add_argument("-w", "--workers", type=int, default=None, help="工作进程数 (默认 CPU 核数)")
+    verify_parser.add_argument("--verify-mode", choices=VERIFY_MODES, default="substring",
+                               help="验证模式: substring (大文件经 mmap 分块扫描) 或 ast (整体读取并解析)")
+    verify_parser.add_argument("--glob", action="append", default=None, help="目录中要验证的文件名模式 (可重复，默认 *.py)")
+    verify_parser.add_argument("--chunk-size", type=int, default=VERIFY_CHUNK_SIZE, help="mmap 每块读取的字节数")
+    verify_parser.add_argument("--incremental", action="store_true",
+                               help="跳过内容哈希已在同一规则集下验证过的文件 (缓存默认 output/.verify_cache.sqlite)")
+    verify_parser.add_argument("--cache", type=str, default=None, help="增量缓存路径")
+    
+    # reverify 命令 (规则变化后增量重新验证)
+    reverify_parser = subparsers.add_parser("reverify", help="标准库验证规则变化后，只重新验证受影响的封存")
+    reverify_parser.add_argument("--output-dir", type=str, default=None, help="封存目录 (默认 output/)")
+    reverify_parser.add_argument("--seal-backend", choices=SEAL_BACKENDS, default=None, help="封存后端: json 或 sqlite")
+    reverify_parser.add_argument("-w", "--workers", type=int, default=None, help="工作进程数 (默认 CPU 核数)")
+    reverify_parser.add_argument("--artifact-type", type=str, default=None, help="只处理指定产出物类型")
+    reverify_parser.add_argument("--verify-mode", choices=VERIFY_MODES, default=None, help="验证模式 (默认沿用各封存原来的模式)")
+    reverify_parser.add_argument("--dry-run", action="store_true", help="只同步索引并列出受影响的封存，不重新验证")
+    reverify_parser.add_argument("--report", type=str, default=None, help="把报告写入 JSON 文件")
+    
+    # regenerate 命令 (基于补丁的增量重新生成)
+    regen_parser = subparsers.add_parser("regenerate", help="以封存的代码为基础，只请求补丁修复未通过的规则或适配契约变化")
+    regen_parser.add_argument("seal_id", type=str, help="原封存 ID (可用前缀)")
+    regen_parser.add_argument("--output-dir", type=str, default=None, help="封存目录 (默认 output/)")
+    regen_parser.add_argument("--seal-backend", choices=SEAL_BACKENDS, default=None, help="封存后端: json 或 sqlite")
+    regen_parser.add_argument("--verify-mode", choices=VERIFY_MODES, default=None, help="验证模式 (默认沿用原封存的模式)")
+    regen_parser.add_argument("--max-attempts", type=int, default=2, help="补丁无法应用或无法编译时的请求次数上限")
+    regen_parser.add_argument("--no-fallback", action="store_true", help="补丁均无法应用时报错，不退回完整生成")
+    regen_parser.add_argument("--no-cache", action="store_true", help="绕过 LLM 响应缓存")
+    regen_parser.add_argument("-o", "--output", type=str, default=None, help="把新代码写入文件")
+    _add_dynamic_arg(regen_parser)
+    
+    # serve 命令 (常驻 HTTP 服务)
+    serve_parser = subparsers.add_parser("serve", help="启动常驻 HTTP 服务 (/contract /generate /verify /seal /health)")
+    serve_parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址")
+    serve_parser.add_argument("--port", type=int, default=8080, help="监听端口")
+    serve_parser.add_argument("-w", "--workers", type=int, default=4, help="验证/封存线程数")
+    serve_parser.add_argument("--verify-mode", choices=VERIFY_MODES, default="substring", help="默认验证模式")
+    serve_parser.add_argument("--seal-backend", choices=SEAL_BACKENDS, default=None, help="封存后端: json 或 sqlite")
+    serve_parser.add_argument("--no-cache", action="store_true", help="绕过 LLM 响应缓存")
+    serve_parser.add_argument("--trace", action="store_true", help="记录每次生成的 span，耗时直方图通过 /metrics 暴露")
+    serve_parser.add_argument("--output-dir", type=str, default=None, help="封存目录 (默认 output/)")
+    _add_prompt_args(serve_parser)
+    _add_matcher_arg(serve_parser)
+    _add_dynamic_arg(serve_parser)
+    serve_parser.add_argument("--drain-timeout", type=float, default=30.0, help="收到终止信号后等待进行中请求的秒数")
     
     args = parser.parse_args()
+    timings.enabled = args.timings
+    try:
+        _dispatch(parser, args)
+    finally:
+        if args.timings:
+            print(timings.report(), file=sys.stderr)
+
+
+def _dispatch(parser, args):
+    if getattr(args, "candidates", 1) < 1:
+        parser.error("--candidates 必须 >= 1")
+    if getattr(args, "stream", False) and args.candidates > 1:
+        parser.error("--stream 与 --candidates 不能同时使用")
+    if getattr(args, "stream", False) and args.decompose:
+        parser.error("--stream 与 --decompose 不能同时使用")
+    if args.command in ("generate", "batch", "migrate-seals", "audit", "reverify", "regenerate", "serve"):
+        load_env()
     
     if args.command == "generate":
+        from rich.panel import Panel
         console.print(Panel(f"[bold]ODD Demo[/bold]\n需求: {args.requirement}", title="Output-Driven Development"))
-        run_odd_demo(args.requirement, save_code=not args.no_save)
+        results = run_odd_demo(args.requirement, save_code=not args.no_save, use_cache=False if args.no_cache else None,
+                               verify_mode=args.verify_mode, seal_backend=args.seal_backend, stream=args.stream,
+                               trace=args.trace or bool(args.metrics_file), profile=args.profile,
+                               n_candidates=args.candidates, prompt_mode=args.prompt_mode,
+                               token_budget=args.token_budget, matcher=args.matcher, dynamic=args.dynamic,
+                               decompose=args.decompose, min_score=args.min_score)
+        if args.trace or args.profile:
+            _print_trace(results['telemetry'])
+        if args.metrics_file:
+            _write_metrics(args.metrics_file)
     elif args.command == "contract":
-        gen = ContractGenerator()
-        contract = gen.generate_contract(args.requirement)
-        console.print_json(json.dumps(contract, ensure_ascii=False))
+        # 快速路径：只导入契约生成器，不加载 dotenv / OpenAI SDK；输出到管道时也不加载 rich
+        with timings.stage("import contract_generator"):
+            from odd.contract_generator import ContractGenerator
+        with timings.stage("contract"):
+            gen = ContractGenerator(matcher=args.matcher)
+            contract = gen.generate_contract(args.requirement)
+        if sys.stdout.isatty():
+            console.print_json(json.dumps(contract, ensure_ascii=False))
+        else:
+            print(json.dumps(contract, indent=2, ensure_ascii=False))
+    elif args.command == "batch":
+        run_batch(args)
+    elif args.command == "route":
+        if args.top_k < 1:
+            parser.error("--top-k 必须 >= 1")
+        run_route(args)
+    elif args.command == "shard-library":
+        from odd.standard_library import shard_library
+        src = Path(args.src) if args.src else Path(__file__).parent / "artifacts" / "standards" / "standard_library.yaml"
+        target = Path(args.output) if args.output else src.parent / "sharded"
+        report = shard_library(src, target)
+        console.print(f"[green]✓[/green] 已拆分 {report['artifacts']} 个产出物 → {report['index']} "
+                      f"(索引 {report['index_bytes']} 字节，分片共 {report['shard_bytes']} 字节)")
+        if report['removed_stale']:
+            console.print(f"[yellow]已删除 {report['removed_stale']} 个不再使用的旧分片[/yellow]")
+        console.print(f"使用: ODD_STANDARDS_PATH={target} python main.py generate \"用户需求\"")
+    elif args.command == "migrate-seals":
+        from odd.seal_manager import SealManager
+        from odd.seal_store import migrate_json_seals
+        src = Path(args.src) if args.src else Path(__file__).parent / "output"
+        target = SealManager(args.output_dir or src, backend="sqlite").backend
+        report = migrate_json_seals(src, target)
+        console.print(f"[green]✓[/green] 已导入 {report['migrated']} 个封存，跳过已存在 {report['skipped_existing']} 个 → {target.db_path}")
+        for path in report['corrupt']:
+            console.print(f"[red]✗[/red] 哈希校验失败，未导入: {path}")
+        console.print_json(json.dumps(target.stats()))
+    elif args.command == "serve":
+        run_serve(args)
+    elif args.command == "regenerate":
+        if run_regenerate(args).get('error'):
+            sys.exit(1)
+    elif args.command == "verify":
+        if args.chunk_size < 1:
+            parser.error("--chunk-size 必须 >= 1")
+        summary = run_verify(args)
+        if summary.get('error') or summary['failed'] or summary['errors']:
+            sys.exit(1)
+    elif args.command == "reverify":
+        report = run_reverify(args)
+        if report['errors']:
+            sys.exit(1)
+    elif args.command == "audit":
+        report = run_audit(args)
+        if report['failed']:
+            sys.exit(1)
     else:
         parser.print_help()
 
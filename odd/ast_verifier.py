@@ -0,0 +1,306 @@
+"""
+AST 验证器 (AST Verifier)
+将代码解析一次，在单次语法树遍历中检查标准库声明的结构化规则
+"""
+
+import ast
+import re
+import fnmatch
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from .pattern_matcher import compile_hints
+from .telemetry import span
+
+
+def _glob_regex(patterns: Iterable[str]) -> re.Pattern:
+    """把一组 fnmatch 通配符合并为一个正则"""
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns) or r"(?!)")
+
+
+def dotted_name(node: ast.AST) -> Optional[str]:
+    """还原 a.b.c 形式的名称，无法还原时返回 None"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return None
+
+
+def _key_name(node: ast.AST) -> Optional[str]:
+    """变量名、属性名或常量下标 (x / obj.x / d['x']) 的末级名称"""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str):
+        return node.slice.value
+    return None
+
+
+def _describe(node: ast.AST) -> str:
+    text = ast.unparse(node)
+    if len(text) > 80:
+        text = text[:77] + "..."
+    return f"L{getattr(node, 'lineno', '?')}: {text}"
+
+
+class StructuralRule:
+    """结构化规则基类：声明关心的节点类型，遍历时逐个接收节点"""
+
+    node_types = ()
+    # True: 找到即通过 (require_*)；False: 找到即违规 (forbid_*)
+    pass_if_found = False
+
+    def __init__(self, spec: dict):
+        self.kind = spec['kind']
+        self.reason = spec.get('reason', self.kind)
+        self.severity = spec.get('severity', 'medium')
+        self.found = None
+
+    def visit(self, node: ast.AST):
+        raise NotImplementedError
+
+    def hit(self, node: ast.AST, text: str = None):
+        if self.found is None:
+            self.found = text or _describe(node)
+
+    def check(self) -> dict:
+        passed = (self.found is not None) == self.pass_if_found
+        return {"type": self.kind, "rule": self.reason, "severity": self.severity, "passed": passed, "found": self.found}
+
+
+class RequireImport(StructuralRule):
+    """至少导入了一个匹配的模块 (import x / from x import y，支持通配符)"""
+
+    node_types = (ast.Import, ast.ImportFrom)
+    pass_if_found = True
+
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.modules = _glob_regex(spec.get('modules', []))
+
+    def visit(self, node):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        else:
+            names = [node.module or ""] + [f"{node.module}.{alias.name}" for alias in node.names]
+        for name in names:
+            if self.modules.match(name):
+                self.hit(node, name)
+                return
+
+
+class RequireDef(StructuralRule):
+    """至少定义了一个名称匹配的函数"""
+
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+    pass_if_found = True
+
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.names = _glob_regex(spec.get('names', []))
+
+    def visit(self, node):
+        if self.names.match(node.name):
+            self.hit(node, f"L{node.lineno}: def {node.name}")
+
+
+class ForbidCall(StructuralRule):
+    """禁止调用匹配的函数，如 eval / exec"""
+
+    node_types = (ast.Call,)
+
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.calls = _glob_regex(spec.get('calls', []))
+
+    def visit(self, node):
+        name = dotted_name(node.func)
+        if name and self.calls.match(name):
+            self.hit(node)
+
+
+class ForbidCallArg(StructuralRule):
+    """禁止把敏感变量传给匹配的函数，如 print(password)、logger.info(f"{password}")"""
+
+    node_types = (ast.Call,)
+
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.calls = _glob_regex(spec.get('calls', []))
+        self.names = set(spec.get('names', []))
+
+    def visit(self, node):
+        if self.found is not None:
+            return
+        name = dotted_name(node.func)
+        if not name or not self.calls.match(name):
+            return
+        for arg in [*node.args, *(kw.value for kw in node.keywords)]:
+            for sub in ast.walk(arg):
+                if _key_name(sub) in self.names:
+                    self.hit(node)
+                    return
+
+
+class ForbidPlaintextStore(StructuralRule):
+    """禁止明文存储敏感字段
+
+    违规：敏感名称被赋值为字符串字面量 (password = "123456")；
+    未经函数处理的敏感值被写入属性/下标 (user.password = password、users[u]['password'] = data['password'])；
+    字典字面量中敏感键对应未处理的敏感值 ({'password': password})。
+    读取局部变量 (password = data['password']) 不算存储。
+    """
+
+    node_types = (ast.Assign, ast.AnnAssign, ast.Dict)
+
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        self.names = set(spec.get('names', []))
+
+    def _is_raw_secret(self, value: ast.AST) -> bool:
+        return _key_name(value) in self.names
+
+    def _check_store(self, node, target, value):
+        if value is None or _key_name(target) not in self.names:
+            return
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            self.hit(node)
+        elif isinstance(target, (ast.Attribute, ast.Subscript)) and self._is_raw_secret(value):
+            self.hit(node)
+
+    def visit(self, node):
+        if self.found is not None:
+            return
+        if isinstance(node, ast.Dict):
+            for key, value in zip(node.keys, node.values):
+                if isinstance(key, ast.Constant) and key.value in self.names and self._is_raw_secret(value):
+                    self.hit(node)
+                    return
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                self._check_store(node, target, node.value)
+        else:
+            self._check_store(node, node.target, node.value)
+
+
+class ForbidSqlBuild(StructuralRule):
+    """禁止用 f-string、+、% 或 .format() 拼接 SQL 语句"""
+
+    node_types = (ast.JoinedStr, ast.BinOp, ast.Call)
+
+    def __init__(self, spec: dict):
+        super().__init__(spec)
+        keywords = spec.get('keywords', ["SELECT", "INSERT", "UPDATE", "DELETE"])
+        self.sql = re.compile(r"^\s*(?:" + "|".join(map(re.escape, keywords)) + r")\b", re.IGNORECASE)
+
+    def _is_sql(self, node) -> bool:
+        return isinstance(node, ast.Constant) and isinstance(node.value, str) and bool(self.sql.match(node.value))
+
+    def visit(self, node):
+        if self.found is not None:
+            return
+        if isinstance(node, ast.JoinedStr):
+            if node.values and self._is_sql(node.values[0]) and any(
+                    isinstance(v, ast.FormattedValue) for v in node.values):
+                self.hit(node)
+        elif isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Add) and (self._is_sql(node.left) or self._is_sql(node.right)):
+                self.hit(node)
+            elif isinstance(node.op, ast.Mod) and self._is_sql(node.left):
+                self.hit(node)
+        elif isinstance(node.func, ast.Attribute) and node.func.attr == 'format' and self._is_sql(node.func.value):
+            self.hit(node)
+
+
+RULE_KINDS = {
+    "require_import": RequireImport,
+    "require_def": RequireDef,
+    "forbid_call": ForbidCall,
+    "forbid_call_arg": ForbidCallArg,
+    "forbid_plaintext_store": ForbidPlaintextStore,
+    "forbid_sql_build": ForbidSqlBuild,
+}
+
+
+_trees = OrderedDict()
+_trees_lock = threading.Lock()
+_TREE_CACHE_SIZE = 64
+
+
+def parse_cached(code: str):
+    """解析代码并按内容哈希缓存，语法错误时返回 SyntaxError 实例"""
+    key = hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+    with _trees_lock:
+        tree = _trees.get(key)
+        if tree is not None:
+            _trees.move_to_end(key)
+            return tree
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        tree = e
+    with _trees_lock:
+        _trees[key] = tree
+        if len(_trees) > _TREE_CACHE_SIZE:
+            _trees.popitem(last=False)
+    return tree
+
+
+class AstVerifier:
+    """结构化验证：verification_hints.structural 中的规则在 ast 模式下替代 reason 相同的子串规则
+
+    未被替代的子串规则仍由多模式匹配器评估；代码无法解析时整体回退到子串模式，
+    并追加一条语法检查失败记录。
+    """
+
+    def verify(self, code: str, verification_hints: dict) -> dict:
+        with span("verify.substring", code_bytes=len(code)):
+            substring = compile_hints(verification_hints).evaluate(code)
+        specs = verification_hints.get('structural') or []
+        with span("verify.parse"):
+            tree = parse_cached(code)
+        if isinstance(tree, SyntaxError):
+            substring['checks'].append({
+                "type": "syntax", "rule": "代码可解析为 Python AST", "severity": "high",
+                "passed": False, "found": f"SyntaxError: {tree.msg} (L{tree.lineno})",
+            })
+            substring['passed'] = False
+            return substring
+
+        unknown = [spec.get('kind') for spec in specs if spec.get('kind') not in RULE_KINDS]
+        if unknown:
+            raise ValueError(f"未知的结构化规则类型: {unknown}")
+        rules = [RULE_KINDS[spec['kind']](spec) for spec in specs]
+        with span("verify.walk", rules=len(rules)):
+            self._walk(tree, rules)
+        structural = {rule.reason: rule.check() for rule in rules}
+
+        checks = []
+        for check in substring['checks']:
+            checks.append(structural.pop(check['rule'], check))
+        checks.extend(structural.values())
+
+        all_passed = all(c['passed'] for c in checks if c['type'] != 'should_contain')
+        critical_failed = any(not c['passed'] and c['severity'] == 'critical' for c in checks)
+        return {"passed": all_passed and not critical_failed, "critical_failed": critical_failed,
+                "mode": "ast", "checks": checks}
+
+    @staticmethod
+    def _walk(tree: ast.AST, rules: List[StructuralRule]):
+        """单次遍历：按节点类型分发给关心该类型的规则"""
+        dispatch: Dict[type, List[StructuralRule]] = {}
+        for rule in rules:
+            for node_type in rule.node_types:
+                dispatch.setdefault(node_type, []).append(rule)
+        for node in ast.walk(tree):
+            handlers = dispatch.get(type(node))
+            if handlers:
+                for rule in handlers:
+                    rule.visit(node)
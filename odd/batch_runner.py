@@ -0,0 +1,146 @@
+"""
+批量运行器 (Batch Runner)
+从 JSONL 流式读取需求，使用工作线程池并发执行 ODD 流程，支持断点续跑
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, ALL_COMPLETED, wait
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+
+class BatchRunner:
+    """批量运行器：按完成顺序流式写出结果，并用检查点文件跳过已封存的需求"""
+
+    def __init__(self, pipeline: Callable[[str], dict], workers: int = 4, checkpoint_path: str = None):
+        if workers < 1:
+            raise ValueError("workers 必须 >= 1")
+        self.pipeline = pipeline
+        self.workers = workers
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+
+    @staticmethod
+    def iter_requirements(input_path: str) -> Iterator[Tuple[str, str]]:
+        """逐行读取 JSONL，产出 (item_id, requirement)；未提供 id 时使用行号"""
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                if isinstance(item, str):
+                    yield f"line-{line_no}", item
+                    continue
+                requirement = item.get('requirement')
+                if not requirement:
+                    raise ValueError(f"第 {line_no} 行缺少 requirement 字段")
+                yield str(item.get('id', f"line-{line_no}")), requirement
+
+    def load_checkpoint(self) -> set:
+        """读取检查点中已封存的 item_id"""
+        done = set()
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return done
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)['id'])
+                except (ValueError, KeyError):
+                    # 崩溃时可能留下半行，忽略即可
+                    continue
+        return done
+
+    def _run_one(self, item_id: str, requirement: str) -> dict:
+        """执行单条需求，并压缩为可写入 JSONL 的结果记录"""
+        record = {"id": item_id, "requirement": requirement}
+        started = time.perf_counter()
+        try:
+            result = self.pipeline(requirement)
+        except Exception as e:
+            result = {"error": True, "message": f"{type(e).__name__}: {e}"}
+        record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        if result.get('error'):
+            record.update({"error": True, "message": result.get('message')})
+            return record
+
+        verification = result.get('verification', {})
+        seal = result.get('seal', {})
+        record.update({
+            "error": False,
+            "artifact_type": result.get('contract', {}).get('artifact_type'),
+            "tokens_used": result.get('tokens_used'),
+            "prompt_tokens": (result.get('prompt') or {}).get('total_tokens'),
+            "retries": (result.get('resilience') or {}).get('retries'),
+            "hedges": (result.get('resilience') or {}).get('hedges'),
+            "passed": verification.get('passed'),
+            "critical_failed": verification.get('critical_failed'),
+            "seal_id": seal.get('seal_id'),
+            "integrity": seal.get('integrity'),
+            "seal_file": seal.get('file_path'),
+        })
+        if result.get('parts'):
+            # 组合封存：各组成部分的封存
+            record["parts"] = [{"artifact_type": part['artifact_type'], "passed": part['verification'].get('passed'),
+                                "seal_id": part['seal'].get('seal_id')} for part in result['parts']]
+        return record
+
+    def run(self, input_path: str, output_path: str, resume: bool = True,
+            on_result: Optional[Callable[[dict], None]] = None) -> dict:
+        """执行批处理，返回汇总统计"""
+        done = self.load_checkpoint() if resume else set()
+        summary = {"total": 0, "skipped": 0, "sealed": 0, "passed": 0, "failed": 0, "errors": 0}
+        started = time.perf_counter()
+
+        out_mode = 'a' if resume else 'w'
+        ckpt_file = None
+        if self.checkpoint_path is not None:
+            self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+            ckpt_file = open(self.checkpoint_path, out_mode, encoding='utf-8')
+
+        try:
+            with open(output_path, out_mode, encoding='utf-8') as out_file, \
+                    ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending = set()
+                # 在途任务上限为 2 倍工作线程，避免一次性读入整个输入文件
+                max_in_flight = self.workers * 2
+
+                def drain(return_when):
+                    nonlocal pending
+                    finished, pending = wait(pending, return_when=return_when)
+                    for future in finished:
+                        self._record(future.result(), out_file, ckpt_file, summary, on_result)
+
+                for item_id, requirement in self.iter_requirements(input_path):
+                    summary["total"] += 1
+                    if item_id in done:
+                        summary["skipped"] += 1
+                        continue
+                    pending.add(pool.submit(self._run_one, item_id, requirement))
+                    if len(pending) >= max_in_flight:
+                        drain(FIRST_COMPLETED)
+                if pending:
+                    drain(ALL_COMPLETED)
+        finally:
+            if ckpt_file is not None:
+                ckpt_file.close()
+
+        summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return summary
+
+    def _record(self, record: dict, out_file, ckpt_file, summary: dict, on_result) -> None:
+        """写出单条结果（仅在主线程调用）；只有封存成功的需求才进入检查点"""
+        out_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out_file.flush()
+        if record.get('error'):
+            summary["errors"] += 1
+        else:
+            summary["sealed"] += 1
+            summary["passed" if record.get('passed') else "failed"] += 1
+            # 先落盘结果再写检查点，崩溃时最多重跑一条，不会丢结果
+            if ckpt_file is not None and record.get('seal_id'):
+                ckpt_file.write(json.dumps({"id": record["id"], "seal_id": record["seal_id"]}, ensure_ascii=False) + "\n")
+                ckpt_file.flush()
+        if on_result is not None:
+            on_result(record)
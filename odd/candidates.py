@@ -0,0 +1,113 @@
+"""
+候选生成 (Best-of-N Candidates)
+并发生成 N 个候选代码 (可使用不同温度)，每个候选返回后立即验证；
+一旦有候选通过全部 critical 规则即取消其余请求，按规则严重度加权得分选出最优候选
+"""
+
+import time
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from .telemetry import span
+
+# 未通过规则的严重度权重，得分越低越好
+SEVERITY_WEIGHTS = {"critical": 100, "high": 10, "medium": 3, "low": 1}
+
+# 默认温度从 CodeGenerator.temperature 起按此步长递增，不超过 MAX_TEMPERATURE
+TEMPERATURE_STEP = 0.2
+MAX_TEMPERATURE = 1.0
+
+
+def severity_score(verification: dict) -> int:
+    """未通过规则的严重度加权和 (未知严重度按 low 计)"""
+    return sum(SEVERITY_WEIGHTS.get(check.get('severity'), SEVERITY_WEIGHTS['low'])
+               for check in verification.get('checks', []) if not check.get('passed'))
+
+
+def default_temperatures(base: float, n: int) -> List[float]:
+    """第一个候选使用 base，其余依次提高温度以增加多样性"""
+    return [round(min(MAX_TEMPERATURE, base + TEMPERATURE_STEP * i), 2) for i in range(n)]
+
+
+def _summary(index: int, temperature: float, code_result: Optional[dict], verification: Optional[dict],
+             elapsed: Optional[float]) -> dict:
+    """写入封存的候选摘要 (不含代码本身，只保留其哈希)"""
+    summary = {"index": index, "temperature": temperature, "status": "cancelled",
+               "elapsed_ms": None if elapsed is None else round(elapsed * 1000, 1)}
+    if code_result is None:
+        return summary
+    if code_result.get('error'):
+        summary.update({"status": "error", "message": code_result.get('message')})
+        return summary
+    summary.update({
+        "status": "verified",
+        "passed": verification['passed'],
+        "critical_failed": verification['critical_failed'],
+        "score": severity_score(verification),
+        "failed_rules": [check['rule'] for check in verification['checks'] if not check['passed']],
+        "tokens_used": code_result.get('tokens_used'),
+        "cached": bool(code_result.get('cached')),
+        "code_sha256": hashlib.sha256(code_result['code'].encode('utf-8')).hexdigest(),
+    })
+    return summary
+
+
+async def generate_best_of_n(code_gen, contract: dict, verify: Callable[[str], Awaitable[dict]], n: int,
+                             temperatures: List[float] = None) -> Tuple[dict, Optional[dict]]:
+    """并发生成 n 个候选并逐个验证，返回 (选中的生成结果, 其验证结果)
+
+    verify(code) 为返回验证结果的协程函数。选中候选的验证结果附带 candidates 字段
+    (全部候选的摘要，含被取消的候选)，生成结果的 tokens_used 为所有已完成候选的用量之和。
+    全部候选都生成失败时返回第一个错误结果与 None。
+    """
+    if n < 1:
+        raise ValueError("n_candidates 必须 >= 1")
+    temperatures = list(temperatures or default_temperatures(code_gen.temperature, n))
+    if len(temperatures) != n:
+        raise ValueError(f"temperatures 数量 ({len(temperatures)}) 与候选数 ({n}) 不一致")
+
+    started = time.perf_counter()
+
+    async def attempt(index: int):
+        with span("generate.candidate", index=index, temperature=temperatures[index]):
+            result = await code_gen.generate_code_async(contract, temperature=temperatures[index])
+        verification = None if result.get('error') else await verify(result['code'])
+        return index, result, verification, time.perf_counter() - started
+
+    tasks = [asyncio.ensure_future(attempt(i)) for i in range(n)]
+    finished = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result, verification, elapsed = await next_done
+            finished[index] = (result, verification, elapsed)
+            if verification is not None and not verification['critical_failed']:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    summaries = [_summary(i, temperatures[i], *finished.get(i, (None, None, None))) for i in range(n)]
+    verified = [i for i in finished if finished[i][1] is not None]
+    if not verified:
+        return finished[min(finished)][0], None
+
+    # 得分最低者胜出，同分取先完成的 (finished 按完成顺序插入)
+    best = min(verified, key=lambda i: severity_score(finished[i][1]))
+    summaries[best]["selected"] = True
+    result, verification, _ = finished[best]
+    tokens = [r.get('tokens_used') for r, _, _ in finished.values() if not r.get('error')]
+    result = {**result, "tokens_used": sum(t or 0 for t in tokens), "temperature": temperatures[best],
+              "candidate": best}
+    return result, {**verification, "candidates": summaries}
+
+
+def best_of_n(code_gen, contract: dict, verifier, n: int, temperatures: List[float] = None) -> Tuple[dict, Optional[dict]]:
+    """generate_best_of_n 的同步入口：在新的事件循环中运行，验证直接在循环内执行"""
+    hints = contract['contract'].get('verification_hints', {})
+
+    async def verify(code: str) -> dict:
+        return verifier.verify(code, hints)
+
+    return asyncio.run(generate_best_of_n(code_gen, contract, verify, n, temperatures))
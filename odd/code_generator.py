@@ -5,26 +5,165 @@
 
 import os
 import json
-from typing import Optional
-from openai import OpenAI
+import time
+import asyncio
+import threading
+import weakref
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError
+
+from .pattern_matcher import StreamScanner, compile_hints
+from .prompt_builder import PROMPT_MODES, build_compact_prompt, standard_report
+from .rate_limiter import RateLimiter
+from .resilience import (CallStats, CircuitBreaker, CircuitOpenError, EndpointHealth, ResiliencePolicy,
+                         is_retryable_status, retry_after)
+from .response_cache import ResponseCache, get_default_cache
+from .telemetry import record_span, span
+
+# 补丁提示词中契约变化的名称
+_CHANGE_LABELS = {"added": "新增", "removed": "删除", "modified": "修改"}
+
+
+def _env_number(name: str, default=None):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _retry_info(exc: Exception) -> Tuple[bool, Optional[float]]:
+    """(是否可重试, 服务端要求的等待秒数)：连接错误、超时、408/409/429 与 5xx 可重试"""
+    if isinstance(exc, APIStatusError):
+        response = getattr(exc, 'response', None)
+        return is_retryable_status(exc.status_code), retry_after(getattr(response, 'headers', None))
+    return isinstance(exc, (APIConnectionError, TimeoutError, ConnectionError)), None
+
+
+def _unhealthy(exc: Exception) -> bool:
+    """计入熔断器的失败：连接错误、超时与 5xx (4xx 说明端点仍在正常响应)"""
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    return isinstance(exc, (APIConnectionError, TimeoutError, ConnectionError))
+
+
+class _Endpoint:
+    """同一 (api_key, base_url, model) 共享的客户端、连接池与限流状态"""
+
+    def __init__(self, api_key: str, base_url: Optional[str], max_concurrency: int, rpm: float, tpm: float,
+                 policy: ResiliencePolicy = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = RateLimiter(rpm=rpm, tpm=tpm)
+        # 延迟窗口、熔断器与对冲预算按 (端点, 模型) 共享
+        self.health = EndpointHealth(policy)
+        self._lock = threading.Lock()
+        self._client = None
+        self._executor = None
+        # AsyncOpenAI 的连接池与 Semaphore 绑定事件循环，按循环分别缓存
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _client_kwargs(self) -> dict:
+        # 支持 NVIDIA API 或 OpenAI API
+        # 重试由 CodeGenerator 负责 (带对冲与熔断)，关闭 SDK 自带的重试
+        kwargs = {"api_key": self.api_key, "max_retries": 0}
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        return kwargs
+
+    @property
+    def client(self) -> OpenAI:
+        with self._lock:
+            if self._client is None:
+                self._client = OpenAI(**self._client_kwargs())
+            return self._client
+
+    def async_client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_clients:
+                self._async_clients[loop] = AsyncOpenAI(**self._client_kwargs())
+            return self._async_clients[loop]
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._semaphores:
+                self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return self._semaphores[loop]
+
+    def executor(self) -> ThreadPoolExecutor:
+        """同步调用对冲时在线程中发出请求 (主请求与对冲请求各占一个线程)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4 * self.max_concurrency,
+                                                    thread_name_prefix="odd-llm")
+            return self._executor
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def _get_endpoint(api_key: str, base_url: Optional[str], model: str, max_concurrency: int, rpm: float, tpm: float,
+                  policy: ResiliencePolicy = None) -> _Endpoint:
+    key = (api_key, base_url, model)
+    with _endpoints_lock:
+        if key not in _endpoints:
+            _endpoints[key] = _Endpoint(api_key, base_url, max_concurrency, rpm, tpm, policy)
+        return _endpoints[key]
 
 
 class CodeGenerator:
-    """代码生成器：根据契约调用 LLM API 生成代码"""
+    """代码生成器：根据契约调用 LLM API 生成代码
+    
+    同一 API Key / Base URL / 模型的所有实例共享一个长连接客户端和限流器，
+    因此每次运行重新构造 CodeGenerator 不会新建 HTTP 连接池。
+    
+    prompt_mode 为 standard (默认) 或 compact (见 odd.prompt_builder)，token_budget 为 compact 模式的
+    输入 token 预算；未指定时分别读取 ODD_PROMPT_MODE 与 ODD_PROMPT_TOKEN_BUDGET。
+    生成结果的 prompt 字段报告各章节 token 数与裁剪情况。
     
-    def __init__(self, api_key: str = None):
+    API 调用经过 odd.resilience：超过该模型观测 p95 仍未返回时发出对冲请求、超时随 p99 自适应、
+    可重试错误按抖动指数退避重试、端点连续失败时熔断；resilience 为首次创建该端点时使用的参数
+    (默认读取环境变量)。生成结果的 resilience 字段报告本次的请求数、重试、对冲与熔断情况。
+    """
+    
+    def __init__(self, api_key: str = None, max_concurrency: int = None, rpm: float = None, tpm: float = None,
+                 cache: ResponseCache = None, use_cache: bool = None, prompt_mode: str = None,
+                 token_budget: int = None, resilience: ResiliencePolicy = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("未设置 OPENAI_API_KEY")
         
-        # 支持 NVIDIA API 或 OpenAI API
-        base_url = os.getenv("OPENAI_BASE_URL", None)
-        if base_url:
-            self.client = OpenAI(api_key=self.api_key, base_url=base_url)
-        else:
-            self.client = OpenAI(api_key=self.api_key)
-        
+        self.base_url = os.getenv("OPENAI_BASE_URL", None)
         self.model = os.getenv("OPENAI_MODEL", "gpt-4")
+        self.temperature = 0.2
+        self.max_tokens = 4000
+        self.prompt_mode = prompt_mode or os.getenv("ODD_PROMPT_MODE", "standard")
+        if self.prompt_mode not in PROMPT_MODES:
+            raise ValueError(f"未知的提示词模式: {self.prompt_mode}，可选 {PROMPT_MODES}")
+        self.token_budget = token_budget or int(_env_number("ODD_PROMPT_TOKEN_BUDGET", 0)) or None
+        
+        self._endpoint = _get_endpoint(
+            self.api_key, self.base_url, self.model,
+            max_concurrency=int(max_concurrency or _env_number("ODD_MAX_CONCURRENCY", 8)),
+            rpm=rpm or _env_number("ODD_RPM"),
+            tpm=tpm or _env_number("ODD_TPM"),
+            policy=resilience,
+        )
+        self.rate_limiter = self._endpoint.rate_limiter
+        self.health = self._endpoint.health
+        
+        # 响应缓存：use_cache=False 或 ODD_LLM_CACHE=0 时绕过
+        if use_cache is None:
+            use_cache = os.getenv("ODD_LLM_CACHE", "1") != "0"
+        self.cache = (cache or get_default_cache()) if use_cache else None
+    
+    @property
+    def client(self) -> OpenAI:
+        return self._endpoint.client
     
     def _build_system_prompt(self) -> str:
         return """你是一个严格的代码生成器，遵循 ODD (Output-Driven Development) 范式。
@@ -80,27 +219,513 @@ class CodeGenerator:
 5. 错误处理
 6. if __name__ == '__main__' 启动代码"""
 
+    def _build_messages(self, contract: dict) -> List[dict]:
+        return self._build_prompt(contract)[0]
+    
+    def _build_prompt(self, contract: dict):
+        """返回 (messages, 提示词报告)"""
+        system = self._build_system_prompt()
+        if self.prompt_mode == "compact":
+            user, report = build_compact_prompt(contract, system, self.token_budget, self.model)
+        else:
+            user = self._build_user_prompt(contract)
+            report = standard_report(system, user, self.model)
+        return [{"role": "system", "content": system}, {"role": "user", "content": user}], report
+    
+    def _estimate_tokens(self, messages: List[dict], prompt_tokens: int = None) -> int:
+        """预估本次请求占用的 TPM 额度：提示词 token 数 (未提供时粗略按 3 字符/token) 加上 max_tokens"""
+        if prompt_tokens is None:
+            prompt_tokens = sum(len(m['content']) for m in messages) // 3
+        return prompt_tokens + self.max_tokens
+    
+    def _cache_key(self, messages: List[dict], temperature: float = None) -> str:
+        return ResponseCache.make_key(self.model, self.temperature if temperature is None else temperature,
+                                      self.max_tokens, messages[0]['content'], messages[1]['content'])
+    
+    def _cache_lookup(self, messages: List[dict], temperature: float = None):
+        """返回 (缓存键, 命中的结果)；未启用缓存时均为 None"""
+        if self.cache is None:
+            return None, None
+        key = self._cache_key(messages, temperature)
+        hit = self.cache.get(key)
+        if hit is None:
+            return key, None
+        # 命中缓存不消耗 token
+        return key, {"error": False, "code": hit['code'], "model": hit['model'], "tokens_used": 0, "cached": True}
+    
+    def _cache_store(self, key: Optional[str], result: dict):
+        if key is not None and not result.get('error'):
+            self.cache.put(key, {"code": result['code'], "model": result['model'], "tokens_used": result['tokens_used']})
+    
+    @staticmethod
+    def _strip_fence(content: str) -> str:
+        code = content.strip()
+        if code.startswith("```"):
+            code = code.split("\n", 1)[1].rsplit("```", 1)[0]
+        return code
+    
+    def _parse_response(self, response) -> dict:
+        code = self._strip_fence(response.choices[0].message.content)
+        return {"error": False, "code": code, "model": self.model, "tokens_used": response.usage.total_tokens}
+    
     def generate_code(self, contract: dict) -> dict:
         """根据契约生成代码"""
         if contract.get('error'):
             return {"error": True, "message": contract.get('message'), "code": None}
         
+        with span("llm.build_prompt") as s:
+            messages, prompt = self._build_prompt(contract)
+            s.set(mode=prompt['mode'], tokens=prompt['total_tokens'])
+        with span("llm.cache_lookup") as s:
+            cache_key, cached = self._cache_lookup(messages)
+            s.set(hit=cached is not None)
+        if cached is not None:
+            return {**cached, "prompt": prompt}
+        estimate = self._estimate_tokens(messages, prompt['total_tokens'])
+        stats = CallStats()
+        try:
+            result = self._call(messages, self.temperature, estimate, stats)
+        except Exception as e:
+            return {"error": True, "message": f"API 调用失败: {str(e)}", "code": None,
+                    "resilience": stats.as_dict(self.health)}
+        self.rate_limiter.settle(estimate, result['tokens_used'])
+        self._cache_store(cache_key, result)
+        result["prompt"] = prompt
+        result["resilience"] = stats.as_dict(self.health)
+        return result
+    
+    def _build_patch_system_prompt(self) -> str:
+        return """你是一个严格的代码修复器，遵循 ODD (Output-Driven Development) 范式。
+
+你会收到一份已生成的 Python 文件、它未通过的契约规则以及契约的变化。
+只做满足契约所需的最小修改，不要重写或重新排版无关代码。
+
+输出格式：
+- 只输出针对 generated.py 的 unified diff 补丁 (--- a/generated.py、+++ b/generated.py、@@ 块头)
+- 每个补丁块保留 3 行未修改的上下文，上下文与删除行必须与原文件逐字一致
+- 不要输出完整文件，不要添加任何解释性文字"""
+
+    def _build_patch_user_prompt(self, contract: dict, code: str, failed_checks: List[dict],
+                                 changes: dict = None, feedback: str = None) -> str:
+        changes = changes or {}
+        failed = "\n".join(
+            f"  - [{c.get('severity', 'medium')}] {c['rule']} ({c['type']}"
+            + (f"，检测到: {c['found']!r}" if c.get('found') else "") + ")"
+            for c in failed_checks) or "  (无)"
+        lines = []
+        for item in changes.get('rules', []):
+            spec = {k: v for k, v in (item.get('spec') or {}).items() if k not in ('reason', 'severity')}
+            detail = f": {json.dumps(spec, ensure_ascii=False)}" if item['change'] != "removed" and spec else ""
+            lines.append(f"  - {_CHANGE_LABELS[item['change']]}规则 [{item.get('severity') or '-'}] "
+                         f"{item['reason']} ({item['type']}){detail}")
+        for item in changes.get('implicit_requirements', []):
+            lines.append(f"  - {_CHANGE_LABELS[item['change']]}隐式需求 [{item['id']}] "
+                         f"{item.get('name', '')}: {item.get('description', '')}")
+        for change, hints in (changes.get('generation_hints') or {}).items():
+            lines.extend(f"  - {_CHANGE_LABELS[change]}生成提示: {h}" for h in hints)
+        feedback_text = f"\n## 上一次补丁的问题 (请修正)\n{feedback}\n" if feedback else ""
+        return f"""请输出一个 unified diff 补丁，修复下面的代码使其满足契约。
+
+## 原始需求
+{contract.get('requirement_original', '')}
+
+## 产出物类型
+{contract.get('artifact_type', '')} - {contract.get('artifact_name', '')}
+
+## 未通过的规则 (必须修复)
+{failed}
+
+## 契约变化 (必须满足变化后的契约)
+{chr(10).join(lines) or "  (无)"}
+{feedback_text}
+## 当前代码 (generated.py，共 {code.count(chr(10)) + 1} 行)
+```python
+{code}
+```"""
+
+    def generate_patch(self, contract: dict, code: str, failed_checks: List[dict], changes: dict = None,
+                       feedback: str = None) -> dict:
+        """请求模型只输出修复 code 的 unified diff 补丁 (不重新生成整个文件)
+
+        failed_checks 为上次验证未通过的检查项，changes 为契约变化 (见 odd.regenerator.contract_changes)，
+        feedback 为上一次补丁无法应用或无法编译的原因。结果的 patch 字段为补丁文本，未在本地应用。
+        """
+        if contract.get('error'):
+            return {"error": True, "message": contract.get('message'), "patch": None}
+        with span("llm.build_prompt") as s:
+            system = self._build_patch_system_prompt()
+            user = self._build_patch_user_prompt(contract, code, failed_checks, changes, feedback)
+            messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+            prompt = {**standard_report(system, user, self.model), "mode": "patch"}
+            s.set(mode="patch", tokens=prompt['total_tokens'])
+        with span("llm.cache_lookup") as s:
+            cache_key, cached = self._cache_lookup(messages)
+            s.set(hit=cached is not None)
+        if cached is not None:
+            return {"error": False, "patch": cached['code'], "model": cached['model'], "tokens_used": 0,
+                    "cached": True, "prompt": prompt}
+        estimate = self._estimate_tokens(messages, prompt['total_tokens'])
+        stats = CallStats()
+        try:
+            result = self._call(messages, self.temperature, estimate, stats)
+        except Exception as e:
+            return {"error": True, "message": f"API 调用失败: {str(e)}", "patch": None,
+                    "resilience": stats.as_dict(self.health)}
+        self.rate_limiter.settle(estimate, result['tokens_used'])
+        self._cache_store(cache_key, result)
+        return {"error": False, "patch": result['code'], "model": result['model'], "tokens_used": result['tokens_used'],
+                "prompt": prompt, "resilience": stats.as_dict(self.health)}
+    
+    # --- 重试、对冲与熔断 ---
+    
+    def _admit(self, stats: CallStats) -> int:
+        """熔断检查，返回熔断器令牌 (请求被取消时用于归还半开探测名额)"""
+        token = self.health.breaker.acquire()
+        if token is None:
+            stats.breaker_rejected = True
+            raise CircuitOpenError(self.health.breaker.retry_in())
+        return token
+    
+    def _record_failure(self, exc: Exception):
+        if _unhealthy(exc):
+            self.health.breaker.record_failure()
+        else:
+            self.health.breaker.record_success()
+    
+    def _plan_request(self, stats: CallStats) -> Tuple[float, Optional[float]]:
+        """本次请求的 (超时, 对冲等待秒数)，并为对冲预算计入一个主请求"""
+        timeout, hedge_after = self.health.timeout(), self.health.hedge_delay()
+        stats.timeout_s, stats.hedge_after_s = timeout, hedge_after
+        stats.requests += 1
+        self.health.start_call()
+        return timeout, hedge_after
+    
+    def _can_hedge(self, estimate: int) -> bool:
+        """熔断器关闭、对冲预算足够且无需等待限流时才对冲；预约的令牌额度由 _settle_hedge 结算"""
+        return (self.health.breaker.state == CircuitBreaker.CLOSED and self.health.try_hedge()
+                and self.rate_limiter.try_reserve(estimate))
+    
+    def _settle_hedge(self, estimate: int, future):
+        """按对冲请求的实际用量结算其预约；失败或被取消时按只消耗了提示词计"""
+        if not future.cancelled() and future.exception() is None:
+            self.rate_limiter.settle(estimate, future.result()['tokens_used'])
+        else:
+            self.rate_limiter.settle(estimate, estimate - self.max_tokens)
+    
+    def _send(self, messages: List[dict], temperature: float, timeout: float, hedge: bool = False) -> dict:
+        """发送一次请求；成功的耗时计入延迟窗口，失败按类型计入熔断器"""
+        started = time.perf_counter()
+        try:
+            with span("llm.api_call", model=self.model, hedge=hedge) as s:
+                raw = self.client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=self.max_tokens,
+                    timeout=timeout
+                )
+                self.rate_limiter.update_from_headers(raw.headers)
+                result = self._parse_response(raw.parse())
+                s.set(tokens=result['tokens_used'])
+        except Exception as e:
+            self._record_failure(e)
+            raise
+        self.health.record_success(time.perf_counter() - started)
+        return result
+    
+    def _hedged(self, messages: List[dict], temperature: float, estimate: int, stats: CallStats) -> dict:
+        """主请求超过 p95 仍未返回时发出对冲请求，返回先成功的结果 (落后的请求在后台完成后丢弃)"""
+        timeout, hedge_after = self._plan_request(stats)
+        if hedge_after is None:
+            return self._send(messages, temperature, timeout)
+        pool = self._endpoint.executor()
+        primary = pool.submit(contextvars.copy_context().run, self._send, messages, temperature, timeout)
+        futures = [primary]
+        if not wait(futures, timeout=hedge_after).done and self._can_hedge(estimate):
+            stats.hedges += 1
+            stats.requests += 1
+            futures.append(pool.submit(contextvars.copy_context().run, self._send, messages, temperature, timeout, True))
+            # 落后的请求在后台完成，完成时再结算
+            futures[1].add_done_callback(lambda future: self._settle_hedge(estimate, future))
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    stats.hedge_won = future is not primary
+                    return future.result()
+                error = error or future.exception()
+        raise error
+    
+    def _call(self, messages: List[dict], temperature: float, estimate: int, stats: CallStats) -> dict:
+        """熔断检查 → 限流等待 → (可能对冲的) 请求；可重试的错误按抖动指数退避重试"""
+        policy = self.health.policy
+        for retry in range(policy.max_retries + 1):
+            token = self._admit(stats)
+            try:
+                delay = self.rate_limiter.reserve(estimate)
+                if delay:
+                    with span("llm.rate_limit_wait", delay_s=delay):
+                        time.sleep(delay)
+                return self._hedged(messages, temperature, estimate, stats)
+            except Exception as e:
+                self.rate_limiter.settle(estimate, 0)
+                retryable, after = _retry_info(e)
+                if not retryable or retry == policy.max_retries:
+                    raise
+                stats.retries += 1
+                backoff = policy.backoff(retry, after)
+                with span("llm.retry_backoff", retry=retry + 1, delay_s=backoff, error=type(e).__name__):
+                    time.sleep(backoff)
+            except BaseException:
+                # 被中断 (KeyboardInterrupt 等)：本次尝试没有结果，归还半开探测名额
+                self.health.breaker.release(token)
+                raise
+    
+    async def _send_async(self, messages: List[dict], temperature: float, timeout: float, hedge: bool = False) -> dict:
+        started = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._build_system_prompt()},
-                    {"role": "user", "content": self._build_user_prompt(contract)}
-                ],
-                temperature=0.2,
-                max_tokens=4000
-            )
-            code = response.choices[0].message.content.strip()
-            if code.startswith("```"):
-                code = code.split("\n", 1)[1].rsplit("```", 1)[0]
-            return {"error": False, "code": code, "model": self.model, "tokens_used": response.usage.total_tokens}
+            with span("llm.api_call", model=self.model, hedge=hedge) as s:
+                raw = await self._endpoint.async_client().chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=self.max_tokens,
+                    timeout=timeout
+                )
+                self.rate_limiter.update_from_headers(raw.headers)
+                result = self._parse_response(raw.parse())
+                s.set(tokens=result['tokens_used'])
         except Exception as e:
-            return {"error": True, "message": f"API 调用失败: {str(e)}", "code": None}
+            self._record_failure(e)
+            raise
+        self.health.record_success(time.perf_counter() - started)
+        return result
+    
+    async def _hedge_async(self, semaphore: asyncio.Semaphore, messages: List[dict], temperature: float,
+                           timeout: float) -> dict:
+        async with semaphore:
+            return await self._send_async(messages, temperature, timeout, hedge=True)
+    
+    async def _hedged_async(self, messages: List[dict], temperature: float, estimate: int, stats: CallStats) -> dict:
+        """_hedged 的 asyncio 版本：对冲请求另占一个并发名额 (没有空闲名额时不对冲)，落后的请求被取消"""
+        timeout, hedge_after = self._plan_request(stats)
+        if hedge_after is None:
+            return await self._send_async(messages, temperature, timeout)
+        primary = asyncio.ensure_future(self._send_async(messages, temperature, timeout))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            semaphore = self._endpoint.semaphore()
+            if not done and not semaphore.locked() and self._can_hedge(estimate):
+                stats.hedges += 1
+                stats.requests += 1
+                tasks.append(asyncio.ensure_future(self._hedge_async(semaphore, messages, temperature, timeout)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        stats.hedge_won = task is not primary
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if len(tasks) > 1:
+                self._settle_hedge(estimate, tasks[1])
+    
+    async def _call_async(self, messages: List[dict], temperature: float, estimate: int, stats: CallStats) -> dict:
+        policy = self.health.policy
+        for retry in range(policy.max_retries + 1):
+            token = self._admit(stats)
+            try:
+                delay = self.rate_limiter.reserve(estimate)
+                if delay:
+                    with span("llm.rate_limit_wait", delay_s=delay):
+                        await asyncio.sleep(delay)
+                return await self._hedged_async(messages, temperature, estimate, stats)
+            except Exception as e:
+                self.rate_limiter.settle(estimate, 0)
+                retryable, after = _retry_info(e)
+                if not retryable or retry == policy.max_retries:
+                    raise
+                stats.retries += 1
+                backoff = policy.backoff(retry, after)
+                with span("llm.retry_backoff", retry=retry + 1, delay_s=backoff, error=type(e).__name__):
+                    await asyncio.sleep(backoff)
+            except BaseException:
+                # 被取消 (组合中其他部分失败、对冲落后、wait_for 超时)：本次尝试没有结果，归还半开探测名额
+                self.health.breaker.release(token)
+                raise
+    
+    def _open_stream(self, messages: List[dict], stats: CallStats):
+        """建立流式请求；收到任何输出之前的可重试错误按退避重试 (流开始后的错误不重试)"""
+        policy = self.health.policy
+        for retry in range(policy.max_retries + 1):
+            token = self._admit(stats)
+            stats.requests += 1
+            stats.timeout_s = self.health.timeout()
+            try:
+                stream = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=stats.timeout_s
+                )
+            except Exception as e:
+                self._record_failure(e)
+                retryable, after = _retry_info(e)
+                if not retryable or retry == policy.max_retries:
+                    raise
+                stats.retries += 1
+                backoff = policy.backoff(retry, after)
+                with span("llm.retry_backoff", retry=retry + 1, delay_s=backoff, error=type(e).__name__):
+                    time.sleep(backoff)
+                continue
+            except BaseException:
+                self.health.breaker.release(token)
+                raise
+            self.health.breaker.record_success()
+            return stream
+    
+    async def generate_code_async(self, contract: dict, temperature: float = None) -> dict:
+        """generate_code 的 asyncio 版本：受并发上限与 RPM/TPM 限流约束，返回结构相同
+        
+        temperature 覆盖本次请求的温度 (默认 self.temperature)，缓存按温度分别寻址。
+        """
+        if contract.get('error'):
+            return {"error": True, "message": contract.get('message'), "code": None}
+        if temperature is None:
+            temperature = self.temperature
+        
+        with span("llm.build_prompt") as s:
+            messages, prompt = self._build_prompt(contract)
+            s.set(mode=prompt['mode'], tokens=prompt['total_tokens'])
+        with span("llm.cache_lookup") as s:
+            cache_key, cached = self._cache_lookup(messages, temperature)
+            s.set(hit=cached is not None)
+        if cached is not None:
+            return {**cached, "prompt": prompt}
+        estimate = self._estimate_tokens(messages, prompt['total_tokens'])
+        stats = CallStats()
+        async with self._endpoint.semaphore():
+            try:
+                result = await self._call_async(messages, temperature, estimate, stats)
+            except Exception as e:
+                return {"error": True, "message": f"API 调用失败: {str(e)}", "code": None,
+                        "resilience": stats.as_dict(self.health)}
+        self.rate_limiter.settle(estimate, result['tokens_used'])
+        self._cache_store(cache_key, result)
+        result["prompt"] = prompt
+        result["resilience"] = stats.as_dict(self.health)
+        return result
+    
+    def generate_code_stream(self, contract: dict, on_chunk=None, on_abort=None, max_retries: int = 1,
+                             exclude_reasons=()) -> dict:
+        """流式生成代码，边生成边做增量验证
+        
+        一旦输出命中 critical 级别的 must_not_contain 模式 (含跨块的模式)，立即关闭流，
+        在提示词中注明被违反的规则后重试，最多 max_retries 次；仍失败则返回错误及违规详情。
+        on_chunk(text) 接收实时输出，on_abort(violation, attempt) 在每次中止时回调；
+        exclude_reasons 中的规则不触发中止 (如 ast 模式下已由结构化规则替代的子串规则)。
+        """
+        if contract.get('error'):
+            return {"error": True, "message": contract.get('message'), "code": None}
+        
+        hints = contract.get('contract', {}).get('verification_hints', {})
+        compiled = compile_hints(hints)
+        with span("llm.build_prompt") as s:
+            messages, prompt = self._build_prompt(contract)
+            s.set(mode=prompt['mode'], tokens=prompt['total_tokens'])
+        violations = []
+        tokens_used = 0
+        stats = CallStats()
+        
+        with span("llm.cache_lookup") as s:
+            _, cached = self._cache_lookup(messages)
+            s.set(hit=cached is not None)
+        if cached is not None:
+            scanner = StreamScanner(compiled, exclude_reasons=exclude_reasons)
+            if scanner.feed(cached['code']) is None:
+                if on_chunk:
+                    on_chunk(cached['code'])
+                return {**cached, "streamed": True, "attempts": 0, "aborted": [], "prompt": prompt}
+        
+        for attempt in range(1, max_retries + 2):
+            scanner = StreamScanner(compiled, exclude_reasons=exclude_reasons)
+            parts = []
+            usage = None
+            violation = None
+            estimate = self._estimate_tokens(messages, prompt['total_tokens'] if attempt == 1 else None)
+            try:
+                delay = self.rate_limiter.reserve(estimate)
+                if delay:
+                    with span("llm.rate_limit_wait", delay_s=delay):
+                        time.sleep(delay)
+                with span("llm.api_call", model=self.model, attempt=attempt, streamed=True) as s:
+                    started = time.perf_counter()
+                    first_token = None
+                    stream = self._open_stream(messages, stats)
+                    try:
+                        for chunk in stream:
+                            if chunk.usage is not None:
+                                usage = chunk.usage.total_tokens
+                            if not chunk.choices:
+                                continue
+                            text = chunk.choices[0].delta.content or ""
+                            if not text:
+                                continue
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                                record_span("llm.first_token", started, first_token)
+                            parts.append(text)
+                            if on_chunk:
+                                on_chunk(text)
+                            violation = scanner.feed(text)
+                            if violation is not None:
+                                break
+                    finally:
+                        # 中止时关闭底层 HTTP 响应，服务端停止继续生成
+                        stream.close()
+                    s.set(tokens=usage, aborted=violation is not None)
+            except Exception as e:
+                return {"error": True, "message": f"API 调用失败: {str(e)}", "code": None,
+                        "aborted": violations, "tokens_used": tokens_used, "resilience": stats.as_dict(self.health)}
+            self.rate_limiter.settle(estimate, usage)
+            tokens_used += usage or 0
+            
+            if violation is None:
+                result = {"error": False, "code": self._strip_fence("".join(parts)), "model": self.model,
+                          "tokens_used": tokens_used, "streamed": True, "attempts": attempt, "aborted": violations,
+                          "prompt": prompt, "resilience": stats.as_dict(self.health)}
+                if self.cache is not None:
+                    self._cache_store(self._cache_key(messages), result)
+                return result
+            
+            violation["attempt"] = attempt
+            violation["chars_generated"] = scanner.length
+            violations.append(violation)
+            if on_abort:
+                on_abort(violation, attempt)
+            messages = messages[:1] + [{"role": "user", "content": messages[1]['content'] + (
+                f"\n\n注意：上一次生成违反了关键规则「{violation['rule']}」"
+                f"(出现了禁止的写法 `{violation['found']}`)，请务必避免。")}]
+        
+        last = violations[-1]
+        return {"error": True, "code": None, "model": self.model, "tokens_used": tokens_used,
+                "message": f"生成中止: 违反关键规则「{last['rule']}」(检测到 `{last['found']}`)，已重试 {max_retries} 次",
+                "streamed": True, "attempts": len(violations), "aborted": violations,
+                "resilience": stats.as_dict(self.health)}
+    
+    async def generate_many(self, contracts: List[dict]) -> List[dict]:
+        """并发生成多个契约的代码，结果顺序与输入一致"""
+        return await asyncio.gather(*(self.generate_code_async(c) for c in contracts))
 
 
 if __name__ == "__main__":
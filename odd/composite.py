@@ -0,0 +1,112 @@
+"""
+组合产出物 (Composite)
+一条需求同时对应多个产出物类型时 (如「登录 + 用户增删改查」)，为每个得分达到阈值的产出物分别实例化契约，
+并发生成并验证各部分的代码 (端到端耗时接近最慢的一个部分，而不是各部分之和)；
+各部分先各自封存，再写一条组合封存：其契约按顺序列出各部分的 seal_id 与完整性哈希，
+因此组合封存的完整性哈希覆盖全部组成部分，而各部分仍可单独 regenerate / reverify。
+"""
+
+import uuid
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from .candidates import generate_best_of_n
+from .telemetry import span
+
+COMPOSITE_TYPE = "composite"
+
+
+async def generate_parts(code_gen, contracts: List[dict], verify: Callable[[str, dict], Awaitable[dict]],
+                         n_candidates: int = 1) -> List[Tuple[dict, Optional[dict]]]:
+    """并发生成并验证各契约的代码，返回与 contracts 顺序一致的 [(生成结果, 验证结果)]
+
+    verify(code, verification_hints) 为返回验证结果的协程函数；n_candidates > 1 时每个部分各自 best-of-N。
+    任一部分生成失败即取消其余部分 (组合封存需要全部组成部分)，失败部分的验证结果为 None，
+    被取消的部分为 (None, None)。
+    """
+    async def part(contract: dict):
+        hints = contract['contract'].get('verification_hints', {})
+        with span("composite.part", artifact_type=contract['artifact_type']):
+            if n_candidates > 1:
+                return await generate_best_of_n(code_gen, contract, lambda code: verify(code, hints), n_candidates)
+            result = await code_gen.generate_code_async(contract)
+            if result.get('error'):
+                return result, None
+            with span("verify"):
+                return result, await verify(result['code'], hints)
+
+    tasks = [asyncio.ensure_future(part(contract)) for contract in contracts]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result, verification = await next_done
+            if verification is None:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return [task.result() if task.done() and not task.cancelled() else (None, None) for task in tasks]
+
+
+def generate_parts_sync(code_gen, contracts: List[dict], verifier, n_candidates: int = 1) -> List[Tuple[dict, Optional[dict]]]:
+    """generate_parts 的同步入口：在新的事件循环中运行，验证交给线程执行 (动态验证时各部分可同时占用沙箱进程)"""
+    async def verify(code: str, hints: dict) -> dict:
+        return await asyncio.to_thread(verifier.verify, code, hints)
+
+    return asyncio.run(generate_parts(code_gen, contracts, verify, n_candidates))
+
+
+def composite_artifacts(requirement: str, parts: List[dict]) -> Tuple[dict, dict]:
+    """组合封存的 (契约, 验证结果)
+
+    parts 为 [{"match", "contract", "verification", "seal"}]，match 是 ContractGenerator.decompose 的候选。
+    组合封存本身没有代码 (code 为空字符串)，各部分的代码在各自的封存中。
+    """
+    contract = {
+        "contract_id": str(uuid.uuid4()),
+        "timestamp": datetime.now().isoformat(),
+        "requirement_original": requirement,
+        "artifact_type": COMPOSITE_TYPE,
+        "artifact_name": " + ".join(part['contract'].get('artifact_name') or part['contract']['artifact_type']
+                                    for part in parts),
+        "parts": [{
+            "artifact_type": part['contract']['artifact_type'],
+            "contract_id": part['contract']['contract_id'],
+            "score": part['match']['score'],
+            "matcher": part['match']['matcher'],
+            "seal_id": part['seal']['seal_id'],
+            "integrity": part['seal']['integrity'],
+        } for part in parts],
+    }
+    summaries = [{
+        "artifact_type": part['contract']['artifact_type'],
+        "seal_id": part['seal']['seal_id'],
+        "passed": part['verification']['passed'],
+        "critical_failed": part['verification']['critical_failed'],
+        "failed_rules": [check['rule'] for check in part['verification']['checks'] if not check['passed']],
+    } for part in parts]
+    verification = {
+        "passed": all(s['passed'] for s in summaries),
+        "critical_failed": any(s['critical_failed'] for s in summaries),
+        "checks": [],
+        "parts": summaries,
+    }
+    return contract, verification
+
+
+def seal_composite(sealer, requirement: str, parts: List[dict], tracer=None) -> Tuple[dict, dict, dict]:
+    """先并发封存各部分 (sealer 带 SealWriter 时合并为一次提交)，再封存引用它们的组合封存
+
+    parts 为 [{"match", "contract", "code", "verification"}]，封存结果写回各部分的 seal 字段；
+    tracer 的追踪数据只附加到组合封存。返回组合封存的 (契约, 验证结果, 封存结果)。
+    """
+    with span("seal.parts", parts=len(parts)), ThreadPoolExecutor(max_workers=len(parts)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, sealer.seal, requirement, part['contract'],
+                               part['code'], part['verification']) for part in parts]
+        for part, future in zip(parts, futures):
+            part['seal'] = future.result()
+    contract, verification = composite_artifacts(requirement, parts)
+    return contract, verification, sealer.seal(requirement, contract, "", verification, tracer=tracer)
@@ -3,49 +3,101 @@
 将自然语言需求匹配到标准库，生成结构化契约
 """
 
-import uuid
-import yaml
-from datetime import datetime
+import os
+import heapq
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+
+from .standard_library import load_standard_library
+from .ngram_matcher import DEFAULT_MIN_SCORE, ngram_index
+from .telemetry import span
+
+# keyword: 需求中逐字出现的关键词计数；ngram: 字符 n-gram TF-IDF 余弦相似度 (需要 numpy)
+MATCHERS = ("keyword", "ngram")
+
+# 拆分需求时最多取的产出物类型数
+MAX_PARTS = 5
 
 
 class ContractGenerator:
     """契约生成器：根据用户需求和标准库生成结构化契约"""
     
-    def __init__(self, standards_path: str = None):
+    def __init__(self, standards_path: str = None, matcher: str = None, min_score: float = None):
         if standards_path is None:
-            standards_path = Path(__file__).parent.parent / "artifacts" / "standards" / "standard_library.yaml"
+            # ODD_STANDARDS_PATH 可指向另一个单文件标准库，或 shard_library 拆分出的分片目录/索引文件
+            standards_path = os.getenv("ODD_STANDARDS_PATH") or (
+                Path(__file__).parent.parent / "artifacts" / "standards" / "standard_library.yaml")
         self.standards_path = Path(standards_path)
+        with span("contract.load_library"):
+            self.library = load_standard_library(self.standards_path)
         self.standards = self._load_standards()
+        
+        matcher = matcher or os.getenv("ODD_MATCHER", "keyword")
+        if matcher not in MATCHERS:
+            raise ValueError(f"未知的匹配器: {matcher}，可选 {MATCHERS}")
+        self.matcher = matcher
+        self.min_score = DEFAULT_MIN_SCORE if min_score is None else min_score
+        self.index = None
+        if matcher == "ngram":
+            try:
+                with span("contract.ngram_index"):
+                    self.index = ngram_index(self.library)
+            except ImportError:
+                # 未安装 numpy 时退回关键词匹配
+                self.matcher = "keyword"
     
     def _load_standards(self) -> dict:
-        """加载产出物标准库"""
-        if not self.standards_path.exists():
-            raise FileNotFoundError(f"标准库文件不存在: {self.standards_path}")
-        with open(self.standards_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+        """加载产出物标准库 (进程内共享的已解析快照，见 odd.standard_library)"""
+        return self.library.standards
     
     def match_artifact_type(self, requirement: str) -> Optional[str]:
-        """通过关键词匹配需求到产出物类型"""
+        """匹配需求到得分最高的产出物类型，没有候选时返回 None"""
+        candidates = self.match_candidates(requirement, k=1)
+        return candidates[0]["artifact_type"] if candidates else None
+    
+    def match_candidates(self, requirement: str, k: int = 5) -> List[dict]:
+        """得分最高的 k 个候选 [{"artifact_type", "score", "matcher"}, ...]
+
+        ngram 匹配器没有得分不低于 min_score 的候选时退回关键词匹配；两种匹配器的 score 含义不同
+        (余弦相似度 / 命中的关键词数)，以 matcher 字段区分。
+        """
+        return self.match_many([requirement], k)[0]
+    
+    def match_many(self, requirements: List[str], k: int = 1) -> List[List[dict]]:
+        """批量匹配：ngram 匹配器把全部需求合成一个查询矩阵，一次稀疏乘法得到全部得分"""
+        if self.index is None:
+            return [self._keyword_candidates(requirement, k) for requirement in requirements]
+        with span("contract.ngram_match", requirements=len(requirements)):
+            ranked = self.index.top_k(requirements, k, self.min_score)
+        return [[{"artifact_type": artifact_id, "score": score, "matcher": "ngram"} for artifact_id, score in top]
+                or self._keyword_candidates(requirement, k)
+                for requirement, top in zip(requirements, ranked)]
+    
+    def _keyword_candidates(self, requirement: str, k: int) -> List[dict]:
+        """关键词匹配：按需求中出现的关键词数打分，同分时标准库中靠前的优先"""
         requirement_lower = requirement.lower()
-        artifacts = self.standards.get('artifacts', {})
-        
-        best_match = None
-        best_score = 0
-        
-        for artifact_id, artifact_config in artifacts.items():
-            keywords = artifact_config.get('keywords', [])
-            score = sum(1 for kw in keywords if kw.lower() in requirement_lower)
-            if score > best_score:
-                best_score = score
-                best_match = artifact_id
-        
-        return best_match if best_score > 0 else None
+        scored = ((artifact_id, sum(1 for kw in keywords if kw in requirement_lower))
+                  for artifact_id, keywords in self.library.keyword_table)
+        top = heapq.nlargest(k, (item for item in scored if item[1] > 0), key=lambda item: item[1])
+        return [{"artifact_type": artifact_id, "score": score, "matcher": "keyword"} for artifact_id, score in top]
+    
+    def decompose(self, requirement: str, min_score: float = None, max_parts: int = MAX_PARTS) -> List[dict]:
+        """需求涉及的全部产出物类型：得分不低于 min_score 的候选 (按得分从高到低，最多 max_parts 个)，
+        每项为 match_candidates 的候选附加 contract (由该产出物模板实例化的契约)
+
+        min_score 未指定时不额外过滤 (关键词匹配至少命中一个关键词，ngram 匹配不低于 self.min_score)。
+        """
+        with span("contract.decompose"):
+            candidates = self.match_candidates(requirement, k=max_parts)
+        if min_score is not None:
+            candidates = [c for c in candidates if c["score"] >= min_score]
+        return [{**c, "contract": self.library.templates[c["artifact_type"]].instantiate(requirement)}
+                for c in candidates]
     
     def generate_contract(self, requirement: str) -> dict:
         """生成完整契约"""
-        artifact_type = self.match_artifact_type(requirement)
+        with span("contract.match"):
+            artifact_type = self.match_artifact_type(requirement)
         
         if artifact_type is None:
             return {
@@ -54,25 +106,8 @@ class ContractGenerator:
                 "requirement_original": requirement
             }
         
-        artifact_config = self.standards['artifacts'][artifact_type]
-        
-        contract = {
-            "contract_id": str(uuid.uuid4()),
-            "timestamp": datetime.now().isoformat(),
-            "requirement_original": requirement,
-            "artifact_type": artifact_type,
-            "artifact_name": artifact_config.get('name', artifact_type),
-            "contract": {
-                "implicit_requirements": artifact_config.get('implicit_requirements', []),
-                "common_knowledge": artifact_config.get('common_knowledge', {}),
-                "inputs": artifact_config.get('contract_template', {}).get('inputs', []),
-                "outputs": artifact_config.get('contract_template', {}).get('outputs', []),
-                "generation_hints": artifact_config.get('generation_hints', []),
-                "verification_hints": artifact_config.get('verification_hints', {})
-            }
-        }
-        
-        return contract
+        # 契约主体来自加载标准库时构建的冻结模板 (见 odd.contract_template)，这里只叠加按请求变化的字段
+        return self.library.templates[artifact_type].instantiate(requirement)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""
+契约模板 (Contract Template)
+每个产出物类型的契约主体在标准库加载时冻结一次，并缓存其规范化 JSON 与 SHA-256 前缀状态。
+生成契约只需叠加 contract_id / timestamp / requirement_original 三个按请求变化的字段；
+封存时契约哈希由缓存的前缀哈希状态续算这几个字段得到，与
+json.dumps(contract, ensure_ascii=False, sort_keys=True) 的 SHA-256 逐字节一致。
+"""
+
+import json
+import uuid
+import hashlib
+from datetime import datetime
+
+
+class FrozenDict(dict):
+    """不可修改的 dict (仍是 dict 子类，json.dumps 与读取方式不变)"""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("契约模板不可修改")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value):
+    """递归冻结：dict → FrozenDict，list → tuple (序列化结果不变)"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+# sort_keys 后的契约顶层键顺序：
+# artifact_name, artifact_type, contract, contract_id, requirement_original, timestamp
+CONTRACT_KEYS = frozenset(("contract_id", "timestamp", "requirement_original", "artifact_type", "artifact_name",
+                           "contract"))
+
+
+class Contract(dict):
+    """由模板实例化的契约；template 用于快速计算规范化哈希"""
+
+    __slots__ = ("template",)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class ContractTemplate:
+    """单个产出物类型的冻结契约主体与缓存的序列化/哈希状态"""
+
+    def __init__(self, artifact_id: str, artifact_config: dict):
+        self.artifact_id = artifact_id
+        self.name = artifact_config.get('name', artifact_id)
+        self.body = freeze({
+            "implicit_requirements": artifact_config.get('implicit_requirements', []),
+            "common_knowledge": artifact_config.get('common_knowledge', {}),
+            "inputs": artifact_config.get('contract_template', {}).get('inputs', []),
+            "outputs": artifact_config.get('contract_template', {}).get('outputs', []),
+            "generation_hints": artifact_config.get('generation_hints', []),
+            "verification_hints": artifact_config.get('verification_hints', {})
+        })
+        # 契约主体的规范化 JSON 及其 SHA-256 (内容寻址封存库直接复用)
+        self.body_json = _dumps(self.body)
+        self.body_sha256 = hashlib.sha256(self.body_json.encode('utf-8')).hexdigest()
+        # 规范化契约中 contract_id 之前的固定部分
+        self.prefix = ('{"artifact_name": ' + _dumps(self.name) + ', "artifact_type": ' + _dumps(artifact_id)
+                       + ', "contract": ' + self.body_json + ', "contract_id": ')
+        self._prefix_hasher = None
+
+    def __getstate__(self):
+        # hashlib 对象不能 pickle (标准库快照)，加载后按需重建
+        state = self.__dict__.copy()
+        state['_prefix_hasher'] = None
+        return state
+
+    @property
+    def prefix_hasher(self):
+        if self._prefix_hasher is None:
+            self._prefix_hasher = hashlib.sha256(self.prefix.encode('utf-8'))
+        return self._prefix_hasher
+
+    def instantiate(self, requirement: str) -> Contract:
+        contract = Contract({
+            "contract_id": str(uuid.uuid4()),
+            "timestamp": datetime.now().isoformat(),
+            "requirement_original": requirement,
+            "artifact_type": self.artifact_id,
+            "artifact_name": self.name,
+            "contract": self.body,
+        })
+        contract.template = self
+        return contract
+
+    def owns(self, contract: dict) -> bool:
+        """契约仍与模板一致 (顶层键未增删、主体是同一个冻结对象)，可走快速哈希"""
+        return (contract.keys() == CONTRACT_KEYS and contract['contract'] is self.body
+                and contract['artifact_name'] == self.name and contract['artifact_type'] == self.artifact_id)
+
+    def delta(self, contract: dict) -> str:
+        """规范化契约中 contract_id 及其后的按请求变化部分"""
+        return (_dumps(contract['contract_id']) + ', "requirement_original": ' + _dumps(contract['requirement_original'])
+                + ', "timestamp": ' + _dumps(contract['timestamp']) + '}')
+
+    def canonical_json(self, contract: dict) -> str:
+        return self.prefix + self.delta(contract)
+
+    def sha256(self, contract: dict) -> str:
+        hasher = self.prefix_hasher.copy()
+        hasher.update(self.delta(contract).encode('utf-8'))
+        return hasher.hexdigest()
+
+
+def template_of(contract: dict):
+    """契约对应的模板 (契约已被改动或不是由模板生成时返回 None)"""
+    template = getattr(contract, 'template', None)
+    if template is not None and template.owns(contract):
+        return template
+    return None
+
+
+def contract_sha256(contract: dict) -> str:
+    """契约规范化 JSON 的 SHA-256；由模板生成且未改动的契约只需续算按请求变化的字段"""
+    template = template_of(contract)
+    if template is not None:
+        return template.sha256(contract)
+    return hashlib.sha256(_dumps(contract).encode('utf-8')).hexdigest()
@@ -1,67 +1,48 @@
 """
 契约验证器 (Contract Verifier)
-对生成的代码进行静态模式检查
+对生成的代码进行静态模式检查 (substring) 或语法树结构检查 (ast)，可选追加沙箱中的动态验证
 """
 
-import re
-from typing import List
+from .pattern_matcher import compile_hints
+from .ast_verifier import AstVerifier
+from .telemetry import span
+
+VERIFY_MODES = ("substring", "ast")
 
 
 class ContractVerifier:
     """契约验证器：检查生成代码是否符合契约要求"""
     
+    def __init__(self, mode: str = "substring", dynamic=None):
+        """dynamic 为 True 时使用进程内共享的沙箱工作进程池，也可传入 odd.dynamic_verifier.DynamicVerifier"""
+        if mode not in VERIFY_MODES:
+            raise ValueError(f"未知的验证模式: {mode}，可选 {VERIFY_MODES}")
+        self.mode = mode
+        self._ast = AstVerifier() if mode == "ast" else None
+        if dynamic is True:
+            from .dynamic_verifier import shared_dynamic_verifier
+            dynamic = shared_dynamic_verifier()
+        self.dynamic = dynamic or None
+    
     def verify(self, code: str, verification_hints: dict) -> dict:
-        """执行验证检查"""
-        checks = []
-        all_passed = True
-        critical_failed = False
-        
-        # must_contain_any 检查
-        for rule in verification_hints.get('must_contain_any', []):
-            patterns = rule.get('patterns', [])
-            reason = rule.get('reason', '')
-            severity = rule.get('severity', 'medium')
-            found = None
-            for pattern in patterns:
-                if pattern.lower() in code.lower():
-                    found = pattern
-                    break
-            passed = found is not None
-            if not passed and severity == 'critical':
-                critical_failed = True
-            if not passed:
-                all_passed = False
-            checks.append({"type": "must_contain_any", "rule": reason, "severity": severity, "passed": passed, "found": found})
-        
-        # must_not_contain 检查
-        for rule in verification_hints.get('must_not_contain', []):
-            patterns = rule.get('patterns', [])
-            reason = rule.get('reason', '')
-            severity = rule.get('severity', 'medium')
-            found = None
-            for pattern in patterns:
-                if pattern in code:
-                    found = pattern
-                    break
-            passed = found is None
-            if not passed and severity == 'critical':
-                critical_failed = True
-            if not passed:
-                all_passed = False
-            checks.append({"type": "must_not_contain", "rule": reason, "severity": severity, "passed": passed, "found": found})
-        
-        # should_contain 检查 (不影响整体通过)
-        for rule in verification_hints.get('should_contain', []):
-            patterns = rule.get('patterns', [])
-            reason = rule.get('reason', '')
-            found = None
-            for pattern in patterns:
-                if pattern in code:
-                    found = pattern
-                    break
-            checks.append({"type": "should_contain", "rule": reason, "severity": "low", "passed": found is not None, "found": found})
+        """执行验证检查
         
-        return {"passed": all_passed and not critical_failed, "critical_failed": critical_failed, "checks": checks}
+        substring 模式：规则编译为多模式匹配器 (按规则哈希缓存)，评估
+        must_contain_any (忽略大小写)、must_not_contain 与 should_contain (不影响整体通过)。
+        ast 模式：额外解析一次代码，用 verification_hints.structural 中的结构化规则
+        替代 reason 相同的子串规则。
+        启用动态验证时，再在沙箱中编译、导入并发送 verification_hints.probes 声明的探测请求，
+        检查项追加到 checks，摘要写入 dynamic 字段。
+        """
+        if self._ast is not None:
+            result = self._ast.verify(code, verification_hints)
+        else:
+            with span("verify.substring", code_bytes=len(code)):
+                result = compile_hints(verification_hints).evaluate(code)
+        if self.dynamic is None:
+            return result
+        with span("verify.dynamic", probes=len((verification_hints or {}).get('probes') or [])):
+            return self.dynamic.verify(code, verification_hints, result)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,508 @@
+"""
+动态验证 (Dynamic Verifier)
+在预先启动、可复用的沙箱工作进程中编译生成的代码、做导入冒烟测试，并用 Flask 测试客户端发送
+契约 verification_hints.probes 声明的探测请求；结果作为检查项追加到 ContractVerifier 的 checks。
+
+沙箱 (POSIX)：工作进程启动时限制地址空间 (RLIMIT_AS) 与单个文件大小 (RLIMIT_FSIZE)、禁用 core dump，
+尝试进入新的 user + network 命名空间 (没有权限时退回审计钩子)，安装审计钩子拒绝网络、子进程与 fork，
+并在私有临时目录中运行 (每个任务结束后清空)；每个任务另有 CPU 时间 (RLIMIT_CPU 软限制) 与墙钟 (SIGALRM) 上限，
+超限时任务以超限结果返回；生成代码拦截了超限异常、1 秒后仍未退出时，工作进程把超限结果写入结果目录后结束自身，
+父进程按超限报告该任务 (不重试)，同一进程池中被连带中断的其他任务重新提交。Windows 上只有审计钩子，不限制资源与时间。
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import types
+import signal
+import shutil
+import fnmatch
+import itertools
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CPU_S = 5.0
+DEFAULT_WALL_S = 10.0
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_FSIZE_MB = 16
+
+COMPILE_RULE = "代码可编译"
+IMPORT_RULE = "模块可导入 (冒烟测试)"
+
+# 默认接受的状态码：任何非 5xx 响应
+DEFAULT_EXPECT_STATUS = ("2xx", "3xx", "4xx")
+
+# 沙箱内拒绝的审计事件
+BLOCKED_EVENTS = frozenset({
+    "socket.connect", "socket.bind", "socket.sendto", "socket.sendmsg", "socket.getaddrinfo",
+    "socket.gethostbyname", "socket.gethostbyaddr",
+    "subprocess.Popen", "os.system", "os.exec", "os.posix_spawn", "os.spawn", "os.fork", "os.forkpty",
+    # 经 gc 可以找到审计钩子函数并改写其闭包
+    "gc.get_objects", "gc.get_referrers", "gc.get_referents",
+})
+
+# 工作进程启动时预先导入，之后的任务直接复用
+PRELOAD_MODULES = ("flask", "werkzeug", "jwt", "bcrypt", "sqlite3", "json", "hashlib", "logging")
+
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# --- 工作进程 ---
+
+class SandboxLimit(BaseException):
+    """超出 CPU 或墙钟上限；继承 BaseException，生成代码中的 except Exception 无法吞掉"""
+
+
+_sandbox = {"network": None, "rlimits": False, "workdir": None, "limit_dir": None}
+_tripped = {"count": 0}
+# 当前任务 (超限处理需要已完成的检查项)：{"id", "probes", "checks", "started", "reason"}
+_job = {}
+
+
+def _make_audit_hook(blocked: frozenset):
+    """拒绝 blocked 中事件的审计钩子；集合在安装时捕获，生成代码改写模块全局变量 BLOCKED_EVENTS 不影响已安装的钩子"""
+    def audit(event: str, args):
+        if event in blocked:
+            raise PermissionError(f"沙箱禁止: {event}")
+    return audit
+
+
+def _on_limit(signum, frame):
+    _tripped["count"] += 1
+    if _tripped["count"] > 1:
+        # 第一次超限的异常被生成代码拦截后仍在运行：把超限结果交给父进程后直接结束工作进程
+        _write_limit_result()
+        os._exit(70)
+    _job["reason"] = "CPU 时间超限" if signum == getattr(signal, "SIGXCPU", None) else "运行超时"
+    raise SandboxLimit(_job["reason"])
+
+
+def _write_limit_result():
+    limit_dir = _sandbox["limit_dir"]
+    if not limit_dir or "id" not in _job:
+        return
+    reason = f"{_job['reason'] or '运行超时'} (超限异常被拦截，工作进程已结束)"
+    result = _limit_result(list(_job["checks"]), _job["probes"], reason, _job["started"])
+    path = os.path.join(limit_dir, f"{_job['id']}.json")
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def _unshare_network() -> bool:
+    """进入新的 user + network 命名空间 (之后只有一个未启用的回环接口)；没有权限或不支持时返回 False"""
+    if not sys.platform.startswith("linux"):
+        return False
+    if hasattr(os, "unshare"):
+        try:
+            os.unshare(_CLONE_NEWUSER | _CLONE_NEWNET)
+            return True
+        except OSError:
+            return False
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _init_worker(memory_mb: int, fsize_mb: int, limit_dir: str = None):
+    workdir = tempfile.mkdtemp(prefix="odd-sandbox-")
+    os.chdir(workdir)
+    _sandbox["workdir"] = workdir
+    _sandbox["limit_dir"] = limit_dir
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+    if resource is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_mb << 20, memory_mb << 20))
+            resource.setrlimit(resource.RLIMIT_FSIZE, (fsize_mb << 20, fsize_mb << 20))
+            resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+            _sandbox["rlimits"] = True
+        except (ValueError, OSError):
+            pass
+        signal.signal(signal.SIGXCPU, _on_limit)
+        signal.signal(signal.SIGALRM, _on_limit)
+    _sandbox["network"] = "namespace" if _unshare_network() else "audit-hook"
+    sys.addaudithook(_make_audit_hook(BLOCKED_EVENTS))
+
+
+def _warm(_) -> int:
+    time.sleep(0.01)
+    return os.getpid()
+
+
+def _arm(cpu_s: float, wall_s: float):
+    _tripped["count"] = 0
+    if resource is None:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(used.ru_utime + used.ru_stime + cpu_s) + 1
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if hard != resource.RLIM_INFINITY:
+        # 硬限制由内核直接 SIGKILL：软限制至少提前 2 秒，保证两次 SIGXCPU 都在其之前送达
+        soft = max(1, min(soft, hard - 2))
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    # 之后每秒再触发一次：第一次的异常被拦截时由第二次结束工作进程
+    signal.setitimer(signal.ITIMER_REAL, wall_s, 1.0)
+
+
+def _disarm():
+    if resource is None:
+        return
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _clean_workdir():
+    workdir = _sandbox["workdir"]
+    if not workdir:
+        return
+    os.chdir(workdir)
+    for name in os.listdir(workdir):
+        path = os.path.join(workdir, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _check(rule_type: str, rule: str, severity: str, passed: bool, found: str = None) -> dict:
+    return {"type": rule_type, "rule": rule, "severity": severity, "passed": passed, "found": found}
+
+
+def _short(exc: BaseException) -> str:
+    text = f"{type(exc).__name__}: {exc}"
+    return text if len(text) <= 200 else text[:197] + "..."
+
+
+def _find_app(module: types.ModuleType):
+    """模块中的 Flask 应用 (类型带 test_client 与 route 的对象)，没有时尝试调用 create_app()"""
+    for value in list(vars(module).values()):
+        # 按类型判断：flask.request 等代理对象在请求上下文之外访问属性会抛出 RuntimeError
+        kind = type(value)
+        if kind is not type and hasattr(kind, "test_client") and hasattr(kind, "route"):
+            return value
+    factory = getattr(module, "create_app", None)
+    if callable(factory):
+        app = factory()
+        if hasattr(app, "test_client"):
+            return app
+    return None
+
+
+def _resolve_path(app, pattern: str, method: str) -> Optional[str]:
+    """不含通配符的路径原样使用；否则取 url_map 中第一个匹配且支持 method 的路由 (优先无参数路由)，参数填入占位值"""
+    if not any(c in pattern for c in "*?["):
+        return pattern
+    rules = [rule for rule in app.url_map.iter_rules()
+             if rule.endpoint != "static" and method in rule.methods and fnmatch.fnmatchcase(rule.rule, pattern)]
+    if not rules:
+        return None
+    rule = min(rules, key=lambda r: bool(r.arguments))
+    values = {}
+    for name in rule.arguments:
+        converter = type(rule._converters.get(name)).__name__ if hasattr(rule, "_converters") else ""
+        values[name] = 1 if converter in ("IntegerConverter", "NumberConverter", "FloatConverter") else "odd-probe"
+    try:
+        return rule.build(values, append_unknown=False)[1]
+    except Exception:
+        return None
+
+
+def _status_matches(status: int, expected) -> bool:
+    for item in expected:
+        item = str(item)
+        if item.endswith("xx") and str(status)[:1] == item[:1]:
+            return True
+        if item == str(status):
+            return True
+    return False
+
+
+def _run_probe(app, client, probe: dict) -> dict:
+    method = str(probe.get("method", "GET")).upper()
+    pattern = probe.get("path", "/")
+    reason = probe.get("reason") or f"{method} {pattern}"
+    severity = probe.get("severity", "medium")
+    path = _resolve_path(app, pattern, method)
+    if path is None:
+        return _check("probe", reason, severity, False, f"没有匹配 {pattern} 且支持 {method} 的路由")
+    kwargs = {"method": method}
+    for key in ("json", "headers", "data"):
+        if key in probe:
+            kwargs[key] = probe[key]
+    if "query" in probe:
+        kwargs["query_string"] = probe["query"]
+    try:
+        response = client.open(path, **kwargs)
+    except Exception as e:
+        return _check("probe", reason, severity, False, f"{method} {path} → {_short(e)}")
+    status = response.status_code
+    passed = _status_matches(status, probe.get("expect_status") or DEFAULT_EXPECT_STATUS)
+    return _check("probe", reason, severity, passed, f"{method} {path} → {status}")
+
+
+def _expected_rules(probes: list) -> List[Tuple[str, str, str]]:
+    rules = [("dynamic", COMPILE_RULE, "high"), ("dynamic", IMPORT_RULE, "high")]
+    for probe in probes:
+        method = str(probe.get("method", "GET")).upper()
+        rules.append(("probe", probe.get("reason") or f"{method} {probe.get('path', '/')}",
+                      probe.get("severity", "medium")))
+    return rules
+
+
+def _dynamic_checks(code: str, probes: list, checks: list):
+    """依次编译、导入、发送探测请求，检查项逐个追加到 checks；前一步失败时后续各项记为未执行"""
+    try:
+        compiled = compile(code, "<generated>", "exec")
+    except (SyntaxError, ValueError) as e:
+        checks.append(_check("dynamic", COMPILE_RULE, "high", False, _short(e)))
+        return
+    checks.append(_check("dynamic", COMPILE_RULE, "high", True))
+
+    # __name__ 不是 __main__，生成代码末尾的 app.run() 不会执行
+    module = types.ModuleType("odd_generated")
+    module.__file__ = os.path.join(os.getcwd(), "odd_generated.py")
+    try:
+        exec(compiled, module.__dict__)
+    except (Exception, SystemExit) as e:
+        checks.append(_check("dynamic", IMPORT_RULE, "high", False, _short(e)))
+        return
+    checks.append(_check("dynamic", IMPORT_RULE, "high", True))
+    if not probes:
+        return
+
+    try:
+        app = _find_app(module)
+    except (Exception, SystemExit) as e:
+        app, reason = None, f"create_app() 失败: {_short(e)}"
+    else:
+        reason = "未找到 Flask 应用"
+    if app is None:
+        for rule_type, rule, severity in _expected_rules(probes)[2:]:
+            checks.append(_check(rule_type, rule, severity, False, reason))
+        return
+    client = app.test_client()
+    for probe in probes:
+        checks.append(_run_probe(app, client, probe))
+
+
+def _limit_result(checks: list, probes: list, reason: Optional[str], started: float) -> dict:
+    if reason is not None:
+        # 超限发生在第 len(checks) 项，其后各项未执行
+        for i, (rule_type, rule, severity) in enumerate(_expected_rules(probes)[len(checks):]):
+            checks.append(_check(rule_type, rule, severity, False, reason if i == 0 else "未执行"))
+    return {"checks": checks, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "limit": reason, "sandbox": {"network": _sandbox["network"], "rlimits": _sandbox["rlimits"]}}
+
+
+def _run_job(job: tuple) -> dict:
+    job_id, code, probes, cpu_s, wall_s = job
+    started = time.perf_counter()
+    checks = []
+    _job.update(id=job_id, probes=probes, checks=checks, started=started, reason=None)
+    _arm(cpu_s, wall_s)
+    try:
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            _dynamic_checks(code, probes, checks)
+    except SandboxLimit as e:
+        reason = str(e)
+    except MemoryError:
+        reason = "内存超限"
+    else:
+        reason = None
+    finally:
+        _disarm()
+        _job.clear()
+        try:
+            _clean_workdir()
+        except OSError:
+            pass
+    return _limit_result(checks, probes, reason, started)
+
+
+# --- 父进程 ---
+
+def _mp_context():
+    # forkserver 由一个干净的服务进程派生工作进程，调用方 (batch / serve) 有多个线程时也安全
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def merge_dynamic(verification: dict, dynamic: dict) -> dict:
+    """把动态检查项追加到静态验证结果并重新计算 passed / critical_failed"""
+    checks = list(verification['checks']) + dynamic['checks']
+    all_passed = all(c['passed'] for c in checks if c['type'] != 'should_contain')
+    critical_failed = any(not c['passed'] and c['severity'] == 'critical' for c in checks)
+    summary = {"elapsed_ms": dynamic['elapsed_ms'], "probes": sum(c['type'] == 'probe' for c in dynamic['checks']),
+               "limit": dynamic['limit'], "sandbox": dynamic['sandbox']}
+    return {**verification, "passed": all_passed and not critical_failed, "critical_failed": critical_failed,
+            "checks": checks, "dynamic": summary}
+
+
+class DynamicVerifier:
+    """沙箱工作进程池：首次使用 (或 start()) 时启动全部工作进程并预先导入 Flask 等模块，之后所有任务复用
+
+    线程安全，多个线程可同时提交；工作进程崩溃 (BrokenProcessPool) 时重建进程池并重试一次。
+    因超限被结束的工作进程会先写出该任务的超限结果：该任务直接返回超限结果，
+    被同一次进程池中断连带失败的其他任务重新提交，且不计入其崩溃重试次数。
+    workers 默认 ODD_DYNAMIC_WORKERS 或 CPU 核数；cpu_s / wall_s / memory_mb 默认读取
+    ODD_DYNAMIC_CPU_S / ODD_DYNAMIC_WALL_S / ODD_DYNAMIC_MEMORY_MB。
+    """
+
+    def __init__(self, workers: int = None, cpu_s: float = None, wall_s: float = None, memory_mb: int = None,
+                 fsize_mb: int = DEFAULT_FSIZE_MB):
+        self.workers = int(workers or _env_number("ODD_DYNAMIC_WORKERS", 0) or os.cpu_count() or 1)
+        self.cpu_s = cpu_s or _env_number("ODD_DYNAMIC_CPU_S", DEFAULT_CPU_S)
+        self.wall_s = wall_s or _env_number("ODD_DYNAMIC_WALL_S", DEFAULT_WALL_S)
+        self.memory_mb = int(memory_mb or _env_number("ODD_DYNAMIC_MEMORY_MB", DEFAULT_MEMORY_MB))
+        self.fsize_mb = fsize_mb
+        self._lock = threading.Lock()
+        self._executor = None
+        self._generation = 0
+        self._ids = itertools.count()
+        self._limit_dir = None
+        # 由超限任务结束工作进程导致中断的进程池代数
+        self._limit_breaks = set()
+        self.stats = {"jobs": 0, "rebuilds": 0, "limit_kills": 0}
+
+    def _current(self) -> Tuple[ProcessPoolExecutor, int]:
+        with self._lock:
+            if self._executor is None:
+                if self._limit_dir is None:
+                    self._limit_dir = tempfile.mkdtemp(prefix="odd-sandbox-limits-")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context(),
+                                                     initializer=_init_worker,
+                                                     initargs=(self.memory_mb, self.fsize_mb, self._limit_dir))
+                self._generation += 1
+                # 同时提交 workers 个预热任务，迫使进程池一次启动全部工作进程
+                warm = [self._executor.submit(_warm, i) for i in range(self.workers)]
+            else:
+                warm = []
+            executor, generation = self._executor, self._generation
+        try:
+            for future in warm:
+                future.result()
+        except BrokenProcessPool:
+            self._rebuild(generation)
+            raise
+        return executor, generation
+
+    def start(self) -> "DynamicVerifier":
+        self._current()
+        return self
+
+    def _rebuild(self, generation: int):
+        """只重建一次：其他线程已经重建过 (代数不同) 时直接返回"""
+        with self._lock:
+            if self._generation != generation or self._executor is None:
+                return
+            broken, self._executor = self._executor, None
+            self.stats["rebuilds"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _take_limit_result(self, job_id: str, generation: int) -> Optional[dict]:
+        """工作进程因本任务超限而结束时写出的结果；读取后删除"""
+        path = os.path.join(self._limit_dir, f"{job_id}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            # 先登记代数再删除文件：其他任务总能看到文件或登记之一
+            self._limit_breaks.add(generation)
+            self.stats["limit_kills"] += 1
+        os.remove(path)
+        return result
+
+    def _broken_by_limit(self, generation: int) -> bool:
+        with self._lock:
+            if generation in self._limit_breaks:
+                return True
+        try:
+            return any(name.endswith(".json") for name in os.listdir(self._limit_dir))
+        except OSError:
+            return False
+
+    def run(self, code: str, probes: list = None) -> dict:
+        """在沙箱中运行一次动态验证，返回 {checks, elapsed_ms, limit, sandbox}"""
+        job = (f"{os.getpid()}-{next(self._ids)}", code, list(probes or []), self.cpu_s, self.wall_s)
+        self.stats["jobs"] += 1
+        crashes = 0
+        while crashes < 2:
+            generation = None
+            try:
+                executor, generation = self._current()
+                return executor.submit(_run_job, job).result()
+            except BrokenProcessPool:
+                if generation is None:
+                    # 预热期间工作进程退出，_current 已重建进程池
+                    crashes += 1
+                    continue
+                limited = self._take_limit_result(job[0], generation)
+                if limited is not None:
+                    self._rebuild(generation)
+                    return limited
+                if not self._broken_by_limit(generation):
+                    crashes += 1
+                self._rebuild(generation)
+        checks = [_check(rule_type, rule, severity, False, "沙箱工作进程崩溃")
+                  for rule_type, rule, severity in _expected_rules(job[2])]
+        return {"checks": checks, "elapsed_ms": None, "limit": "沙箱工作进程崩溃", "sandbox": None}
+
+    def verify(self, code: str, verification_hints: dict, verification: dict) -> dict:
+        """对静态验证结果 verification 追加动态检查项"""
+        return merge_dynamic(verification, self.run(code, (verification_hints or {}).get('probes')))
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if self._limit_dir is not None:
+            shutil.rmtree(self._limit_dir, ignore_errors=True)
+            self._limit_dir = None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_dynamic_verifier() -> DynamicVerifier:
+    """进程内共享的工作进程池 (batch 各线程与 serve 各请求共用)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DynamicVerifier()
+        return _shared
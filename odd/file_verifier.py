@@ -0,0 +1,312 @@
+"""
+文件验证器 (File Verifier)
+不经过 LLM，直接用标准库中某个产出物类型的 verification_hints 验证已有的代码文件或目录。
+
+文件在多个工作进程中并行验证。substring 模式下超过一块大小的文件经 mmap 按块读取、逐块解码后交给
+StreamScanner：块与块之间保留 max_pattern_length-1 个字符的重叠窗口，跨块边界的模式同样能命中，
+结果 (含偏移) 与对整个文件调用 ContractVerifier.verify 相同，但不会把整个文件读成一个 Python 字符串；
+全部模式都已出现后不再读取剩余内容。ast 模式需要完整的语法树，仍整体读取每个文件。
+增量模式下结果按 (内容 SHA-256, 验证模式与规则集哈希) 缓存在 SQLite 中：大小与 mtime 未变的文件直接沿用，
+其余文件只读取一遍：不超过一块的文件 (及 ast 模式) 整体读入后先按内容哈希查缓存，已在同一规则集下
+验证过的内容不再验证；更大的文件在扫描的同时计算内容哈希。
+"""
+
+import os
+import json
+import mmap
+import time
+import codecs
+import sqlite3
+import fnmatch
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from .contract_verifier import ContractVerifier, VERIFY_MODES
+from .pattern_matcher import StreamScanner, compile_hints
+from .reverifier import rule_hashes, ruleset_hash
+
+CACHE_FILE = ".verify_cache.sqlite"
+
+# 每次从 mmap 读取并解码的字节数；不超过一块的文件直接读取
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+DEFAULT_PATTERNS = ("*.py",)
+
+# 遍历目录时跳过的子目录 (另外跳过以 . 开头的目录)
+SKIP_DIRS = ("__pycache__", "node_modules")
+
+# 结果写入缓存的批大小
+CACHE_BATCH = 256
+
+
+def iter_files(paths: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS) -> Iterator[Path]:
+    """展开文件与目录：直接给出的文件总是包含，目录递归查找文件名匹配 patterns 的文件 (按路径排序)"""
+    patterns = tuple(patterns)
+    for path in map(Path, paths):
+        if not path.is_dir():
+            # 不存在的路径也原样产出，由验证结果报告错误
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS)
+            for name in sorted(files):
+                if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                    yield Path(root) / name
+
+
+def ruleset_key(verification_hints: dict, mode: str) -> str:
+    """缓存键中的规则集部分：验证模式 + 规则集哈希 (与 reverify 相同，不含 probes)"""
+    return f"{mode}:{ruleset_hash(rule_hashes(verification_hints))}"
+
+
+def _chunks(f, size: int, chunk_size: int) -> Iterator[bytes]:
+    """按块产出文件内容；超过一块的文件经 mmap 读取 (每次只复制一块)"""
+    if size <= chunk_size:
+        data = f.read()
+        if data:
+            yield data
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for start in range(0, len(mapped), chunk_size):
+            yield mapped[start:start + chunk_size]
+
+
+def scan_chunks(verification_hints: dict, chunks: Iterable[bytes], hasher=None) -> dict:
+    """逐块解码 (UTF-8，非法字节替换为 U+FFFD) 并增量扫描，返回与 ContractVerifier.verify 相同结构的结果
+
+    传入 hasher 时每块同时计入内容哈希 (此时会读完全部内容)，否则全部模式都已出现后即停止读取。
+    """
+    compiled = compile_hints(verification_hints)
+    scanner = StreamScanner(compiled, abort_severities=())
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    remaining = len(compiled.patterns)
+    iterator = iter(chunks)
+    try:
+        for chunk in iterator:
+            if hasher is not None:
+                hasher.update(chunk)
+            if len(scanner.first) < remaining:
+                scanner.feed(decoder.decode(chunk))
+            elif hasher is None:
+                break
+        scanner.feed(decoder.decode(b"", final=True))
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            # 提前停止时释放 mmap
+            close()
+    return scanner.finish()
+
+
+def _record(path, size: int, mtime_ns: Optional[int], sha256: Optional[str], verification: dict, cached: bool,
+            started: float) -> dict:
+    return {
+        "path": str(path),
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "sha256": sha256,
+        "cached": cached,
+        "passed": verification['passed'],
+        "critical_failed": verification['critical_failed'],
+        "failed_rules": [check['rule'] for check in verification['checks'] if not check['passed']],
+        "checks": verification['checks'],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+# 工作进程状态 (由 _init_worker 设置)
+_worker = {}
+
+
+def _init_worker(verification_hints: dict, mode: str, chunk_size: int, cache_path: Optional[str], ruleset: str):
+    _worker.clear()
+    _worker.update(hints=verification_hints, mode=mode, chunk_size=chunk_size, cache_path=cache_path,
+                   ruleset=ruleset, verifier=ContractVerifier(mode=mode) if mode == "ast" else None, conn=None)
+
+
+def _cached_result(sha256: str) -> Optional[dict]:
+    """工作进程中按内容哈希查找同一规则集下的已有结果 (只读连接，每个进程一个)"""
+    if _worker['cache_path'] is None:
+        return None
+    if _worker['conn'] is None:
+        uri = Path(_worker['cache_path']).resolve().as_uri() + "?mode=ro"
+        _worker['conn'] = sqlite3.connect(uri, uri=True, timeout=30)
+    row = _worker['conn'].execute("SELECT result FROM results WHERE sha256 = ? AND ruleset = ?",
+                                  (sha256, _worker['ruleset'])).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _verify_file(path: str) -> dict:
+    started = time.perf_counter()
+    hints, chunk_size = _worker['hints'], _worker['chunk_size']
+    incremental = _worker['cache_path'] is not None
+    try:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            sha256 = None
+            if _worker['verifier'] is not None or st.st_size <= chunk_size:
+                data = f.read()
+                if incremental:
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    cached = _cached_result(sha256)
+                    if cached is not None:
+                        return _record(path, st.st_size, st.st_mtime_ns, sha256, cached, True, started)
+                if _worker['verifier'] is not None:
+                    verification = _worker['verifier'].verify(data.decode('utf-8', errors='replace'), hints)
+                else:
+                    verification = scan_chunks(hints, [data] if data else [])
+            else:
+                # 大文件不先单独哈希一遍再扫描：同一遍读取中计入内容哈希
+                hasher = hashlib.sha256() if incremental else None
+                verification = scan_chunks(hints, _chunks(f, st.st_size, chunk_size), hasher)
+                if hasher is not None:
+                    sha256 = hasher.hexdigest()
+    except (OSError, ValueError) as e:
+        return {"path": str(path), "error": True, "message": f"{type(e).__name__}: {e}",
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+    return _record(path, st.st_size, st.st_mtime_ns, sha256, verification, False, started)
+
+
+class VerifyCache:
+    """增量验证缓存：files 记录 路径 → (大小, mtime, 内容哈希)，results 记录 (内容哈希, 规则集) → 验证结果"""
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS results (
+            sha256 TEXT NOT NULL,
+            ruleset TEXT NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (sha256, ruleset)
+        ) WITHOUT ROWID""",
+    )
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.SCHEMA:
+            self.conn.execute(statement)
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, path: Path, ruleset: str) -> Optional[Tuple[int, int, str, dict]]:
+        """大小与 mtime 与记录一致且该内容已在 ruleset 下验证过时，返回 (大小, mtime, 内容哈希, 验证结果)"""
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        row = self.conn.execute(
+            "SELECT f.sha256, r.result FROM files f JOIN results r ON r.sha256 = f.sha256 AND r.ruleset = ? "
+            "WHERE f.path = ? AND f.size = ? AND f.mtime_ns = ?",
+            (ruleset, str(path.resolve()), st.st_size, st.st_mtime_ns)).fetchone()
+        if row is None:
+            return None
+        return st.st_size, st.st_mtime_ns, row[0], json.loads(row[1])
+
+    def store(self, records: List[dict], ruleset: str):
+        """写入一批新验证的结果 (一个事务)"""
+        records = [r for r in records if not r.get('error') and r.get('sha256')]
+        if not records:
+            return
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                             [(str(Path(r['path']).resolve()), r['size'], r['mtime_ns'], r['sha256']) for r in records])
+            conn.executemany("INSERT OR IGNORE INTO results (sha256, ruleset, result) VALUES (?, ?, ?)",
+                             [(r['sha256'], ruleset, json.dumps(
+                                 {"passed": r['passed'], "critical_failed": r['critical_failed'], "checks": r['checks']},
+                                 ensure_ascii=False)) for r in records if not r['cached']])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class FileVerifier:
+    """按一个产出物类型的 verification_hints 并行验证文件与目录
+
+    cache_path 不为 None 时启用增量模式。workers 为工作进程数 (默认 CPU 核数，1 时在当前进程内执行)。
+    """
+
+    def __init__(self, verification_hints: dict, mode: str = "substring", workers: int = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, cache_path: Path = None):
+        if mode not in VERIFY_MODES:
+            raise ValueError(f"未知的验证模式: {mode}，可选 {VERIFY_MODES}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size 必须 >= 1")
+        self.hints = verification_hints or {}
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.cache_path = Path(cache_path) if cache_path is not None else None
+        self.ruleset = ruleset_key(self.hints, mode)
+
+    def run(self, paths: Iterable[str], patterns: Iterable[str] = DEFAULT_PATTERNS,
+            on_result: Callable[[dict], None] = None) -> dict:
+        """验证全部文件，每个结果交给 on_result (按文件顺序)；返回汇总统计"""
+        started = time.perf_counter()
+        summary = {"files": 0, "passed": 0, "failed": 0, "errors": 0, "cached": 0, "bytes": 0, "rule_failures": {}}
+        cache = VerifyCache(self.cache_path) if self.cache_path is not None else None
+
+        def emit(record: dict):
+            summary["files"] += 1
+            if record.get('error'):
+                summary["errors"] += 1
+            else:
+                summary["passed" if record['passed'] else "failed"] += 1
+                summary["cached"] += record['cached']
+                summary["bytes"] += record['size']
+                for rule in record['failed_rules']:
+                    summary["rule_failures"][rule] = summary["rule_failures"].get(rule, 0) + 1
+            if on_result is not None:
+                on_result(record)
+
+        try:
+            # 大小与 mtime 未变的文件不必交给工作进程 (连内容哈希都不用算)
+            todo = []
+            for path in iter_files(paths, patterns):
+                hit = cache.lookup(path, self.ruleset) if cache is not None else None
+                if hit is None:
+                    todo.append(str(path))
+                else:
+                    size, mtime_ns, sha256, verification = hit
+                    emit(_record(path, size, mtime_ns, sha256, verification, True, time.perf_counter()))
+
+            initargs = (self.hints, self.mode, self.chunk_size,
+                        str(self.cache_path) if cache is not None else None, self.ruleset)
+            pending = []
+            for record in self._map(todo, initargs):
+                emit(record)
+                pending.append(record)
+                if cache is not None and len(pending) >= CACHE_BATCH:
+                    cache.store(pending, self.ruleset)
+                    pending = []
+            if cache is not None:
+                cache.store(pending, self.ruleset)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+        summary["mb_per_s"] = round(summary["bytes"] / 1e6 / summary["elapsed_s"], 1) if summary["elapsed_s"] else None
+        return summary
+
+    def _map(self, todo: List[str], initargs: tuple) -> Iterator[dict]:
+        if self.workers <= 1 or len(todo) <= 1:
+            _init_worker(*initargs)
+            yield from map(_verify_file, todo)
+            return
+        chunksize = max(1, len(todo) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(todo)), initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            yield from pool.map(_verify_file, todo, chunksize=chunksize)
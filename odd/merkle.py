@@ -0,0 +1,81 @@
+"""
+Merkle 树 (Merkle Tree)
+对封存完整性哈希做整体汇总：一个根哈希即可证明整个归档，变化的封存可沿树在 O(log n) 内定位
+"""
+
+import hashlib
+from typing import List, Optional, Tuple
+
+# 叶子与内部节点使用不同前缀，防止第二原像攻击
+_LEAF = b"\x00"
+_NODE = b"\x01"
+
+
+def leaf_hash(integrity: str) -> bytes:
+    return hashlib.sha256(_LEAF + bytes.fromhex(integrity)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE + left + right).digest()
+
+
+class MerkleTree:
+    """按给定顺序的完整性哈希构建；奇数个节点时末尾节点直接提升到上一层"""
+
+    def __init__(self, integrities: List[str]):
+        self.levels: List[List[bytes]] = [[leaf_hash(h) for h in integrities]]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parent = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parent.append(level[-1])
+            self.levels.append(parent)
+
+    @property
+    def root(self) -> Optional[str]:
+        top = self.levels[-1]
+        return top[0].hex() if top else None
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def proof(self, index: int) -> List[Tuple[str, str]]:
+        """叶子 index 的认证路径：[(兄弟节点哈希, 兄弟在 "left"/"right")]"""
+        path = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                path.append((level[sibling].hex(), "left" if sibling < index else "right"))
+            index //= 2
+        return path
+
+    @staticmethod
+    def verify_proof(integrity: str, proof: List[Tuple[str, str]], root: str) -> bool:
+        current = leaf_hash(integrity)
+        for sibling, side in proof:
+            sibling = bytes.fromhex(sibling)
+            current = node_hash(sibling, current) if side == "left" else node_hash(current, sibling)
+        return current.hex() == root
+
+    def to_dict(self) -> dict:
+        return {"levels": [[h.hex() for h in level] for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MerkleTree":
+        tree = cls.__new__(cls)
+        tree.levels = [[bytes.fromhex(h) for h in level] for level in data['levels']]
+        return tree
+
+    def diff(self, other: "MerkleTree") -> List[int]:
+        """与叶子数相同的另一棵树比较，自顶向下只进入哈希不同的子树，返回不同叶子的下标"""
+        if len(self) != len(other):
+            raise ValueError("叶子数量不同，无法逐层比较")
+        if not self.levels[0]:
+            return []
+        depth = len(self.levels) - 1
+        frontier = [0] if self.levels[depth][0] != other.levels[depth][0] else []
+        for level in range(depth, 0, -1):
+            below_self, below_other = self.levels[level - 1], other.levels[level - 1]
+            frontier = [child for index in frontier for child in (2 * index, 2 * index + 1)
+                        if child < len(below_self) and below_self[child] != below_other[child]]
+        return frontier
@@ -0,0 +1,189 @@
+"""
+n-gram 匹配器 (N-gram Matcher)
+把每个产出物的 keywords / name / description 编码为字符 n-gram TF-IDF 向量，以按列压缩的稀疏矩阵保存 (只依赖 NumPy)；
+需求与产出物按余弦相似度打分，不要求需求中逐字出现关键词。多条需求组成一个查询矩阵，只展开它们命中的索引列，
+一次矩阵乘法得到全部得分。
+"""
+
+import re
+import math
+import threading
+import weakref
+from typing import Dict, List, Sequence
+
+NGRAM_SIZES = (2, 3)
+
+# 字段权重 (累加到词频上)：关键词最能代表产出物类型
+FIELD_WEIGHTS = (("keywords", 2.0), ("name", 1.0), ("description", 1.0))
+
+# 低于该余弦相似度的候选视为未匹配
+DEFAULT_MIN_SCORE = 0.15
+
+# 单次乘法中稠密矩阵 (需求数 × 产出物数、命中列数 × 产出物数) 的元素数上限，超出时按需求分块
+MAX_SCORE_CELLS = 1 << 22
+
+_SEPARATORS = re.compile(r"[^\w]+")
+
+
+def ngrams(text: str) -> Dict[str, int]:
+    """小写、标点与空白折叠为单个空格后首尾补空格，统计 NGRAM_SIZES 中各长度的字符 n-gram"""
+    text = " " + _SEPARATORS.sub(" ", str(text).lower()).strip() + " "
+    counts = {}
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+def _field_texts(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [str(value)]
+
+
+class NgramIndex:
+    """产出物的 n-gram TF-IDF 索引
+
+    词频取 1 + log(tf)，IDF 取 log((1 + N) / (1 + df)) + 1，每个产出物向量做 L2 归一化。
+    矩阵按列 (n-gram) 压缩：col_ptr[j]:col_ptr[j + 1] 为包含第 j 个 n-gram 的产出物行号与权重。
+    """
+
+    def __init__(self, artifacts: dict):
+        import numpy as np
+
+        self.artifact_ids = list(artifacts)
+        self.vocab: Dict[str, int] = {}
+        rows, cols, vals = [], [], []
+        for row, config in enumerate(artifacts.values()):
+            counts = {}
+            for field, weight in FIELD_WEIGHTS:
+                for text in _field_texts(config.get(field)):
+                    for gram, count in ngrams(text).items():
+                        counts[gram] = counts.get(gram, 0.0) + weight * count
+            for gram, tf in counts.items():
+                rows.append(row)
+                cols.append(self.vocab.setdefault(gram, len(self.vocab)))
+                vals.append(1.0 + math.log(tf))
+
+        n_docs, n_terms = len(self.artifact_ids), len(self.vocab)
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        vals = np.asarray(vals, dtype=np.float64)
+        df = np.bincount(cols, minlength=n_terms)
+        self.idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+        # 查询中索引未收录的 n-gram 按最稀有 (df = 0) 计入范数，避免只共享一两个常见 n-gram 的需求得到高分
+        self.oov_idf = math.log(1.0 + n_docs) + 1.0
+        vals *= self.idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=n_docs))
+        vals /= norms[rows]
+
+        order = np.argsort(cols, kind='stable')
+        self.col_rows = rows[order]
+        self.col_vals = vals[order]
+        self.col_ptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+        self.nnz = len(vals)
+        self._np = np
+
+    def __len__(self):
+        return len(self.artifact_ids)
+
+    def _query_matrix(self, requirements: Sequence[str]):
+        """需求的稀疏 TF-IDF 矩阵 (COO：行号, 列号, 权重)，只保留索引中存在的 n-gram"""
+        np = self._np
+        q_rows, q_cols, q_vals = [], [], []
+        for i, requirement in enumerate(requirements):
+            cols, vals, norm = [], [], 0.0
+            for gram, tf in ngrams(requirement).items():
+                col = self.vocab.get(gram)
+                idf = self.oov_idf if col is None else self.idf[col]
+                weight = (1.0 + math.log(tf)) * idf
+                norm += weight * weight
+                if col is not None:
+                    cols.append(col)
+                    vals.append(weight)
+            if not cols:
+                continue
+            norm = math.sqrt(norm)
+            q_rows.extend([i] * len(cols))
+            q_cols.extend(cols)
+            q_vals.extend(v / norm for v in vals)
+        return (np.asarray(q_rows, dtype=np.int64), np.asarray(q_cols, dtype=np.int64),
+                np.asarray(q_vals, dtype=np.float64))
+
+    def scores(self, requirements: Sequence[str]):
+        """全部需求对全部产出物的余弦相似度，形状 (len(requirements), len(self))"""
+        q_rows, q_cols, q_vals = self._query_matrix(requirements)
+        return self._product(q_rows, q_cols, q_vals, 0, len(requirements))
+
+    def _dense_columns(self, columns):
+        """索引矩阵中 columns 这几列展开为稠密矩阵，形状 (len(columns), len(self))"""
+        np = self._np
+        starts = self.col_ptr[columns]
+        counts = self.col_ptr[columns + 1] - starts
+        # 第 j 列的第 k 个非零元位于 col_rows / col_vals 的 starts[j] + k
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(int(counts.sum()))
+        dense = np.zeros((len(columns), len(self.artifact_ids)))
+        dense[np.repeat(np.arange(len(columns)), counts), self.col_rows[offsets]] = self.col_vals[offsets]
+        return dense
+
+    def _product(self, q_rows, q_cols, q_vals, row0: int, n_rows: int):
+        """查询矩阵 × 索引矩阵的转置，只展开查询实际命中的列：(n_rows × 命中列数) @ (命中列数 × 产出物数)"""
+        np = self._np
+        columns, position = np.unique(q_cols, return_inverse=True)
+        if n_rows > 1 and len(columns) * len(self.artifact_ids) > MAX_SCORE_CELLS:
+            # 命中列太多时对半拆分需求，限制稠密矩阵的大小
+            half = n_rows // 2
+            split = int(np.searchsorted(q_rows, row0 + half))
+            return np.vstack((self._product(q_rows[:split], q_cols[:split], q_vals[:split], row0, half),
+                              self._product(q_rows[split:], q_cols[split:], q_vals[split:], row0 + half,
+                                            n_rows - half)))
+        query = np.zeros((n_rows, len(columns)))
+        query[q_rows - row0, position] = q_vals
+        return query @ self._dense_columns(columns)
+
+    def top_k(self, requirements: Sequence[str], k: int = 5, min_score: float = DEFAULT_MIN_SCORE) -> List[list]:
+        """每条需求得分最高的 k 个产出物 [[(artifact_id, score), ...], ...]，按得分降序，同分按标准库顺序；
+        没有 n-gram 命中或得分都低于 min_score 的需求对应空列表
+        """
+        np = self._np
+        n_docs = len(self.artifact_ids)
+        results = [[] for _ in requirements]
+        if not n_docs or k < 1:
+            return results
+        k = min(k, n_docs)
+        q_rows, q_cols, q_vals = self._query_matrix(requirements)
+        chunk = max(1, MAX_SCORE_CELLS // n_docs)
+        for row0 in range(0, len(requirements), chunk):
+            n_rows = min(chunk, len(requirements) - row0)
+            lo, hi = np.searchsorted(q_rows, (row0, row0 + n_rows))
+            if lo == hi:
+                continue
+            scores = self._product(q_rows[lo:hi], q_cols[lo:hi], q_vals[lo:hi], row0, n_rows)
+            if k < n_docs:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(n_docs), (n_rows, n_docs))
+            for i in range(n_rows):
+                picked = [(float(scores[i, j]), int(j)) for j in top[i]
+                          if scores[i, j] > 0 and scores[i, j] >= min_score]
+                picked.sort(key=lambda item: (-item[0], item[1]))
+                results[row0 + i] = [(self.artifact_ids[j], round(score, 6)) for score, j in picked]
+        return results
+
+
+_indexes = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def ngram_index(library) -> NgramIndex:
+    """标准库 (odd.standard_library.StandardLibrary) 对应的索引，每个已加载的标准库只构建一次；未安装 numpy 时抛出 ImportError"""
+    with _indexes_lock:
+        index = _indexes.get(library)
+        if index is None:
+            # 只用到 name/description/keywords，分片标准库无需加载任何分片
+            index = NgramIndex(library.summaries)
+            _indexes[library] = index
+        return index
@@ -0,0 +1,158 @@
+"""
+补丁应用器 (Patcher)
+解析 LLM 返回的 unified diff 并应用到原代码 (纯 Python，不依赖 patch 命令)，同时给出被修改的字符区间，
+供增量验证判断哪些规则可能受影响
+"""
+
+import re
+from typing import List, NamedTuple, Tuple
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# 补丁块在声明的行号附近找不到时，向前后各搜索的最大行数 (LLM 给出的行号常有偏差)
+SEARCH_RADIUS = 200
+
+
+class PatchError(ValueError):
+    """补丁格式错误或无法应用到原代码"""
+
+
+class Hunk(NamedTuple):
+    old_start: int
+    lines: List[Tuple[str, str]]  # [(" " / "-" / "+", 去掉换行符的行内容)]
+
+
+class Edit(NamedTuple):
+    """一处连续修改：原代码 [old_start, old_end) 替换为新代码 [new_start, new_end) (字符偏移)"""
+    old_start: int
+    old_end: int
+    new_start: int
+    new_end: int
+
+
+def parse_patch(text: str) -> List[Hunk]:
+    """解析 unified diff；忽略 ---/+++/diff/index 等文件头，块内的行数以实际内容为准 (不校验 @@ 中的计数)"""
+    hunks = []
+    current = None
+    for raw in text.splitlines():
+        header = _HUNK_HEADER.match(raw)
+        if header:
+            current = Hunk(int(header.group(1)), [])
+            hunks.append(current)
+            continue
+        if current is None:
+            continue
+        if raw.startswith(("--- ", "+++ ", "diff ", "index ")):
+            # 下一个文件的文件头
+            current = None
+            continue
+        if raw.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+        if raw == "":
+            # 模型常把空白的上下文行输出为空行
+            current.lines.append((" ", ""))
+        elif raw[0] in " -+":
+            current.lines.append((raw[0], raw[1:]))
+        else:
+            raise PatchError(f"补丁块中有无法识别的行: {raw[:80]!r}")
+    hunks = [hunk for hunk in hunks if any(tag != " " for tag, _ in hunk.lines)]
+    if not hunks:
+        raise PatchError("补丁中没有任何修改")
+    return hunks
+
+
+def _locate(lines: List[str], old: List[str], hint: int, lower: int) -> int:
+    """old 在 lines[lower:] 中的起始行号，优先离 hint 最近的位置；先逐字比较，再忽略行尾空白"""
+    if not old:
+        return min(max(hint, lower), len(lines))
+    last = len(lines) - len(old)
+    for normalize in (lambda s: s, str.rstrip):
+        target = [normalize(line) for line in old]
+        for distance in range(SEARCH_RADIUS + 1):
+            for start in ((hint,) if distance == 0 else (hint - distance, hint + distance)):
+                if lower <= start <= last and [normalize(line) for line in lines[start:start + len(old)]] == target:
+                    return start
+        if last - lower > 2 * SEARCH_RADIUS:
+            # 行号偏差超出搜索半径时退回全范围查找
+            for start in range(lower, last + 1):
+                if [normalize(line) for line in lines[start:start + len(old)]] == target:
+                    return start
+    return -1
+
+
+def apply_patch(original: str, patch: str) -> Tuple[str, List[Edit]]:
+    """把 patch 应用到 original，返回 (新代码, 修改区间)；任一补丁块无法定位时抛出 PatchError"""
+    hunks = parse_patch(patch)
+    source = original.split("\n")
+    trailing_newline = original.endswith("\n")
+    if trailing_newline:
+        source.pop()
+
+    result: List[str] = []
+    # 修改区间先按行号记录：(原起始行, 原结束行, 新起始行, 新结束行)
+    line_edits = []
+    cursor = 0
+    for number, hunk in enumerate(hunks, 1):
+        old = [text for tag, text in hunk.lines if tag != "+"]
+        # 纯插入块 (@@ -N,0 ...) 表示插入在原第 N 行之后，其余块从原第 N 行开始
+        hint = hunk.old_start if not old else max(hunk.old_start - 1, 0)
+        start = _locate(source, old, hint, cursor)
+        if start < 0:
+            preview = next((text for tag, text in hunk.lines if tag != "+" and text.strip()), "")
+            raise PatchError(f"第 {number} 个补丁块无法定位到原代码 (L{hunk.old_start}: {preview.strip()[:60]!r})")
+        result.extend(source[cursor:start])
+        old_line, edit = start, None
+        for tag, text in hunk.lines:
+            if tag == " ":
+                if edit is not None:
+                    line_edits.append((*edit, old_line, len(result)))
+                    edit = None
+                # 上下文行保留原文 (可能只在行尾空白上与补丁不同)
+                result.append(source[old_line])
+                old_line += 1
+                continue
+            if edit is None:
+                edit = (old_line, len(result))
+            if tag == "-":
+                old_line += 1
+            else:
+                result.append(text)
+        if edit is not None:
+            line_edits.append((*edit, old_line, len(result)))
+        cursor = start + len(old)
+    result.extend(source[cursor:])
+
+    code = "\n".join(result) + ("\n" if trailing_newline else "")
+    return code, _char_edits(source, result, line_edits)
+
+
+def _char_edits(old_lines: List[str], new_lines: List[str], line_edits: list) -> List[Edit]:
+    def offsets(lines: List[str]) -> List[int]:
+        positions, total = [0], 0
+        for line in lines:
+            total += len(line) + 1
+            positions.append(total)
+        return positions
+
+    old_pos, new_pos = offsets(old_lines), offsets(new_lines)
+    return [Edit(old_pos[o0], old_pos[o1], new_pos[n0], new_pos[n1]) for o0, n0, o1, n1 in line_edits]
+
+
+def shift_offset(offset: int, edits: List[Edit]) -> int:
+    """原代码中 (不在任何修改区间内的) 偏移在新代码中的位置"""
+    delta = 0
+    for edit in edits:
+        if edit.old_end > offset:
+            break
+        delta = edit.new_end - edit.old_end
+    return offset + delta
+
+
+def touched_windows(original: str, code: str, edits: List[Edit], margin: int) -> Tuple[List[str], List[str]]:
+    """每处修改在原代码与新代码中向两侧各扩展 margin 个字符后的文本；
+    与修改区间有交集的任何长度不超过 margin + 1 的匹配都完整落在这些窗口中
+    """
+    old = [original[max(0, e.old_start - margin):e.old_end + margin] for e in edits]
+    new = [code[max(0, e.new_start - margin):e.new_end + margin] for e in edits]
+    return old, new
@@ -0,0 +1,174 @@
+"""
+提示词构建 (Prompt Builder)
+compact 模式：系统提示词与按产出物类型固定的契约章节在前 (同一产出物类型的请求之间逐字节一致，
+便于服务端前缀缓存命中)，按请求变化的原始需求放在最后；JSON 使用紧凑分隔符。
+按章节统计 token 数，并可在 token 预算内按严重度从低到高裁剪提示 (critical 永不裁剪)。
+"""
+
+import json
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .contract_template import template_of
+
+PROMPT_MODES = ("standard", "compact")
+
+# 超出预算时的裁剪顺序：生成提示 (无严重度) 先于 low / medium / high 级别的隐式需求
+DROP_ORDER = ("hint", "low", "medium", "high")
+
+INSTRUCTIONS = """请生成完整的 Flask API 代码，包含：
+1. 所有必要的 import 语句
+2. Flask app 初始化
+3. API 路由实现
+4. 输入验证
+5. 错误处理
+6. if __name__ == '__main__' 启动代码"""
+
+
+# --- token 计数 ---
+
+_encoders = {}
+_encoders_lock = threading.Lock()
+
+
+def _encoder(model: Optional[str]):
+    """tiktoken 编码器 (按模型缓存)；未安装 tiktoken 时返回 None"""
+    with _encoders_lock:
+        if model in _encoders:
+            return _encoders[model]
+        try:
+            import tiktoken
+        except ImportError:
+            encoder = None
+        else:
+            try:
+                encoder = tiktoken.encoding_for_model(model or "gpt-4")
+            except KeyError:
+                encoder = tiktoken.get_encoding("cl100k_base")
+        _encoders[model] = encoder
+        return encoder
+
+
+def tokenizer_name(model: str = None) -> str:
+    encoder = _encoder(model)
+    return f"tiktoken:{encoder.name}" if encoder is not None else "approx"
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """文本的 token 数：有 tiktoken 时精确计数，否则按 ASCII 4 字符/token、其余字符 1 token/字近似"""
+    encoder = _encoder(model)
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+# --- compact 模式 ---
+
+def _compact(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _droppable(body: dict) -> List[Tuple[str, str]]:
+    """可裁剪条目 [(类别, 标识)]，按裁剪顺序排列 (同一类别从后往前)"""
+    items = [("hint", str(i)) for i in range(len(body.get('generation_hints', []) or []))]
+    for req in body.get('implicit_requirements', []) or []:
+        severity = req.get('severity', 'low')
+        if severity in DROP_ORDER:
+            items.append((severity, req['id']))
+    rank = {kind: i for i, kind in enumerate(DROP_ORDER)}
+    order = {item: i for i, item in enumerate(items)}
+    return sorted(items, key=lambda item: (rank[item[0]], -order[item]))
+
+
+class StaticPrompt:
+    """compact 提示词中按产出物类型固定的部分 (裁剪 dropped 中的条目后)"""
+
+    def __init__(self, contract: dict, dropped: frozenset, model: Optional[str]):
+        body = contract.get('contract', {})
+        dropped_ids = {ident for kind, ident in dropped if kind != "hint"}
+        dropped_hints = {int(ident) for kind, ident in dropped if kind == "hint"}
+        requirements = [r for r in body.get('implicit_requirements', []) or [] if r['id'] not in dropped_ids]
+        hints = [h for i, h in enumerate(body.get('generation_hints', []) or []) if i not in dropped_hints]
+        sections = [
+            ("artifact", f"请生成一个完整的 Python Flask API 文件，实现以下契约。\n\n## 产出物类型\n"
+                         f"{contract.get('artifact_type', '')} - {contract.get('artifact_name', '')}"),
+            ("implicit_requirements", "## 隐式需求（必须全部满足）\n" + "\n".join(
+                f"- [{r['id']}|{r.get('severity', '')}] {r['name']}: {r['description']}" for r in requirements)
+             if requirements else None),
+            ("common_knowledge", "## 常识参数\n" + _compact(body.get('common_knowledge', {}))),
+            ("inputs", "## 输入参数\n" + _compact(body.get('inputs', []))),
+            ("outputs", "## 输出参数\n" + _compact(body.get('outputs', []))),
+            ("generation_hints", "## 生成提示\n" + "\n".join(f"- {h}" for h in hints) if hints else None),
+            ("instructions", INSTRUCTIONS),
+        ]
+        # 条目被全部裁剪的章节整体省略
+        sections = [(name, text) for name, text in sections if text is not None]
+        self.text = "\n\n".join(text for _, text in sections) + "\n\n## 原始需求\n"
+        self.tokens = {name: count_tokens(text, model) for name, text in sections}
+        self.total_tokens = count_tokens(self.text, model)
+        self.sha256 = hashlib.sha256(self.text.encode('utf-8')).hexdigest()
+
+
+_static = OrderedDict()
+_static_lock = threading.Lock()
+_STATIC_CACHE_SIZE = 256
+
+
+def _static_prompt(contract: dict, dropped: frozenset, model: Optional[str]) -> StaticPrompt:
+    """由模板生成的契约按 (模板主体哈希, 裁剪集合, 模型) 缓存固定部分，其余契约每次构建"""
+    template = template_of(contract)
+    if template is None:
+        return StaticPrompt(contract, dropped, model)
+    key = (template.body_sha256, template.artifact_id, template.name, dropped, model)
+    with _static_lock:
+        static = _static.get(key)
+        if static is not None:
+            _static.move_to_end(key)
+            return static
+    static = StaticPrompt(contract, dropped, model)
+    with _static_lock:
+        _static[key] = static
+        if len(_static) > _STATIC_CACHE_SIZE:
+            _static.popitem(last=False)
+    return static
+
+
+def build_compact_prompt(contract: dict, system_prompt: str, token_budget: int = None,
+                         model: str = None) -> Tuple[str, dict]:
+    """返回 (user 提示词, 报告)
+
+    报告含各章节 token 数、总数 (含系统提示词)、预算、被裁剪的条目与固定前缀的 SHA-256；
+    裁剪按 DROP_ORDER 逐条进行直到总数不超过预算，只剩 critical 条目仍超出时 over_budget 为真。
+    """
+    requirement = "" if contract.get('requirement_original') is None else str(contract['requirement_original'])
+    fixed = count_tokens(system_prompt, model) + count_tokens(requirement, model)
+    candidates = _droppable(contract.get('contract', {})) if token_budget else []
+    dropped = []
+    static = _static_prompt(contract, frozenset(), model)
+    while token_budget and fixed + static.total_tokens > token_budget and len(dropped) < len(candidates):
+        dropped.append(candidates[len(dropped)])
+        static = _static_prompt(contract, frozenset(dropped), model)
+    total = fixed + static.total_tokens
+    report = {
+        "mode": "compact",
+        "tokenizer": tokenizer_name(model),
+        "sections": {"system": count_tokens(system_prompt, model), **static.tokens,
+                     "requirement": count_tokens(requirement, model)},
+        "total_tokens": total,
+        "budget": token_budget,
+        "dropped": [ident if kind != "hint" else f"hint:{ident}" for kind, ident in dropped],
+        "over_budget": bool(token_budget) and total > token_budget,
+        "prefix_sha256": static.sha256,
+    }
+    return static.text + requirement, report
+
+
+def standard_report(system_prompt: str, user_prompt: str, model: str = None) -> dict:
+    """standard 模式只按消息统计"""
+    sections = {"system": count_tokens(system_prompt, model), "user": count_tokens(user_prompt, model)}
+    return {"mode": "standard", "tokenizer": tokenizer_name(model), "sections": sections,
+            "total_tokens": sum(sections.values()), "budget": None, "dropped": [], "over_budget": False}
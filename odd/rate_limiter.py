@@ -0,0 +1,120 @@
+"""
+速率限制器 (Rate Limiter)
+按 RPM/TPM 预约令牌，并根据服务端 x-ratelimit-* 响应头校准
+"""
+
+import re
+import time
+import threading
+from typing import Mapping, Optional
+
+
+def parse_reset(value: str) -> Optional[float]:
+    """解析 x-ratelimit-reset-* 响应头，如 "1s"、"6m0s"、"20ms"，返回秒数"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+class _Bucket:
+    """令牌桶：允许预约后余额为负，负值即为需要等待的欠额"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / 60.0
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """扣除 amount，返回需要等待的秒数"""
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+
+class RateLimiter:
+    """RPM/TPM 限流器：线程安全、与事件循环无关，调用方根据返回的等待秒数自行 sleep"""
+
+    def __init__(self, rpm: float = None, tpm: float = None):
+        self._lock = threading.Lock()
+        self._requests = _Bucket(rpm) if rpm else None
+        self._tokens = _Bucket(tpm) if tpm else None
+        # 服务端告知配额耗尽时，在此时刻之前不发送新请求
+        self._blocked_until = 0.0
+
+    def reserve(self, tokens: int) -> float:
+        """为一次请求预约 1 个请求额度和 tokens 个令牌额度，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._blocked_until - now)
+            for bucket, amount in ((self._requests, 1), (self._tokens, tokens)):
+                if bucket is None:
+                    continue
+                bucket.refill(now)
+                delay = max(delay, bucket.reserve(min(amount, bucket.capacity)))
+            return delay
+
+    def try_reserve(self, tokens: int) -> bool:
+        """无需等待时预约并返回 True，否则不预约 (用于可有可无的请求，如对冲请求)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked_until > now:
+                return False
+            pairs = [(bucket, min(amount, bucket.capacity)) for bucket, amount in
+                     ((self._requests, 1), (self._tokens, tokens)) if bucket is not None]
+            for bucket, amount in pairs:
+                bucket.refill(now)
+                if bucket.level < amount:
+                    return False
+            for bucket, amount in pairs:
+                bucket.reserve(amount)
+            return True
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """请求完成后按实际用量退还 (或补扣) 预估的令牌"""
+        if self._tokens is None or actual is None:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.level = min(self._tokens.capacity, self._tokens.level + estimated - actual)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """根据 x-ratelimit-{limit,remaining,reset}-{requests,tokens} 响应头校准本地令牌桶"""
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for kind in ("requests", "tokens"):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                bucket = self._requests if kind == "requests" else self._tokens
+                if bucket is None and limit:
+                    # 未显式配置时采用服务端公布的配额
+                    bucket = _Bucket(float(limit))
+                    if kind == "requests":
+                        self._requests = bucket
+                    else:
+                        self._tokens = bucket
+                if bucket is None or remaining is None:
+                    continue
+                bucket.refill(now)
+                bucket.level = min(bucket.level, float(remaining))
+                if float(remaining) <= 0:
+                    reset = parse_reset(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
@@ -0,0 +1,289 @@
+"""
+增量重新生成 (Regenerator)
+以封存中的代码为基础，把未通过的检查项与契约变化交给模型，只请求 unified diff 补丁 (而不是整个文件)；
+补丁在本地应用并编译校验，之后只重新验证可能受影响的规则：原先未通过的规则、契约中新增或修改的规则、
+以及模式出现在修改区域附近的规则。其余检查项沿用原封存的结果 (偏移按补丁平移)。
+新结果封存时由 verification.regeneration 链接到原封存。
+"""
+
+import json
+import time
+from typing import List, Tuple
+
+from .composite import COMPOSITE_TYPE
+from .contract_verifier import ContractVerifier, VERIFY_MODES
+from .patcher import PatchError, apply_patch, shift_offset, touched_windows
+from .pattern_matcher import RULE_TYPES, compile_hints
+from .seal_manager import SealManager
+from .telemetry import span
+
+DEFAULT_MAX_ATTEMPTS = 2
+
+# 可按补丁区域增量判断的子串规则类型: {规则类型: 是否忽略大小写}
+_SUBSTRING_TYPES = {rule_type: ignore_case for rule_type, ignore_case, _, _ in RULE_TYPES}
+
+
+def _rules_by_key(verification_hints: dict) -> dict:
+    """{(规则类型, reason): 规则}；verification_hints 中每个列表项都是一条规则"""
+    rules = {}
+    for rule_type, items in (verification_hints or {}).items():
+        if isinstance(items, list):
+            for rule in items:
+                if isinstance(rule, dict):
+                    rules[(rule_type, rule.get('reason', ''))] = rule
+    return rules
+
+
+def contract_changes(old_body: dict, new_body: dict) -> dict:
+    """两个契约主体之间的变化：验证规则 (按类型与 reason 对齐)、隐式需求 (按 id 对齐) 与生成提示"""
+    # 模板实例化的契约是只读结构 (列表冻结为元组)，先转成与封存中一致的 JSON 形态再比较
+    old_body, new_body = (json.loads(json.dumps(body or {}, ensure_ascii=False)) for body in (old_body, new_body))
+    old_rules = _rules_by_key(old_body.get('verification_hints'))
+    new_rules = _rules_by_key(new_body.get('verification_hints'))
+    rules = []
+    for key in list(new_rules) + [k for k in old_rules if k not in new_rules]:
+        old, new = old_rules.get(key), new_rules.get(key)
+        if old == new:
+            continue
+        change = "added" if old is None else "removed" if new is None else "modified"
+        spec = new if new is not None else old
+        rules.append({"change": change, "type": key[0], "reason": key[1], "severity": spec.get('severity'),
+                      "spec": spec})
+
+    old_reqs = {r.get('id'): r for r in old_body.get('implicit_requirements', []) or []}
+    new_reqs = {r.get('id'): r for r in new_body.get('implicit_requirements', []) or []}
+    requirements = []
+    for req_id in list(new_reqs) + [i for i in old_reqs if i not in new_reqs]:
+        old, new = old_reqs.get(req_id), new_reqs.get(req_id)
+        if old == new:
+            continue
+        change = "added" if old is None else "removed" if new is None else "modified"
+        item = new if new is not None else old
+        requirements.append({"change": change, "id": req_id, "name": item.get('name'),
+                             "description": item.get('description')})
+
+    old_hints = old_body.get('generation_hints', []) or []
+    new_hints = new_body.get('generation_hints', []) or []
+    hints = {"added": [h for h in new_hints if h not in old_hints],
+             "removed": [h for h in old_hints if h not in new_hints]}
+    return {"rules": rules, "implicit_requirements": requirements,
+            "generation_hints": {k: v for k, v in hints.items() if v}}
+
+
+def has_changes(changes: dict) -> bool:
+    return bool(changes['rules'] or changes['implicit_requirements'] or changes['generation_hints'])
+
+
+def _shifted(check: dict, edits) -> dict:
+    """沿用的检查项：首次出现的偏移平移到新代码中的位置"""
+    check = dict(check)
+    if check.get('offset') is not None:
+        check['offset'] = shift_offset(check['offset'], edits)
+    if check.get('matches'):
+        check['matches'] = {text: shift_offset(offset, edits) for text, offset in check['matches'].items()}
+    return check
+
+
+def verify_incremental(original: str, code: str, edits, verification_hints: dict, previous: dict,
+                       mode: str = "substring", changed: frozenset = frozenset()) -> Tuple[dict, List[str]]:
+    """只重新验证可能受影响的规则，返回 (与完整验证结构相同的结果, 重新验证的规则)
+
+    子串规则在以下情况重新验证：原验证结果中没有该规则或未通过、规则在 changed ((类型, reason)) 中、
+    或其任一模式出现在修改区域两侧各扩展 (最长模式长度 - 1) 个字符的窗口中 (原代码或新代码)。
+    其余子串规则的命中情况不会因补丁改变，沿用原结果。ast 模式下结构化规则作用于整个语法树，总是重新验证。
+    previous 的验证模式与 mode 不同时全部重新验证。
+    """
+    hints = verification_hints or {}
+    structural = (hints.get('structural') or []) if mode == "ast" else []
+    structural_reasons = {rule.get('reason') for rule in structural}
+    same_mode = (previous.get('mode') or "substring") == mode
+    carried = {(c['type'], c['rule']): c for c in previous.get('checks', [])
+               if c.get('type') in _SUBSTRING_TYPES} if same_mode else {}
+
+    compiled = compile_hints(hints)
+    old_windows, new_windows = touched_windows(original, code, edits, max(compiled.max_pattern_length - 1, 0))
+    windows = old_windows + new_windows
+    lowered = [w.lower() for w in windows]
+
+    def touched(rule: dict, ignore_case: bool) -> bool:
+        for pattern in rule.get('patterns', []):
+            if any((pattern.lower() in w) if ignore_case else (pattern in w)
+                   for w in (lowered if ignore_case else windows)):
+                return True
+        return False
+
+    # 与 AstVerifier 一致：每条结构化规则替代 reason 相同的第一条子串规则
+    replaced, pending = set(), set(structural_reasons)
+    for rule_type in _SUBSTRING_TYPES:
+        for rule in hints.get(rule_type, []) or []:
+            if rule.get('reason', '') in pending:
+                pending.discard(rule.get('reason', ''))
+                replaced.add((rule_type, rule.get('reason', '')))
+
+    subset, affected = {}, []
+    for rule_type, ignore_case in _SUBSTRING_TYPES.items():
+        for rule in hints.get(rule_type, []) or []:
+            key = (rule_type, rule.get('reason', ''))
+            if key in replaced:
+                continue
+            check = carried.get(key)
+            if check is None or not check.get('passed') or key in changed or touched(rule, ignore_case):
+                subset.setdefault(rule_type, []).append(rule)
+                affected.append(key)
+    if structural:
+        subset['structural'] = structural
+
+    with span("verify.incremental", rules=len(affected) + len(structural), carried=len(carried)):
+        fresh = ContractVerifier(mode=mode).verify(code, subset)
+    by_key = {(c['type'], c['rule']): c for c in fresh['checks']}
+    by_reason = {c['rule']: c for c in fresh['checks'] if c['type'] not in _SUBSTRING_TYPES}
+    affected_keys = set(affected)
+
+    # 检查项顺序与完整验证一致：子串规则按类型与声明顺序 (被结构化规则替代的就地替换)，其余结构化规则在后
+    checks = []
+    for rule_type in _SUBSTRING_TYPES:
+        for rule in hints.get(rule_type, []) or []:
+            key = (rule_type, rule.get('reason', ''))
+            if key in replaced:
+                checks.append(by_reason.pop(key[1]))
+            elif key in affected_keys:
+                checks.append(by_key[key])
+            else:
+                checks.append(_shifted(carried[key], edits))
+    checks.extend(by_reason.values())
+
+    all_passed = all(c['passed'] for c in checks if c['type'] != 'should_contain')
+    critical_failed = any(not c['passed'] and c['severity'] == 'critical' for c in checks)
+    result = {"passed": all_passed and not critical_failed, "critical_failed": critical_failed, "checks": checks}
+    if mode == "ast":
+        result["mode"] = "ast"
+    return result, [reason for _, reason in affected] + [rule.get('reason') for rule in structural]
+
+
+class Regenerator:
+    """基于补丁的增量重新生成
+
+    library 为当前标准库 (odd.standard_library.StandardLibrary)，用于得到原封存产出物类型的当前契约；
+    verify_mode 为 None 时沿用原封存的验证模式。补丁无法应用或应用后无法编译时，把原因附在提示词中重试，
+    共 max_attempts 次；仍失败且 fallback=True 时退回完整生成。dynamic=True 时对新代码追加沙箱动态验证。
+    """
+
+    def __init__(self, sealer: SealManager, library, code_gen, verify_mode: str = None, dynamic: bool = False,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, fallback: bool = True):
+        if verify_mode is not None and verify_mode not in VERIFY_MODES:
+            raise ValueError(f"未知的验证模式: {verify_mode}，可选 {VERIFY_MODES}")
+        self.sealer = sealer
+        self.library = library
+        self.code_gen = code_gen
+        self.verify_mode = verify_mode
+        self.dynamic = dynamic
+        self.max_attempts = max(1, max_attempts)
+        self.fallback = fallback
+
+    def current_contract(self, contract: dict) -> Tuple[dict, dict]:
+        """(当前契约, 契约变化)；产出物类型已不在标准库中或契约主体未变化时沿用原契约"""
+        artifact_type = contract.get('artifact_type')
+        if artifact_type not in self.library.artifacts:
+            return contract, contract_changes({}, {})
+        current = self.library.templates[artifact_type].instantiate(contract.get('requirement_original', ''))
+        changes = contract_changes(contract.get('contract'), current.get('contract'))
+        return (current if has_changes(changes) else contract), changes
+
+    def regenerate(self, seal_id: str) -> dict:
+        started = time.perf_counter()
+        record = self.sealer.backend.get(seal_id)
+        if record is None:
+            return {"error": True, "message": f"封存不存在: {seal_id}"}
+        artifacts = record['artifacts']
+        parent_contract = artifacts.get('contract') or {}
+        previous = artifacts.get('verification') or {}
+        original = artifacts.get('code') or ""
+        if parent_contract.get('artifact_type') == COMPOSITE_TYPE:
+            part_ids = ", ".join(part['seal_id'][:8] for part in parent_contract.get('parts', []))
+            return {"error": True, "message": f"组合封存没有代码，请分别重新生成其组成部分: {part_ids}"}
+        if parent_contract.get('error') or 'contract' not in parent_contract:
+            return {"error": True, "message": "原封存没有可用的契约"}
+
+        contract, changes = self.current_contract(parent_contract)
+        failed = [c for c in previous.get('checks', []) if not c.get('passed') and c.get('type') != 'should_contain']
+        if not failed and not has_changes(changes):
+            return {"error": True, "message": "原封存已通过验证且契约未变化，无需重新生成"}
+        mode = self.verify_mode or previous.get('mode') or "substring"
+        hints = contract['contract'].get('verification_hints', {}) or {}
+
+        attempts, tokens, feedback = [], 0, None
+        code = patch = edits = None
+        for attempt in range(1, self.max_attempts + 1):
+            with span("regenerate.patch", attempt=attempt):
+                result = self.code_gen.generate_patch(contract, original, failed, changes, feedback)
+            if result.get('error'):
+                return {"error": True, "message": result.get('message'), "attempts": attempts}
+            tokens += result.get('tokens_used') or 0
+            try:
+                with span("regenerate.apply"):
+                    code, edits = apply_patch(original, result['patch'])
+                    compile(code, "<patched>", "exec")
+            except (PatchError, SyntaxError, ValueError) as e:
+                feedback = f"{type(e).__name__}: {e}" if isinstance(e, SyntaxError) else str(e)
+                attempts.append({"attempt": attempt, "error": feedback, "tokens_used": result.get('tokens_used'),
+                                 "cached": bool(result.get('cached'))})
+                code = None
+                continue
+            patch = result['patch']
+            attempts.append({"attempt": attempt, "error": None, "tokens_used": result.get('tokens_used'),
+                             "cached": bool(result.get('cached'))})
+            break
+
+        changed = frozenset((r['type'], r['reason']) for r in changes['rules'] if r['change'] != "removed")
+        if code is not None:
+            regen_mode = "patch"
+            verification, reverified = verify_incremental(original, code, edits, hints, previous, mode, changed)
+        elif self.fallback:
+            regen_mode = "full"
+            with span("regenerate.full"):
+                result = self.code_gen.generate_code(contract)
+            if result.get('error'):
+                return {"error": True, "message": result.get('message'), "attempts": attempts}
+            tokens += result.get('tokens_used') or 0
+            code = result['code']
+            verification = ContractVerifier(mode=mode).verify(code, hints)
+            reverified = [c['rule'] for c in verification['checks']]
+        else:
+            return {"error": True, "message": f"{len(attempts)} 次补丁均无法应用: {feedback}", "attempts": attempts}
+
+        if self.dynamic:
+            from .dynamic_verifier import shared_dynamic_verifier
+            with span("verify.dynamic", probes=len(hints.get('probes') or [])):
+                verification = shared_dynamic_verifier().verify(code, hints, verification)
+
+        static_total = sum(1 for c in verification['checks'] if c['type'] not in ("dynamic", "probe"))
+        verification = {**verification, "regeneration": {
+            "parent_seal_id": record['seal_id'],
+            "parent_integrity": record.get('integrity'),
+            "mode": regen_mode,
+            "patch": patch,
+            "attempts": attempts,
+            "tokens_used": tokens,
+            "previous": {"passed": previous.get('passed'), "critical_failed": previous.get('critical_failed'),
+                         "failed_rules": [c.get('rule') for c in failed]},
+            "contract_changes": [f"{r['change']}:{r['type']}:{r['reason']}" for r in changes['rules']],
+            "reverified_rules": reverified,
+            "carried_rules": static_total - len(reverified) if regen_mode == "patch" else 0,
+        }}
+        with span("seal"):
+            seal = self.sealer.seal(artifacts.get('requirement', ''), contract, code, verification)
+        return {
+            "parent_seal_id": record['seal_id'],
+            "contract": contract,
+            "contract_changes": changes,
+            "failed_rules": failed,
+            "mode": regen_mode,
+            "patch": patch,
+            "edits": len(edits) if regen_mode == "patch" else None,
+            "attempts": attempts,
+            "tokens_used": tokens,
+            "code": code,
+            "verification": verification,
+            "seal": seal,
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        }
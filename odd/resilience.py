@@ -0,0 +1,268 @@
+"""
+调用弹性 (Resilience)
+按 (端点, 模型) 滚动统计成功调用的耗时：请求超过观测到的 p95 仍未返回时发出一个对冲 (hedged) 请求，
+取先完成者；单次请求的超时随 p99 自适应；可重试的错误按带抖动的指数退避重试；
+端点连续失败达到阈值时熔断，冷却期内直接失败，冷却后只放行一个探测请求。
+"""
+
+import os
+import time
+import random
+import threading
+from collections import deque
+from typing import Optional
+
+# 样本不足时不对冲，超时取上限
+MIN_SAMPLES = 20
+WINDOW_SIZE = 256
+
+# 每个主请求为对冲预算累积 hedge_ratio 个令牌，预算上限避免端点整体变慢时成倍放大负载
+HEDGE_BUDGET_CAP = 10.0
+
+# 可重试的 HTTP 状态码 (另加全部 5xx)
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+class CircuitOpenError(Exception):
+    """熔断期间拒绝请求"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"熔断中: 端点连续失败，{retry_in:.1f} 秒后再试")
+        self.retry_in = retry_in
+
+
+class ResiliencePolicy:
+    """重试、对冲、超时与熔断参数；未指定的读取环境变量
+
+    ODD_LLM_RETRIES (默认 3)、ODD_LLM_HEDGE (0 关闭对冲)、ODD_LLM_HEDGE_RATIO (对冲请求占比上限，默认 0.1)、
+    ODD_LLM_TIMEOUT (单次请求超时上限，默认 120 秒)、ODD_BREAKER_THRESHOLD (连续失败次数，默认 5)、
+    ODD_BREAKER_COOLDOWN (熔断冷却秒数，默认 30)。
+    """
+
+    def __init__(self, max_retries: int = None, backoff_base: float = 0.5, backoff_cap: float = 20.0,
+                 hedge: bool = None, hedge_quantile: float = 0.95, hedge_ratio: float = None,
+                 max_timeout: float = None, min_timeout: float = 10.0, timeout_multiplier: float = 3.0,
+                 breaker_threshold: int = None, breaker_cooldown: float = None):
+        self.max_retries = int(_env_number("ODD_LLM_RETRIES", 3) if max_retries is None else max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = os.getenv("ODD_LLM_HEDGE", "1") != "0" if hedge is None else hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_ratio = _env_number("ODD_LLM_HEDGE_RATIO", 0.1) if hedge_ratio is None else hedge_ratio
+        self.max_timeout = _env_number("ODD_LLM_TIMEOUT", 120.0) if max_timeout is None else max_timeout
+        self.min_timeout = min(min_timeout, self.max_timeout)
+        self.timeout_multiplier = timeout_multiplier
+        self.breaker_threshold = int(_env_number("ODD_BREAKER_THRESHOLD", 5)
+                                     if breaker_threshold is None else breaker_threshold)
+        self.breaker_cooldown = (_env_number("ODD_BREAKER_COOLDOWN", 30.0)
+                                 if breaker_cooldown is None else breaker_cooldown)
+
+    def backoff(self, retry: int, retry_after: float = None) -> float:
+        """第 retry 次重试 (从 0 起) 前的等待秒数：full jitter 指数退避，服务端给出 Retry-After 时不少于它"""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** retry)))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        return delay
+
+
+class LatencyWindow:
+    """最近 size 次成功请求的耗时 (秒)，线程安全；分位数在样本变化后首次查询时排序一次"""
+
+    def __init__(self, size: int = WINDOW_SIZE):
+        self._samples = deque(maxlen=size)
+        self._sorted = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """样本不足 MIN_SAMPLES 时返回 None"""
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class CircuitBreaker:
+    """连续失败 threshold 次后打开；冷却 cooldown 秒后半开，只放行一个探测请求，成功则关闭、失败则重新打开
+
+    探测请求被取消 (对冲落后、组合中其他部分失败、wait_for 超时) 而没有结果时，调用方以 acquire 返回的
+    令牌调用 release 归还探测名额，否则熔断器会一直停在半开状态。
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        # 当前探测请求的令牌 (每次放行探测时递增)；release 只归还仍持有名额的那一次探测
+        self._probe = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """是否放行一个请求；threshold <= 0 时熔断关闭"""
+        return self.acquire() is not None
+
+    def acquire(self) -> Optional[int]:
+        """放行时返回令牌 (普通请求为 0，半开状态的探测请求为正数)，拒绝时返回 None"""
+        if self.threshold <= 0:
+            return 0
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.CLOSED:
+                return 0
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                self._probe += 1
+                return self._probe
+            self.rejected += 1
+            return None
+
+    def release(self, token: Optional[int]):
+        """放行的请求没有结果就结束 (被取消) 时调用：若它仍持有半开探测名额则归还，不改变状态"""
+        if not token:
+            return
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probing and self._probe == token:
+                self._probing = False
+
+    def retry_in(self) -> float:
+        """距离冷却结束的秒数"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.threshold > 0):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+
+class EndpointHealth:
+    """一个 (端点, 模型) 的延迟窗口、熔断器与对冲预算"""
+
+    def __init__(self, policy: ResiliencePolicy = None):
+        self.policy = policy or ResiliencePolicy()
+        self.latency = LatencyWindow()
+        self.breaker = CircuitBreaker(self.policy.breaker_threshold, self.policy.breaker_cooldown)
+        self._lock = threading.Lock()
+        self._hedge_budget = 1.0
+
+    def timeout(self) -> float:
+        """单次请求超时：p99 的 timeout_multiplier 倍，限制在 [min_timeout, max_timeout]；样本不足时取上限"""
+        policy = self.policy
+        p99 = self.latency.quantile(0.99)
+        if p99 is None:
+            return policy.max_timeout
+        return min(policy.max_timeout, max(policy.min_timeout, p99 * policy.timeout_multiplier))
+
+    def hedge_delay(self) -> Optional[float]:
+        """主请求发出多久后仍未返回即对冲 (观测到的 p95)；关闭对冲或样本不足时返回 None"""
+        if not self.policy.hedge or self.policy.hedge_ratio <= 0:
+            return None
+        return self.latency.quantile(self.policy.hedge_quantile)
+
+    def start_call(self):
+        """每个主请求为对冲预算累积 hedge_ratio"""
+        with self._lock:
+            self._hedge_budget = min(HEDGE_BUDGET_CAP, self._hedge_budget + self.policy.hedge_ratio)
+
+    def try_hedge(self) -> bool:
+        """对冲预算足够时扣除一次并返回 True"""
+        with self._lock:
+            if self._hedge_budget < 1.0:
+                return False
+            self._hedge_budget -= 1.0
+            return True
+
+    def record_success(self, seconds: float):
+        self.latency.add(seconds)
+        self.breaker.record_success()
+
+    def stats(self) -> dict:
+        p95 = self.latency.quantile(0.95)
+        return {"breaker": self.breaker.state, "breaker_opened": self.breaker.opened,
+                "breaker_rejected": self.breaker.rejected, "samples": len(self.latency),
+                "p95_s": None if p95 is None else round(p95, 3), "timeout_s": round(self.timeout(), 3)}
+
+
+def is_retryable_status(status_code: Optional[int]) -> bool:
+    return status_code is not None and (status_code in RETRYABLE_STATUS or status_code >= 500)
+
+
+def retry_after(headers) -> Optional[float]:
+    """Retry-After / retry-after-ms 响应头 (秒)；缺失或无法解析时返回 None"""
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class CallStats:
+    """一次 generate 调用的重试/对冲/熔断计数，作为结果的 resilience 字段返回"""
+
+    __slots__ = ("requests", "retries", "hedges", "hedge_won", "breaker_rejected", "timeout_s", "hedge_after_s")
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_won = False
+        self.breaker_rejected = False
+        self.timeout_s = None
+        self.hedge_after_s = None
+
+    def as_dict(self, health: EndpointHealth) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_won": self.hedge_won,
+            "breaker": health.breaker.state,
+            "breaker_rejected": self.breaker_rejected,
+            "timeout_s": None if self.timeout_s is None else round(self.timeout_s, 3),
+            "hedge_after_s": None if self.hedge_after_s is None else round(self.hedge_after_s, 3),
+        }
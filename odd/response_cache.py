@@ -0,0 +1,178 @@
+"""
+响应缓存 (Response Cache)
+按请求内容哈希寻址的 LLM 响应持久化缓存，基于 SQLite，支持多进程并发访问
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class ResponseCache:
+    """LLM 响应缓存：键为 (模型, 温度, max_tokens, 系统提示词, 用户提示词) 的 SHA-256
+
+    淘汰策略：超过 max_age_seconds 的条目过期；总大小超过 max_bytes 时按最近访问时间 LRU 淘汰。
+    总大小由触发器在写入条目的同一事务中维护在单行 meta 表里，写入时只读这一行，超出容量才淘汰。
+    """
+
+    # 同一条目在该间隔内重复命中时不再更新访问时间，减少写锁竞争
+    TOUCH_INTERVAL = 60.0
+    # 未超出容量时，每个实例每写入这么多条做一次过期清理 (created_at 无索引，需要扫描全表)
+    EXPIRE_EVERY = 256
+
+    def __init__(self, path: str = None, max_bytes: int = 256 * 1024 * 1024, max_age_seconds: float = 30 * 86400):
+        if path is None:
+            path = Path(__file__).parent.parent / "output" / ".cache" / "llm_responses.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._init_schema()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, system_prompt: str, user_prompt: str) -> str:
+        """计算缓存键"""
+        payload = json.dumps([model, temperature, max_tokens, system_prompt, user_prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程/跨 fork 复用，按 (线程, 进程) 各建一个
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER NOT NULL)")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 旧版缓存没有 meta 表：按现有条目初始化一次总大小
+            conn.execute("INSERT OR IGNORE INTO meta (id, total_bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries")
+            conn.execute("""CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN
+                UPDATE meta SET total_bytes = total_bytes + new.size WHERE id = 0; END""")
+            conn.execute("""CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN
+                UPDATE meta SET total_bytes = total_bytes - old.size WHERE id = 0; END""")
+            conn.execute("""CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN
+                UPDATE meta SET total_bytes = total_bytes + new.size - old.size WHERE id = 0; END""")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _total_bytes(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT total_bytes FROM meta WHERE id = 0").fetchone()[0]
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def get(self, key: str) -> Optional[dict]:
+        """读取缓存，未命中或已过期返回 None"""
+        conn = self._connect()
+        row = conn.execute("SELECT value, created_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self._count('misses')
+            return None
+        value, created_at, accessed_at = row
+        if now - created_at > self.max_age_seconds:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count('misses')
+            self._count('evictions')
+            return None
+        if now - accessed_at > self.TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return json.loads(zlib.decompress(value).decode('utf-8'))
+
+    def put(self, key: str, value: dict):
+        """写入缓存，并在超出容量时淘汰"""
+        blob = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        conn = self._connect()
+        # 用 upsert 而不是 INSERT OR REPLACE：REPLACE 删除旧行时不触发 DELETE 触发器，总大小会偏大
+        conn.execute(
+            "INSERT INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+            (key, blob, len(blob), now, now)
+        )
+        self._count('writes')
+        if self._total_bytes(conn) > self.max_bytes or self.writes % self.EXPIRE_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """删除过期条目，并按 LRU 把总大小压回 max_bytes 以内，返回删除条数"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = conn.execute("DELETE FROM entries WHERE created_at < ?",
+                                   (time.time() - self.max_age_seconds,)).rowcount
+            total = self._total_bytes(conn)
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                victims = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                    victims.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                removed += len(victims)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if removed:
+            self._count('evictions', removed)
+        return removed
+
+    def clear(self):
+        """清空缓存"""
+        self._connect().execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        """返回本进程的命中统计及缓存当前规模"""
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = self._total_bytes(conn)
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes,
+                "evictions": self.evictions, "entries": entries, "bytes": size}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """进程内共享的默认缓存实例 (路径可用 ODD_LLM_CACHE_PATH 覆盖)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(os.getenv("ODD_LLM_CACHE_PATH") or None)
+        return _default_cache
@@ -0,0 +1,428 @@
+"""
+增量重新验证 (Reverifier)
+标准库的 verification_hints 变化后，只对受影响的封存重新运行 ContractVerifier。
+
+每条规则按 (规则类型, 规则内容) 的规范化 JSON 计算哈希，一个封存验证时使用的规则集合 (来自其契约中的
+verification_hints，与顺序无关) 再计算一个规则集哈希。索引 (SQLite) 记录 规则 → 规则集 → 封存：
+同一产出物类型的封存通常只对应少数几个规则集，比较它们与标准库当前规则即可得到受影响的封存，
+无需读取任何封存内容。重新验证的结果作为新封存写入 (验证结果带 reverification 字段指向原封存)，
+原封存在索引中标记为已被取代，不再参与之后的比较。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .contract_verifier import ContractVerifier, VERIFY_MODES
+from .seal_manager import SealManager
+from .seal_store import JsonSealBackend, SQLiteSealBackend, SealBackend, canonical_json
+from .seal_writer import SealWriter
+
+INDEX_FILE = ".reverify_index.sqlite"
+
+# 每批交给工作进程的封存数上限 (同时也是结果写回索引的粒度)
+CHUNK = 512
+
+
+def rule_hashes(verification_hints: dict) -> Dict[str, Tuple[str, str, str]]:
+    """{规则哈希: (规则类型, reason, 规则规范化 JSON)}；verification_hints 中每个列表项都是一条规则"""
+    rules = {}
+    for rule_type, items in sorted((verification_hints or {}).items()):
+        # 动态探测请求 (probes) 只在 --dynamic 时运行，重新验证只做静态检查，不计入规则
+        if not isinstance(items, list) or rule_type == "probes":
+            continue
+        for rule in items:
+            body = canonical_json([rule_type, rule])
+            reason = rule.get('reason', '') if isinstance(rule, dict) else ''
+            rules[hashlib.sha256(body.encode('utf-8')).hexdigest()] = (rule_type, reason, body)
+    return rules
+
+
+def ruleset_hash(hashes: Iterable[str]) -> str:
+    """规则哈希集合的哈希 (与规则顺序无关)"""
+    return hashlib.sha256("\n".join(sorted(hashes)).encode('utf-8')).hexdigest()
+
+
+def parent_seal_id(verification: dict) -> Optional[str]:
+    """重新验证 (reverification) 或增量重新生成 (regeneration) 产生的封存所取代的原封存"""
+    link = verification.get('reverification') or verification.get('regeneration') or {}
+    return link.get('parent_seal_id')
+
+
+def _summary(record: dict) -> dict:
+    """建立索引所需的字段：产出物类型、验证时使用的规则、以及 (若为重新验证的结果) 原封存"""
+    contract = record['artifacts'].get('contract') or {}
+    verification = record['artifacts'].get('verification') or {}
+    hints = (contract.get('contract') or {}).get('verification_hints')
+    return {
+        "seal_id": record['seal_id'],
+        "artifact_type": contract.get('artifact_type') if hints is not None else None,
+        "rules": rule_hashes(hints) if hints is not None else {},
+        "parent": parent_seal_id(verification),
+    }
+
+
+def _index_json_file(path: str) -> Optional[dict]:
+    """无法读取的文件返回 None (留给 audit 报告)；结构不完整的封存不参与比较"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        seal_id = record['seal_id']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    try:
+        summary = _summary(record)
+    except (KeyError, TypeError, AttributeError):
+        summary = {"seal_id": seal_id, "artifact_type": None, "rules": {}, "parent": None}
+    summary["source"] = Path(path).name
+    return summary
+
+
+_worker_stores = {}
+_worker_verifiers = {}
+
+
+def _store(db_path: str) -> SQLiteSealBackend:
+    # 每个工作进程打开一次封存库
+    store = _worker_stores.get(db_path)
+    if store is None:
+        store = _worker_stores[db_path] = SQLiteSealBackend(Path(db_path))
+    return store
+
+
+def _reverify_job(job: tuple) -> dict:
+    """在工作进程中读取封存并按当前规则重新验证；返回新封存所需的产物 (不含原验证结果的检查明细)"""
+    kind, location, seal_id, hints, mode = job
+    try:
+        if kind == "json":
+            with open(location, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        else:
+            record = _store(location).get(seal_id)
+            if record is None:
+                raise KeyError(f"封存不存在: {seal_id}")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return {"seal_id": seal_id, "error": f"无法读取: {type(e).__name__}: {e}"}
+    artifacts = record['artifacts']
+    previous = artifacts.get('verification') or {}
+    mode = mode or previous.get('mode') or "substring"
+    verifier = _worker_verifiers.get(mode)
+    if verifier is None:
+        verifier = _worker_verifiers[mode] = ContractVerifier(mode=mode)
+    try:
+        verification = verifier.verify(artifacts['code'], hints)
+    except (ValueError, SyntaxError) as e:
+        return {"seal_id": seal_id, "error": f"验证失败: {type(e).__name__}: {e}"}
+    return {
+        "seal_id": seal_id,
+        "integrity": record.get('integrity'),
+        "requirement": artifacts['requirement'],
+        "contract": artifacts['contract'],
+        "code": artifacts['code'],
+        "previous": {"passed": previous.get('passed'), "critical_failed": previous.get('critical_failed'),
+                     "failed_rules": [c.get('rule') for c in previous.get('checks', []) if not c.get('passed')]},
+        "verification": verification,
+        "mode": mode,
+    }
+
+
+class RuleIndex:
+    """规则 → 规则集 → 封存 的 SQLite 索引"""
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS rules (
+            rule_hash TEXT PRIMARY KEY,
+            rule_type TEXT NOT NULL,
+            reason TEXT NOT NULL,
+            body TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS ruleset_rules (
+            ruleset_hash TEXT NOT NULL,
+            rule_hash TEXT NOT NULL,
+            PRIMARY KEY (ruleset_hash, rule_hash)
+        ) WITHOUT ROWID""",
+        """CREATE TABLE IF NOT EXISTS seals (
+            seal_id TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            artifact_type TEXT,
+            ruleset_hash TEXT,
+            superseded_by TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_seals_ruleset ON seals(artifact_type, ruleset_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_seals_source ON seals(source)",
+    )
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.SCHEMA:
+            self.conn.execute(statement)
+
+    def close(self):
+        self.conn.close()
+
+    def sources(self) -> set:
+        return {row[0] for row in self.conn.execute("SELECT source FROM seals")}
+
+    def add(self, summaries: List[dict]):
+        """写入新封存的索引项 (一个事务)；带 parent 的封存同时把原封存标记为已被取代"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for summary in summaries:
+                rules = summary['rules']
+                rs_hash = ruleset_hash(rules) if summary['artifact_type'] is not None else None
+                if rs_hash is not None:
+                    conn.executemany("INSERT OR IGNORE INTO rules (rule_hash, rule_type, reason, body) VALUES (?, ?, ?, ?)",
+                                     [(h, *rule) for h, rule in rules.items()])
+                    conn.executemany("INSERT OR IGNORE INTO ruleset_rules (ruleset_hash, rule_hash) VALUES (?, ?)",
+                                     [(rs_hash, h) for h in rules])
+                conn.execute("INSERT OR REPLACE INTO seals (seal_id, source, artifact_type, ruleset_hash, superseded_by) "
+                             "VALUES (?, ?, ?, ?, (SELECT superseded_by FROM seals WHERE seal_id = ?))",
+                             (summary['seal_id'], summary['source'], summary['artifact_type'], rs_hash,
+                              summary['seal_id']))
+                if summary.get('parent'):
+                    conn.execute("UPDATE seals SET superseded_by = ? WHERE seal_id = ?",
+                                 (summary['seal_id'], summary['parent']))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove_sources(self, sources: Iterable[str]):
+        self.conn.executemany("DELETE FROM seals WHERE source = ?", [(s,) for s in sources])
+
+    def rulesets(self, artifact_type: str = None) -> List[Tuple[str, str, int]]:
+        """当前有效 (未被取代) 封存的 [(产出物类型, 规则集哈希, 封存数)]"""
+        sql = ("SELECT artifact_type, ruleset_hash, COUNT(*) FROM seals "
+               "WHERE superseded_by IS NULL AND artifact_type IS NOT NULL")
+        params = []
+        if artifact_type is not None:
+            sql += " AND artifact_type = ?"
+            params.append(artifact_type)
+        return self.conn.execute(sql + " GROUP BY artifact_type, ruleset_hash", params).fetchall()
+
+    def rules_of(self, rs_hash: str) -> Dict[str, Tuple[str, str]]:
+        """{规则哈希: (规则类型, reason)}"""
+        rows = self.conn.execute("SELECT r.rule_hash, r.rule_type, r.reason FROM ruleset_rules rr "
+                                 "JOIN rules r ON r.rule_hash = rr.rule_hash WHERE rr.ruleset_hash = ?", (rs_hash,))
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def seals_of(self, artifact_type: str, rs_hash: str) -> List[Tuple[str, str]]:
+        """[(seal_id, source)]"""
+        return self.conn.execute("SELECT seal_id, source FROM seals WHERE artifact_type = ? AND ruleset_hash = ? "
+                                 "AND superseded_by IS NULL ORDER BY seal_id", (artifact_type, rs_hash)).fetchall()
+
+    def count(self) -> dict:
+        total, active = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(superseded_by IS NULL), 0) FROM seals").fetchone()
+        return {"seals": total, "active": active}
+
+
+def _diff(old: Dict[str, Tuple[str, str]], new: Dict[str, Tuple[str, str, str]]) -> dict:
+    """按 (规则类型, reason) 对齐新旧规则：新增、删除、内容变化"""
+    old_keys = {(rule_type, reason): h for h, (rule_type, reason) in old.items()}
+    new_keys = {(rule_type, reason): h for h, (rule_type, reason, _) in new.items()}
+    label = lambda key: f"{key[0]}:{key[1]}"
+    return {
+        "added": sorted(label(k) for k in new_keys.keys() - old_keys.keys()),
+        "removed": sorted(label(k) for k in old_keys.keys() - new_keys.keys()),
+        "modified": sorted(label(k) for k in old_keys.keys() & new_keys.keys() if old_keys[k] != new_keys[k]),
+    }
+
+
+class Reverifier:
+    """对封存目录/封存库做基于规则哈希的增量重新验证
+
+    library 为当前标准库 (odd.standard_library.StandardLibrary)；verify_mode 为 None 时沿用各封存原来的验证模式。
+    """
+
+    def __init__(self, backend: SealBackend, library, workers: int = None, index_path: Path = None,
+                 verify_mode: str = None):
+        if verify_mode is not None and verify_mode not in VERIFY_MODES:
+            raise ValueError(f"未知的验证模式: {verify_mode}，可选 {VERIFY_MODES}")
+        self.backend = backend
+        self.library = library
+        self.workers = workers or os.cpu_count() or 1
+        self.verify_mode = verify_mode
+        if index_path is None:
+            base = backend.output_dir if isinstance(backend, JsonSealBackend) else backend.db_path.parent
+            index_path = base / INDEX_FILE
+        self.index = RuleIndex(index_path)
+
+    def close(self):
+        self.index.close()
+
+    def _map(self, fn, jobs: list) -> list:
+        if self.workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                return list(pool.map(fn, jobs, chunksize=max(1, len(jobs) // (self.workers * 4))))
+        return [fn(job) for job in jobs]
+
+    # --- 索引同步 ---
+
+    def sync(self) -> dict:
+        """把索引中还没有的封存加入索引，删除已不存在的封存；只读取新增的封存"""
+        known = self.index.sources()
+        if isinstance(self.backend, JsonSealBackend):
+            current = {path.name: path for path in self.backend.seal_files()}
+            new = [str(current[name]) for name in current.keys() - known]
+            summaries = [s for s in self._map(_index_json_file, new) if s is not None]
+        else:
+            current = {row[0] for row in self.backend._connect().execute("SELECT seal_id FROM seals")}
+            summaries = self._sqlite_summaries(sorted(current - known))
+        removed = known - set(current)
+        # 原封存先于重新验证产生的封存写入，parent 标记才能落到已存在的行上
+        summaries.sort(key=lambda s: s['parent'] is not None)
+        for start in range(0, len(summaries), CHUNK):
+            self.index.add(summaries[start:start + CHUNK])
+        if removed:
+            self.index.remove_sources(removed)
+        return {"indexed": len(summaries), "removed": len(removed)}
+
+    def _sqlite_summaries(self, seal_ids: List[str]) -> List[dict]:
+        """SQLite 封存库只需读取契约主体 (同一模板的封存共享，按哈希缓存) 与验证结果两个内容块"""
+        conn = self.backend._connect()
+        bodies, summaries = {}, []
+        for seal_id in seal_ids:
+            artifact_type, body_hash, verification_hash = conn.execute(
+                "SELECT artifact_type, contract_body_hash, verification_hash FROM seals WHERE seal_id = ?",
+                (seal_id,)).fetchone()
+            if body_hash is not None and body_hash not in bodies:
+                hints = json.loads(self.backend._get_blob(body_hash)).get('verification_hints')
+                bodies[body_hash] = None if hints is None else rule_hashes(hints)
+            rules = bodies.get(body_hash)
+            verification = json.loads(self.backend._get_blob(verification_hash)) or {}
+            summaries.append({
+                "seal_id": seal_id, "source": seal_id,
+                "artifact_type": artifact_type if rules is not None else None, "rules": rules or {},
+                "parent": parent_seal_id(verification),
+            })
+        return summaries
+
+    # --- 比较 ---
+
+    def current_hints(self, artifact_type: str) -> Optional[dict]:
+        if artifact_type not in self.library.artifacts:
+            return None
+        return self.library.artifacts[artifact_type].get('verification_hints', {}) or {}
+
+    def plan(self, artifact_type: str = None) -> dict:
+        """比较索引中的规则集与标准库当前规则，返回受影响的规则集及其封存数 (不读取封存内容)"""
+        plan = {"artifact_types": {}, "affected": 0, "unknown_types": {}}
+        current = {}
+        for a_type, rs_hash, count in self.index.rulesets(artifact_type):
+            if a_type not in current:
+                hints = self.current_hints(a_type)
+                rules = None if hints is None else rule_hashes(hints)
+                current[a_type] = (hints, rules, None if rules is None else ruleset_hash(rules))
+            hints, rules, current_hash = current[a_type]
+            if rules is None:
+                # 标准库中已没有该产出物类型
+                plan["unknown_types"][a_type] = plan["unknown_types"].get(a_type, 0) + count
+                continue
+            entry = plan["artifact_types"].setdefault(a_type, {
+                "ruleset_hash": current_hash, "hints": hints, "up_to_date": 0, "stale": []})
+            if rs_hash == current_hash:
+                entry["up_to_date"] += count
+                continue
+            entry["stale"].append({"ruleset_hash": rs_hash, "seals": count,
+                                   "changes": _diff(self.index.rules_of(rs_hash), rules)})
+            plan["affected"] += count
+        return plan
+
+    # --- 重新验证 ---
+
+    def run(self, artifact_type: str = None, dry_run: bool = False) -> dict:
+        """同步索引 → 比较规则 → 并行重新验证受影响的封存 → 写入新封存并更新索引"""
+        started = time.perf_counter()
+        synced = self.sync()
+        plan = self.plan(artifact_type)
+        report = {"synced": synced, "plan": _public_plan(plan), "affected": plan["affected"],
+                  "reverified": 0, "errors": [], "newly_failing": [], "newly_passing": [], "seals": []}
+        if dry_run or not plan["affected"]:
+            report["index"] = self.index.count()
+            report["elapsed_s"] = round(time.perf_counter() - started, 3)
+            return report
+
+        kind = "json" if isinstance(self.backend, JsonSealBackend) else "sqlite"
+        jobs, changes = [], {}
+        for a_type, entry in plan["artifact_types"].items():
+            for stale in entry["stale"]:
+                for seal_id, source in self.index.seals_of(a_type, stale["ruleset_hash"]):
+                    location = str(self.backend.output_dir / source) if kind == "json" else str(self.backend.db_path)
+                    jobs.append((kind, location, seal_id, entry["hints"], self.verify_mode))
+                    changes[seal_id] = (a_type, entry["ruleset_hash"], stale["changes"])
+
+        sealer = SealManager(self.backend.output_dir if kind == "json" else self.backend.db_path.parent,
+                             writer=SealWriter(self.backend))
+        try:
+            for start in range(0, len(jobs), CHUNK * self.workers):
+                batch = jobs[start:start + CHUNK * self.workers]
+                results = self._map(_reverify_job, batch)
+                self._seal(sealer, results, changes, report)
+        finally:
+            sealer.writer.close()
+        report["index"] = self.index.count()
+        report["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _seal(self, sealer: SealManager, results: List[dict], changes: dict, report: dict):
+        """把重新验证结果并发提交给封存写入线程 (按组提交)，再在一个事务中更新索引"""
+        json_backend = isinstance(self.backend, JsonSealBackend)
+        current = {}
+        for a_type, _, _ in changes.values():
+            if a_type not in current:
+                hints = self.current_hints(a_type)
+                current[a_type] = (hints, rule_hashes(hints))
+
+        def seal_one(result: dict) -> Tuple[dict, dict, dict]:
+            a_type, _, rule_changes = changes[result['seal_id']]
+            hints, rules = current[a_type]
+            # 新封存的契约记录实际使用的规则，其余字段与原封存相同
+            contract = dict(result['contract'])
+            contract['contract'] = {**(contract.get('contract') or {}), "verification_hints": hints}
+            verification = {**result['verification'], "reverification": {
+                "parent_seal_id": result['seal_id'],
+                "parent_integrity": result['integrity'],
+                "previous": result['previous'],
+                "rule_changes": rule_changes,
+                "mode": result['mode'],
+            }}
+            seal = sealer.seal(result['requirement'], contract, result['code'], verification)
+            source = Path(seal['file_path']).name if json_backend else seal['seal_id']
+            return result, seal, {"seal_id": seal['seal_id'], "source": source, "artifact_type": a_type,
+                                  "rules": rules, "parent": result['seal_id']}
+
+        ok = [r for r in results if 'error' not in r]
+        report["errors"].extend({"seal_id": r['seal_id'], "error": r['error']} for r in results if 'error' in r)
+        with ThreadPoolExecutor(max_workers=min(32, max(1, len(ok)))) as pool:
+            sealed = list(pool.map(seal_one, ok))
+        self.index.add([summary for _, _, summary in sealed])
+        for result, seal, _ in sealed:
+            before, after = result['previous']['passed'], result['verification']['passed']
+            entry = {"parent_seal_id": result['seal_id'], "seal_id": seal['seal_id'], "passed": after,
+                     "previous_passed": before}
+            report["seals"].append(entry)
+            if before and not after:
+                report["newly_failing"].append(entry)
+            elif after and not before:
+                report["newly_passing"].append(entry)
+        report["reverified"] += len(sealed)
+
+
+def _public_plan(plan: dict) -> dict:
+    """报告中的计划 (去掉完整的 verification_hints)"""
+    return {
+        "affected": plan["affected"],
+        "unknown_types": plan["unknown_types"],
+        "artifact_types": {a_type: {k: v for k, v in entry.items() if k != "hints"}
+                           for a_type, entry in plan["artifact_types"].items()},
+    }
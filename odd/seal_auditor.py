@@ -0,0 +1,184 @@
+"""
+封存审计器 (Seal Auditor)
+多进程并行重算封存哈希，增量跳过未变化的封存，并生成覆盖全部封存的 Merkle 根
+"""
+
+import os
+import json
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .merkle import MerkleTree
+from .seal_store import (JsonSealBackend, SQLiteSealBackend, SealBackend,
+                         canonical_json, integrity_of, sha256_text)
+
+# 增量审计状态文件，按后端区分 (JSON 目录为 json，SQLite 为封存库文件名)，两种后端共用 output/ 时互不覆盖
+STATE_FILE = ".audit_state-{}.json"
+
+
+def audit_record(record: dict) -> Tuple[List[str], str]:
+    """重算单个封存的四项哈希与完整性哈希，返回 (不一致项, 按实际内容重算的完整性哈希)"""
+    artifacts, hashes = record['artifacts'], record['hashes']
+    actual = {
+        "requirement": sha256_text(artifacts['requirement']),
+        "contract": sha256_text(canonical_json(artifacts['contract'])),
+        "code": sha256_text(artifacts['code']),
+        "verification": sha256_text(canonical_json(artifacts['verification'])),
+    }
+    errors = [f"{name} 哈希不一致" for name in actual if actual[name] != hashes.get(name)]
+    if integrity_of(hashes) != record.get('integrity'):
+        errors.append("integrity 哈希不一致")
+    return errors, integrity_of(actual)
+
+
+def _result(seal_id, record: dict) -> dict:
+    errors, integrity = audit_record(record)
+    return {"seal_id": seal_id, "integrity": integrity, "errors": errors}
+
+
+def _audit_json_file(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        return _result(record.get('seal_id'), record)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return {"seal_id": None, "integrity": None, "errors": [f"无法读取: {type(e).__name__}: {e}"]}
+
+
+_worker_stores = {}
+
+
+def _audit_sqlite_seal(args) -> dict:
+    db_path, seal_id = args
+    # 每个工作进程打开一次封存库
+    store = _worker_stores.get(db_path)
+    if store is None:
+        store = _worker_stores[db_path] = SQLiteSealBackend(Path(db_path))
+    try:
+        record = store.get(seal_id)
+        return _result(seal_id, record)
+    except (KeyError, ValueError, TypeError) as e:
+        return {"seal_id": seal_id, "integrity": None, "errors": [f"无法读取: {type(e).__name__}: {e}"]}
+
+
+class SealAuditor:
+    """封存审计器：对 JSON 目录或 SQLite 封存库做并行、增量审计"""
+
+    def __init__(self, backend: SealBackend, workers: int = None, state_path: Path = None):
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        if state_path is None:
+            if isinstance(backend, JsonSealBackend):
+                state_path = backend.output_dir / STATE_FILE.format(backend.name)
+            else:
+                state_path = backend.db_path.parent / STATE_FILE.format(backend.db_path.name)
+        self.state_path = Path(state_path)
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"entries": {}}
+
+    def _save_state(self, state: dict):
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def _fingerprints(self) -> dict:
+        """{key: (指纹, 工作进程参数)}；指纹未变的封存可跳过重算"""
+        if isinstance(self.backend, JsonSealBackend):
+            # 大小与 mtime 可以被还原 (同长度改写后重设 mtime)，指纹另含文件内容的校验和
+            items = {}
+            for path in self.backend.seal_files():
+                st = path.stat()
+                digest = hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+                items[path.name] = ([st.st_size, st.st_mtime_ns, digest], str(path))
+            return items
+        conn = self.backend._connect()
+        # 只比较 seals 表的哈希列无法发现内容块被篡改：按内容块的压缩数据计算校验和 (只读取压缩数据，不解压)，
+        # 封存引用的每个内容块的 (长度, 校验和) 都进入指纹
+        blobs = {content_hash: [len(data), hashlib.blake2b(data, digest_size=16).hexdigest()]
+                 for content_hash, data in conn.execute("SELECT hash, data FROM blobs")}
+        rows = conn.execute("SELECT seal_id, integrity, requirement_hash, contract_hash, code_hash, "
+                            "verification_hash, contract_envelope_hash, contract_body_hash FROM seals").fetchall()
+        db_path = str(self.backend.db_path)
+        items = {}
+        for seal_id, integrity, *hashes, envelope_hash, body_hash in rows:
+            referenced = (hashes[0], hashes[2], hashes[3], envelope_hash, body_hash)
+            fingerprint = [integrity, *hashes, *(blobs.get(h) for h in referenced if h is not None)]
+            items[seal_id] = (fingerprint, (db_path, seal_id))
+        return items
+
+    def audit(self, full: bool = False) -> dict:
+        """执行审计；full=True 时忽略增量状态重算全部封存"""
+        started = time.perf_counter()
+        previous = self._load_state()
+        old_entries = {} if full else previous.get('entries', {})
+        fingerprints = self._fingerprints()
+
+        entries, todo = {}, []
+        for key, (fingerprint, job) in fingerprints.items():
+            old = old_entries.get(key)
+            if old is not None and old['fingerprint'] == fingerprint and old['ok']:
+                entries[key] = old
+            else:
+                todo.append((key, fingerprint, job))
+
+        worker = _audit_json_file if isinstance(self.backend, JsonSealBackend) else _audit_sqlite_seal
+        failures = []
+        if todo:
+            jobs = [job for _, _, job in todo]
+            chunksize = max(1, len(jobs) // (self.workers * 4))
+            if self.workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    results = list(pool.map(worker, jobs, chunksize=chunksize))
+            else:
+                results = [worker(job) for job in jobs]
+            for (key, fingerprint, _), result in zip(todo, results):
+                ok = not result['errors']
+                entries[key] = {"fingerprint": fingerprint, "seal_id": result['seal_id'],
+                                "integrity": result['integrity'], "ok": ok}
+                if not ok:
+                    failures.append({"key": key, "seal_id": result['seal_id'], "errors": result['errors']})
+
+        # Merkle 叶子为按实际内容重算的完整性哈希，按 seal_id 排序；无法读取的封存不进入树
+        leaves = sorted((e['seal_id'] or key, e['integrity'], key) for key, e in entries.items() if e['integrity'])
+        tree = MerkleTree([integrity for _, integrity, _ in leaves])
+        changed = self._changed_since(previous, leaves, tree)
+
+        self._save_state({"entries": entries, "root": tree.root,
+                          "leaves": [seal_id for seal_id, _, _ in leaves], "merkle": tree.to_dict()})
+        return {
+            "total": len(fingerprints),
+            "audited": len(todo),
+            "skipped": len(fingerprints) - len(todo),
+            "failed": len(failures),
+            "failures": failures,
+            "merkle_root": tree.root,
+            "previous_root": previous.get('root'),
+            "changed_since_last": changed,
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        }
+
+    @staticmethod
+    def _changed_since(previous: dict, leaves: list, tree: MerkleTree) -> Optional[dict]:
+        """与上次审计的 Merkle 树比较，定位新增、删除和内容变化的封存"""
+        if 'merkle' not in previous:
+            return None
+        old_ids = previous.get('leaves', [])
+        new_ids = [seal_id for seal_id, _, _ in leaves]
+        if old_ids == new_ids:
+            # 叶子集合相同：逐层下降，只进入哈希不同的子树
+            modified = [new_ids[i] for i in tree.diff(MerkleTree.from_dict(previous['merkle']))]
+            return {"added": [], "removed": [], "modified": modified}
+        old_set, new_set = set(old_ids), set(new_ids)
+        old_leaves = dict(zip(old_ids, MerkleTree.from_dict(previous['merkle']).levels[0]))
+        modified = [seal_id for seal_id, leaf in zip(new_ids, tree.levels[0])
+                    if seal_id in old_leaves and old_leaves[seal_id] != leaf]
+        return {"added": sorted(new_set - old_set), "removed": sorted(old_set - new_set), "modified": modified}
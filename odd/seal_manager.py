@@ -3,63 +3,82 @@
 将所有产物进行哈希封存
 """
 
+import os
 import uuid
 import json
 import hashlib
 from datetime import datetime
 from pathlib import Path
 
+from .seal_store import SealBackend, encode_artifacts, get_backend
+from .seal_writer import SealWriter
+from .telemetry import Tracer, span
+
 
 class SealManager:
-    """封存管理器：计算哈希并生成封存记录"""
+    """封存管理器：计算哈希并生成封存记录
+    
+    backend 可为 "json" (每个封存一个文件)、"sqlite" (内容寻址封存库) 或 SealBackend 实例，
+    默认读取 ODD_SEAL_BACKEND 环境变量，未设置时为 json。
+    传入 writer (SealWriter) 时记录交给其后台线程按组提交，backend 取 writer.backend。
+    """
     
-    def __init__(self, output_dir: str = None):
+    def __init__(self, output_dir: str = None, backend=None, writer: SealWriter = None):
         if output_dir is None:
             output_dir = Path(__file__).parent.parent / "output"
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        if writer is not None:
+            backend = writer.backend
+        if not isinstance(backend, SealBackend):
+            backend = get_backend(backend or os.getenv("ODD_SEAL_BACKEND", "json"), self.output_dir)
+        self.backend = backend
+        self.writer = writer
     
     def _compute_hash(self, content: str) -> str:
         """计算 SHA-256 哈希"""
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
     
-    def seal(self, requirement: str, contract: dict, code: str, verification: dict) -> dict:
-        """封存所有产物"""
+    def seal(self, requirement: str, contract: dict, code: str, verification: dict, tracer: Tracer = None) -> dict:
+        """封存所有产物
+        
+        传入 tracer 时把追踪数据作为 telemetry 字段附加到封存记录，不参与任何哈希计算
+        (其中仍在进行的 seal 步骤与 seal.write 没有耗时)。
+        """
         seal_id = str(uuid.uuid4())
         timestamp = datetime.now().isoformat()
         
-        contract_str = json.dumps(contract, ensure_ascii=False, sort_keys=True)
-        verification_str = json.dumps(verification, ensure_ascii=False, sort_keys=True)
-        
-        seal_record = {
-            "seal_id": seal_id,
-            "timestamp": timestamp,
-            "odd_version": "0.1.0",
-            "hashes": {
-                "requirement": self._compute_hash(requirement),
-                "contract": self._compute_hash(contract_str),
-                "code": self._compute_hash(code),
-                "verification": self._compute_hash(verification_str)
-            },
-            "artifacts": {
-                "requirement": requirement,
-                "contract": contract,
-                "code": code,
-                "verification": verification
-            },
-            "integrity": None
+        artifacts = {
+            "requirement": requirement,
+            "contract": contract,
+            "code": code,
+            "verification": verification
         }
+        with span("seal.hash"):
+            # 每项产物只序列化一次，同一份规范化字节既用于哈希也交给存储后端写入
+            encoded, hashes = encode_artifacts(artifacts)
+            
+            seal_record = {
+                "seal_id": seal_id,
+                "timestamp": timestamp,
+                "odd_version": "0.1.0",
+                "hashes": hashes,
+                "artifacts": artifacts,
+                "integrity": None
+            }
+            
+            # 计算整体完整性哈希
+            integrity_content = f"{seal_record['hashes']['requirement']}:{seal_record['hashes']['contract']}:{seal_record['hashes']['code']}:{seal_record['hashes']['verification']}"
+            seal_record["integrity"] = self._compute_hash(integrity_content)
         
-        # 计算整体完整性哈希
-        integrity_content = f"{seal_record['hashes']['requirement']}:{seal_record['hashes']['contract']}:{seal_record['hashes']['code']}:{seal_record['hashes']['verification']}"
-        seal_record["integrity"] = self._compute_hash(integrity_content)
+        if tracer is not None:
+            seal_record["telemetry"] = tracer.to_dict()
         
-        # 保存到文件
-        seal_file = self.output_dir / f"seal_{seal_id[:8]}.json"
-        with open(seal_file, 'w', encoding='utf-8') as f:
-            json.dump(seal_record, f, indent=2, ensure_ascii=False)
+        # 交给存储后端保存 (有 writer 时等待所在批次提交)
+        with span("seal.write", backend=self.backend.name, batched=self.writer is not None):
+            location = (self.writer or self.backend).write(seal_record, encoded)
         
-        return {"seal_id": seal_id, "file_path": str(seal_file), "integrity": seal_record["integrity"]}
+        return {"seal_id": seal_id, "file_path": location, "integrity": seal_record["integrity"]}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,447 @@
+"""
+封存存储后端 (Seal Store)
+json: 每个封存一个 seal_<id8>.json 文件 (默认)，先写临时文件再原子地链接到最终文件名
+sqlite: 产物按 SHA-256 内容寻址、去重压缩存储，封存元数据建立索引
+"""
+
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .contract_template import template_of
+
+
+def canonical_json(obj) -> str:
+    """封存使用的规范化 JSON (与 SealManager 计算哈希时一致)"""
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True)
+
+
+def sha256_text(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def encode_artifacts(artifacts: dict) -> Tuple[dict, dict]:
+    """四项产物各序列化为规范化 UTF-8 字节一次，返回 (字节, 哈希)；存储后端直接写入同一份字节
+
+    由模板生成且未改动的契约复用模板缓存的主体 JSON 与前缀哈希状态。
+    """
+    contract = artifacts['contract']
+    template = template_of(contract)
+    contract_json = template.canonical_json(contract) if template is not None else canonical_json(contract)
+    encoded = {
+        "requirement": artifacts['requirement'].encode('utf-8'),
+        "contract": contract_json.encode('utf-8'),
+        "code": artifacts['code'].encode('utf-8'),
+        "verification": canonical_json(artifacts['verification']).encode('utf-8'),
+    }
+    hashes = {name: hashlib.sha256(data).hexdigest() for name, data in encoded.items()}
+    if template is not None:
+        hashes['contract'] = template.sha256(contract)
+    return encoded, hashes
+
+
+def integrity_of(hashes: dict) -> str:
+    """由四项产物哈希计算整体完整性哈希"""
+    return sha256_text(f"{hashes['requirement']}:{hashes['contract']}:{hashes['code']}:{hashes['verification']}")
+
+
+class SealBackend:
+    """封存后端接口"""
+
+    name = None
+
+    def write(self, record: dict, encoded: dict = None) -> str:
+        """保存封存记录，返回存储位置；encoded 为 encode_artifacts 得到的规范化字节 (未提供时自行序列化)"""
+        return self.write_many([(record, encoded)])[0]
+
+    def write_many(self, items: List[Tuple[dict, Optional[dict]]]) -> List[str]:
+        """批量保存 (record, encoded)，整批只做一次提交/落盘；返回各自的存储位置"""
+        raise NotImplementedError
+
+    def get(self, seal_id: str) -> Optional[dict]:
+        """按 seal_id (或其唯一前缀) 读取完整封存记录"""
+        raise NotImplementedError
+
+    def iter_records(self) -> Iterator[dict]:
+        """遍历全部封存记录"""
+        raise NotImplementedError
+
+
+def render_json_record(record: dict, encoded: dict) -> bytes:
+    """JSON 封存文件内容：顶层结构带缩进，契约与验证结果直接嵌入哈希时的规范化字节"""
+    parts = [b"{"]
+    for i, (key, value) in enumerate(record.items()):
+        parts.append(b"\n  " if i == 0 else b",\n  ")
+        parts.append(_json_bytes(key) + b": ")
+        if key != 'artifacts':
+            # JSON 字符串中的换行总是被转义，整体缩进不会改变取值
+            parts.append(json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  ").encode('utf-8'))
+            continue
+        parts.append(b"{")
+        for j, name in enumerate(value):
+            parts.append(b"\n    " if j == 0 else b",\n    ")
+            data = encoded[name] if name in ("contract", "verification") else _json_bytes(value[name])
+            parts.append(_json_bytes(name) + b": " + data)
+        parts.append(b"\n  }")
+    parts.append(b"\n}")
+    return b"".join(parts)
+
+
+def _json_bytes(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+class JsonSealBackend(SealBackend):
+    """每个封存一个带缩进的 JSON 文件
+
+    先写入同目录下的临时文件，再硬链接到 seal_<id8>.json；文件名已被占用 (seal_id 前 8 位相同) 时
+    改用完整的 seal_<seal_id>.json，不会覆盖已有封存，读者也不会看到写了一半的文件。
+    fsync=True 时文件内容与目录项在返回前落盘；批量写入时先写完整批文件再逐个 fsync (日志提交合并)，
+    目录只 fsync 一次。
+    """
+
+    name = "json"
+
+    def __init__(self, output_dir: Path, fsync: bool = True):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+
+    def write_many(self, items: List[Tuple[dict, Optional[dict]]]) -> List[str]:
+        staged, locations = [], []
+        try:
+            for record, encoded in items:
+                if encoded is None:
+                    encoded, _ = encode_artifacts(record['artifacts'])
+                fd, tmp_path = tempfile.mkstemp(prefix=".seal_", suffix=".tmp", dir=str(self.output_dir))
+                staged.append((record['seal_id'], tmp_path))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(render_json_record(record, encoded))
+            if self.fsync:
+                for _, tmp_path in staged:
+                    fd = os.open(tmp_path, os.O_RDWR)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+            for seal_id, tmp_path in staged:
+                locations.append(self._publish(seal_id, tmp_path))
+            if self.fsync:
+                self._fsync_dir()
+            return locations
+        finally:
+            # 清理未发布的临时文件
+            for _, tmp_path in staged[len(locations):]:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+    def _publish(self, seal_id: str, tmp_path: str) -> str:
+        """把临时文件原子地发布为封存文件 (已存在的文件名不会被覆盖；同一封存重复写入时返回已有文件)"""
+        for name in (f"seal_{seal_id[:8]}.json", f"seal_{seal_id}.json"):
+            target = self.output_dir / name
+            if self._link(tmp_path, target):
+                return str(target)
+            if self._holds(target, seal_id):
+                os.unlink(tmp_path)
+                return str(target)
+        raise FileExistsError(f"封存文件名均已被占用: {seal_id}")
+
+    @staticmethod
+    def _link(tmp_path: str, target: Path) -> bool:
+        """目标不存在时发布并返回 True"""
+        try:
+            os.link(tmp_path, target)
+        except FileExistsError:
+            return False
+        except OSError:
+            # 不支持硬链接的文件系统：检查后重命名 (检查与重命名之间不是原子的)
+            if target.exists():
+                return False
+            os.replace(tmp_path, target)
+            return True
+        os.unlink(tmp_path)
+        return True
+
+    @staticmethod
+    def _holds(path: Path, seal_id: str) -> bool:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('seal_id') == seal_id
+        except (OSError, ValueError):
+            return False
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(str(self.output_dir), os.O_RDONLY)
+        except OSError:
+            # Windows 不能打开目录
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def seal_files(self) -> List[Path]:
+        return sorted(self.output_dir.glob("seal_*.json"))
+
+    def get(self, seal_id: str) -> Optional[dict]:
+        for path in self.output_dir.glob(f"seal_{seal_id[:8]}*.json"):
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            if record.get('seal_id', '').startswith(seal_id):
+                return record
+        return None
+
+    def iter_records(self) -> Iterator[dict]:
+        for path in self.seal_files():
+            with open(path, 'r', encoding='utf-8') as f:
+                yield json.load(f)
+
+
+class SQLiteSealBackend(SealBackend):
+    """内容寻址的 SQLite 封存库
+
+    blobs 表以产物规范化文本的 SHA-256 为键存放 zlib 压缩内容，相同内容只存一份；
+    契约拆成「按请求变化的外壳」与「来自标准库模板的主体 (contract 字段)」分别存储，
+    同一产出物类型的封存共享同一个主体 blob。seals 表只保存哈希引用与可索引的元数据。
+    """
+
+    name = "sqlite"
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS seals (
+            seal_id TEXT PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            odd_version TEXT,
+            artifact_type TEXT,
+            passed INTEGER,
+            critical_failed INTEGER,
+            integrity TEXT NOT NULL,
+            requirement_hash TEXT NOT NULL,
+            contract_hash TEXT NOT NULL,
+            code_hash TEXT NOT NULL,
+            verification_hash TEXT NOT NULL,
+            contract_envelope_hash TEXT NOT NULL,
+            contract_body_hash TEXT,
+            telemetry_hash TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_seals_integrity ON seals(integrity)",
+        "CREATE INDEX IF NOT EXISTS idx_seals_artifact_type ON seals(artifact_type, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_seals_timestamp ON seals(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_seals_passed ON seals(passed, timestamp)",
+    )
+
+    # 旧版封存库缺少的列 (列名, 类型)，打开时补齐
+    ADDED_COLUMNS = (("telemetry_hash", "TEXT"),)
+
+    COLUMNS = ("seal_id", "timestamp", "odd_version", "artifact_type", "passed", "critical_failed", "integrity",
+               "requirement_hash", "contract_hash", "code_hash", "verification_hash", "contract_envelope_hash",
+               "contract_body_hash", "telemetry_hash")
+
+    INDEX_COLUMNS = ("seal_id", "timestamp", "odd_version", "artifact_type", "passed", "critical_failed", "integrity")
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._connect()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(seals)")}
+        for column, column_type in self.ADDED_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE seals ADD COLUMN {column} {column_type}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程/跨 fork 复用，按 (线程, 进程) 各建一个
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _put_blob(conn: sqlite3.Connection, content: bytes, content_hash: str = None) -> str:
+        content_hash = content_hash or hashlib.sha256(content).hexdigest()
+        data = zlib.compress(content)
+        conn.execute("INSERT OR IGNORE INTO blobs (hash, data, size) VALUES (?, ?, ?)", (content_hash, data, len(data)))
+        return content_hash
+
+    def _get_blob(self, content_hash: str) -> str:
+        row = self._connect().execute("SELECT data FROM blobs WHERE hash = ?", (content_hash,)).fetchone()
+        if row is None:
+            raise KeyError(f"封存库缺少内容块: {content_hash}")
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def write_many(self, items: List[Tuple[dict, Optional[dict]]]) -> List[str]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record, encoded in items:
+                self._insert(conn, record, encoded)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [str(self.db_path)] * len(items)
+
+    def _insert(self, conn: sqlite3.Connection, record: dict, encoded: Optional[dict]):
+        artifacts = record['artifacts']
+        hashes = record['hashes']
+        contract = artifacts['contract']
+        verification = artifacts['verification'] or {}
+        if encoded is None:
+            encoded = {
+                "requirement": artifacts['requirement'].encode('utf-8'),
+                "code": artifacts['code'].encode('utf-8'),
+                "verification": canonical_json(verification).encode('utf-8'),
+            }
+        envelope = {k: v for k, v in contract.items() if k != 'contract'}
+        self._put_blob(conn, encoded['requirement'], hashes['requirement'])
+        self._put_blob(conn, encoded['code'], hashes['code'])
+        self._put_blob(conn, encoded['verification'], hashes['verification'])
+        envelope_hash = self._put_blob(conn, canonical_json(envelope).encode('utf-8'))
+        template = template_of(contract)
+        if template is not None:
+            # 契约主体与模板一致时直接复用预先计算的规范化 JSON 与哈希；主体通常已入库，先查再压缩
+            body_hash = template.body_sha256
+            if conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (body_hash,)).fetchone() is None:
+                self._put_blob(conn, template.body_json.encode('utf-8'), body_hash)
+        elif 'contract' in contract:
+            body_hash = self._put_blob(conn, canonical_json(contract['contract']).encode('utf-8'))
+        else:
+            body_hash = None
+        # 追踪数据不参与封存哈希，单独存为内容块
+        telemetry_hash = (self._put_blob(conn, canonical_json(record['telemetry']).encode('utf-8'))
+                          if 'telemetry' in record else None)
+        conn.execute(
+            f"INSERT INTO seals ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            (record['seal_id'], record['timestamp'], record.get('odd_version'), contract.get('artifact_type'),
+             _as_int(verification.get('passed')), _as_int(verification.get('critical_failed')),
+             record['integrity'], hashes['requirement'], hashes['contract'], hashes['code'],
+             hashes['verification'], envelope_hash, body_hash, telemetry_hash)
+        )
+
+    def _load(self, row) -> dict:
+        (seal_id, timestamp, odd_version, _artifact_type, _passed, _critical, integrity, requirement_hash,
+         contract_hash, code_hash, verification_hash, envelope_hash, body_hash, telemetry_hash) = row
+        contract = json.loads(self._get_blob(envelope_hash))
+        if body_hash is not None:
+            contract['contract'] = json.loads(self._get_blob(body_hash))
+        record = {
+            "seal_id": seal_id,
+            "timestamp": timestamp,
+            "odd_version": odd_version,
+            "hashes": {"requirement": requirement_hash, "contract": contract_hash,
+                       "code": code_hash, "verification": verification_hash},
+            "artifacts": {
+                "requirement": self._get_blob(requirement_hash),
+                "contract": contract,
+                "code": self._get_blob(code_hash),
+                "verification": json.loads(self._get_blob(verification_hash)),
+            },
+            "integrity": integrity,
+        }
+        if telemetry_hash is not None:
+            record["telemetry"] = json.loads(self._get_blob(telemetry_hash))
+        return record
+
+    def get(self, seal_id: str) -> Optional[dict]:
+        conn = self._connect()
+        columns = ", ".join(self.COLUMNS)
+        row = conn.execute(f"SELECT {columns} FROM seals WHERE seal_id = ?", (seal_id,)).fetchone()
+        if row is None:
+            rows = conn.execute(f"SELECT {columns} FROM seals WHERE seal_id LIKE ? LIMIT 2", (seal_id + "%",)).fetchall()
+            row = rows[0] if len(rows) == 1 else None
+        return self._load(row) if row else None
+
+    def iter_records(self) -> Iterator[dict]:
+        for row in self._connect().execute(f"SELECT {', '.join(self.COLUMNS)} FROM seals ORDER BY timestamp").fetchall():
+            yield self._load(row)
+
+    def find(self, integrity: str = None, artifact_type: str = None, since: str = None, until: str = None,
+             passed: bool = None, limit: int = None) -> List[dict]:
+        """按完整性哈希、产出物类型、时间范围 (ISO8601，含 since 不含 until)、是否通过查询封存元数据"""
+        clauses, params = [], []
+        for column, op, value in (("integrity", "=", integrity), ("artifact_type", "=", artifact_type),
+                                  ("timestamp", ">=", since), ("timestamp", "<", until),
+                                  ("passed", "=", _as_int(passed))):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        sql = f"SELECT {', '.join(self.INDEX_COLUMNS)} FROM seals"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._connect().execute(sql, params).fetchall()
+        return [dict(zip(self.INDEX_COLUMNS, row)) for row in rows]
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        seals = conn.execute("SELECT COUNT(*) FROM seals").fetchone()[0]
+        blobs, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {"seals": seals, "blobs": blobs, "blob_bytes": stored}
+
+
+def _as_int(value) -> Optional[int]:
+    return None if value is None else int(bool(value))
+
+
+BACKENDS = ("json", "sqlite")
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(kind: str, output_dir: Path) -> SealBackend:
+    """按 (类型, 目录) 复用后端实例；sqlite 库位于 <output_dir>/seals.sqlite"""
+    if kind not in BACKENDS:
+        raise ValueError(f"未知的封存后端: {kind}，可选 {BACKENDS}")
+    key = (kind, str(Path(output_dir).resolve()))
+    with _backends_lock:
+        if key not in _backends:
+            if kind == "sqlite":
+                _backends[key] = SQLiteSealBackend(Path(output_dir) / "seals.sqlite")
+            else:
+                _backends[key] = JsonSealBackend(output_dir)
+        return _backends[key]
+
+
+def migrate_json_seals(src_dir: Path, target: SealBackend) -> dict:
+    """把目录中的 seal_*.json 导入目标后端；哈希校验失败的封存跳过并报告"""
+    report = {"migrated": 0, "skipped_existing": 0, "corrupt": []}
+    for path in JsonSealBackend(src_dir).seal_files():
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        hashes = record['hashes']
+        encoded, actual = encode_artifacts(record['artifacts'])
+        if actual != hashes or integrity_of(actual) != record['integrity']:
+            report["corrupt"].append(str(path))
+            continue
+        if target.get(record['seal_id']) is not None:
+            report["skipped_existing"] += 1
+            continue
+        target.write(record, encoded)
+        report["migrated"] += 1
+    return report
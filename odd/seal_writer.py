@@ -0,0 +1,99 @@
+"""
+封存写入器 (Seal Writer)
+后台线程按组提交 (group commit) 封存记录：写入期间到达的记录合并成下一批，整批一次事务/一轮 fsync
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import List, Optional
+
+from .seal_store import SealBackend
+
+_STOP = object()
+
+
+class SealWriter:
+    """后台封存写入线程
+
+    submit 把记录放入有界队列 (队列满时阻塞调用方，形成背压) 并返回 Future；
+    写入线程每次取走队列中已有的全部记录 (最多 max_batch 条)，调用 backend.write_many 一次提交。
+    write 与 SealBackend.write 签名一致，等待所在批次落盘后返回存储位置，可直接替代后端传给 SealManager。
+    """
+
+    def __init__(self, backend: SealBackend, max_queue: int = 256, max_batch: int = 64):
+        if max_queue < 1 or max_batch < 1:
+            raise ValueError("max_queue 与 max_batch 必须 >= 1")
+        self.backend = backend
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._lock = threading.Lock()
+        self.stats = {"records": 0, "batches": 0, "max_batch": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="odd-seal-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict, encoded: dict = None) -> Future:
+        """提交一条封存记录；队列已满时阻塞直到写入线程腾出空间"""
+        future = Future()
+        # 在锁内入队，保证关闭后不会有记录排在停止标记之后
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SealWriter 已关闭")
+            self._queue.put((record, encoded, future))
+        return future
+
+    def write(self, record: dict, encoded: dict = None) -> str:
+        return self.submit(record, encoded).result()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # 取走上一批写入期间积压的记录，合并为一次提交
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch: List[tuple]):
+        try:
+            locations = self.backend.write_many([(record, encoded) for record, encoded, _ in batch])
+        except Exception:
+            # 整批失败 (例如其中一条 seal_id 重复) 时逐条重试，只让出错的记录失败
+            for record, encoded, future in batch:
+                try:
+                    future.set_result(self.backend.write(record, encoded))
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    future.set_exception(e)
+        else:
+            for (_, _, future), location in zip(batch, locations):
+                future.set_result(location)
+        self.stats["records"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+    def close(self, timeout: Optional[float] = None):
+        """写完已提交的记录后停止写入线程"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
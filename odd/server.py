@@ -0,0 +1,476 @@
+"""
+ODD 服务 (ODD Server)
+常驻进程的 asyncio HTTP 服务：四个组件只构造一次并保持预热，LLM 客户端连接池在请求间共享，
+相同的并发请求合并为一次执行，收到 SIGTERM/SIGINT 时停止接收新请求并等待进行中的请求完成。
+dynamic=True 时 /generate 与 /verify 在静态验证之后再做沙箱动态验证，沙箱工作进程在启动时即全部预热。
+
+接口 (请求与响应均为 JSON):
+  POST /contract  {"requirement"}
+  POST /match     {"requirements": [...], "top_k"?}  批量匹配需求到候选产出物类型 (ngram 匹配器一次矩阵乘法)
+  POST /generate  {"requirement", "verify_mode"?, "n_candidates"?, "decompose"?, "min_score"?}
+                  完整流程：契约 → 生成 (可选 best-of-N) → 验证 → 封存；decompose 时需求涉及的多个产出物并发生成并写组合封存
+  POST /verify    {"code", "artifact_type" | "verification_hints", "mode"?}
+  POST /seal      {"requirement", "contract", "code", "verification"}
+  GET  /health    运行状态 (排空中返回 503)
+  GET  /metrics   Prometheus 文本格式指标 (--trace 时包含各步骤耗时直方图)
+"""
+
+import json
+import time
+import signal
+import asyncio
+import hashlib
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from .contract_generator import ContractGenerator
+from .candidates import generate_best_of_n
+from .composite import generate_parts, seal_composite
+from .code_generator import CodeGenerator
+from .contract_verifier import ContractVerifier, VERIFY_MODES
+from .seal_manager import SealManager
+from .seal_writer import SealWriter
+from .telemetry import METRICS, Tracer, span
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_CANDIDATES = 8
+MAX_MATCH_REQUIREMENTS = 10000
+MAX_TOP_K = 50
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 500: "Internal Server Error", 502: "Bad Gateway",
+           503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class OddService:
+    """预热的 ODD 组件与请求处理逻辑 (与 HTTP 传输层无关)"""
+
+    def __init__(self, verify_mode: str = "substring", seal_backend=None, use_cache: bool = None,
+                 workers: int = 4, trace: bool = False, output_dir: str = None, prompt_mode: str = None,
+                 token_budget: int = None, matcher: str = None, dynamic: bool = False):
+        if verify_mode not in VERIFY_MODES:
+            raise ValueError(f"未知的验证模式: {verify_mode}，可选 {VERIFY_MODES}")
+        self.verify_mode = verify_mode
+        self.trace = trace
+        self.contract_gen = ContractGenerator(matcher=matcher)
+        try:
+            self.code_gen = CodeGenerator(use_cache=use_cache, prompt_mode=prompt_mode, token_budget=token_budget)
+            self.code_gen_error = None
+        except ValueError as e:
+            # 未配置 API Key 时其余接口照常可用，/generate 返回 503
+            self.code_gen = None
+            self.code_gen_error = str(e)
+        self.verifiers = {mode: ContractVerifier(mode=mode, dynamic=dynamic) for mode in VERIFY_MODES}
+        self.dynamic = self.verifiers[verify_mode].dynamic
+        if self.dynamic is not None:
+            self.dynamic.start()
+        # 并发请求的封存由后台写入线程合并提交
+        self.seal_writer = SealWriter(SealManager(output_dir, backend=seal_backend).backend)
+        self.sealer = SealManager(output_dir, writer=self.seal_writer)
+        # 验证 (CPU) 与封存 (磁盘 I/O) 放到线程池，避免阻塞事件循环
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="odd-serve")
+        self.started = time.time()
+        self.draining = False
+        self.active = 0
+        self.stats = {"requests": 0, "errors": 0, "coalesced": 0}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.routes: Dict[Tuple[str, str], Callable[[dict], Awaitable[dict]]] = {
+            ("POST", "/contract"): self.contract,
+            ("POST", "/match"): self.match,
+            ("POST", "/generate"): self.generate,
+            ("POST", "/verify"): self.verify,
+            ("POST", "/seal"): self.seal,
+        }
+
+    async def _blocking(self, fn, *args, **kwargs):
+        # 复制当前上下文，线程池中的 span 仍挂在本请求的追踪下
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+    async def _coalesced(self, key: str, factory: Callable[[], Awaitable[dict]]) -> dict:
+        """相同键的请求在第一个完成前到达时，共享同一次执行的结果"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: 首个请求的连接断开不会取消其他等待者共享的执行
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _key(route: str, payload: dict) -> str:
+        raw = json.dumps([route, payload], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _require(body: dict, *fields: str):
+        missing = [f for f in fields if body.get(f) in (None, "")]
+        if missing:
+            raise HttpError(400, f"缺少字段: {', '.join(missing)}")
+
+    def _verifier(self, mode: Optional[str]) -> ContractVerifier:
+        mode = mode or self.verify_mode
+        if mode not in self.verifiers:
+            raise HttpError(400, f"未知的验证模式: {mode}，可选 {VERIFY_MODES}")
+        return self.verifiers[mode]
+
+    # --- 接口 ---
+
+    async def contract(self, body: dict) -> dict:
+        self._require(body, "requirement")
+        requirement = body["requirement"]
+
+        async def run():
+            contract = self.contract_gen.generate_contract(requirement)
+            if contract.get('error'):
+                raise HttpError(422, contract['message'])
+            return contract
+
+        return await self._coalesced(self._key("contract", {"requirement": requirement}), run)
+
+    async def match(self, body: dict) -> dict:
+        requirements = body.get("requirements")
+        if (not isinstance(requirements, list) or not requirements
+                or not all(isinstance(r, str) and r for r in requirements)):
+            raise HttpError(400, "requirements 必须是非空字符串组成的非空列表")
+        if len(requirements) > MAX_MATCH_REQUIREMENTS:
+            raise HttpError(413, f"单次最多匹配 {MAX_MATCH_REQUIREMENTS} 条需求")
+        top_k = body.get("top_k", 3)
+        if not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+            raise HttpError(400, f"top_k 必须是 1 ~ {MAX_TOP_K} 的整数")
+        matches = await self._blocking(self.contract_gen.match_many, requirements, top_k)
+        return {"matcher": self.contract_gen.matcher, "matches": matches}
+
+    async def generate(self, body: dict) -> dict:
+        self._require(body, "requirement")
+        requirement = body["requirement"]
+        verifier = self._verifier(body.get("verify_mode"))
+        n_candidates = body.get("n_candidates", 1)
+        if not isinstance(n_candidates, int) or not 1 <= n_candidates <= MAX_CANDIDATES:
+            raise HttpError(400, f"n_candidates 必须是 1 ~ {MAX_CANDIDATES} 的整数")
+        decompose = body.get("decompose", False)
+        if not isinstance(decompose, bool):
+            raise HttpError(400, "decompose 必须是布尔值")
+        min_score = body.get("min_score")
+        if min_score is not None and (isinstance(min_score, bool) or not isinstance(min_score, (int, float))):
+            raise HttpError(400, "min_score 必须是数值")
+        if self.code_gen is None:
+            raise HttpError(503, f"代码生成不可用: {self.code_gen_error}")
+        key = self._key("generate", {"requirement": requirement, "verify_mode": verifier.mode,
+                                     "n_candidates": n_candidates, "decompose": decompose, "min_score": min_score})
+        return await self._coalesced(key, lambda: self._generate(requirement, verifier, n_candidates, decompose,
+                                                                 min_score))
+
+    async def _generate(self, requirement: str, verifier: ContractVerifier, n_candidates: int = 1,
+                        decompose: bool = False, min_score: float = None) -> dict:
+        if not self.trace:
+            return await self._pipeline(requirement, verifier, None, n_candidates, decompose, min_score)
+        tracer = Tracer()
+        with tracer.trace("odd.run"):
+            result = await self._pipeline(requirement, verifier, tracer, n_candidates, decompose, min_score)
+        METRICS.observe_trace(tracer, artifact_type=result["contract"]["artifact_type"], model=result["model"],
+                              tokens_used=result["tokens_used"])
+        return result
+
+    async def _pipeline(self, requirement: str, verifier: ContractVerifier, tracer: Optional[Tracer],
+                        n_candidates: int = 1, decompose: bool = False, min_score: float = None) -> dict:
+        parts = None
+        with span("contract"):
+            if decompose:
+                parts = self.contract_gen.decompose(requirement, min_score)
+                contract = parts[0]['contract'] if parts else {
+                    "error": True, "message": f"无法匹配需求到已知产出物类型: {requirement}"}
+            else:
+                contract = self.contract_gen.generate_contract(requirement)
+        if contract.get('error'):
+            raise HttpError(422, contract['message'])
+        if parts and len(parts) > 1:
+            return await self._composite(requirement, parts, verifier, tracer, n_candidates)
+        hints = contract['contract'].get('verification_hints', {})
+        verification = None
+        with span("generate", candidates=n_candidates):
+            if n_candidates > 1:
+                code_result, verification = await generate_best_of_n(
+                    self.code_gen, contract, lambda code: self._blocking(verifier.verify, code, hints), n_candidates)
+            else:
+                code_result = await self.code_gen.generate_code_async(contract)
+        if code_result.get('error'):
+            raise HttpError(502, code_result['message'])
+        code = code_result['code']
+        if verification is None:
+            with span("verify", mode=verifier.mode):
+                verification = await self._blocking(verifier.verify, code, hints)
+        with span("seal"):
+            seal = await self._blocking(self.sealer.seal, requirement, contract, code, verification, tracer=tracer)
+        return {
+            "requirement": requirement,
+            "contract": contract,
+            "code": code,
+            "model": code_result.get('model'),
+            "tokens_used": code_result.get('tokens_used'),
+            "cached": bool(code_result.get('cached')),
+            "prompt": code_result.get('prompt'),
+            "resilience": code_result.get('resilience'),
+            "verification": verification,
+            "seal": seal,
+        }
+
+    async def _composite(self, requirement: str, parts: list, verifier: ContractVerifier, tracer: Optional[Tracer],
+                         n_candidates: int = 1) -> dict:
+        """需求涉及多个产出物类型：各部分并发生成，验证放到线程池，分别封存后再写组合封存"""
+        contracts = [part['contract'] for part in parts]
+        with span("generate", parts=len(parts), candidates=n_candidates):
+            generated = await generate_parts(self.code_gen, contracts,
+                                             lambda code, hints: self._blocking(verifier.verify, code, hints),
+                                             n_candidates)
+        failed = [f"{contract['artifact_type']}: {result['message']}"
+                  for contract, (result, _) in zip(contracts, generated) if result is not None and result.get('error')]
+        if failed:
+            raise HttpError(502, f"组成部分代码生成失败 ({'; '.join(failed)})")
+        records = [{"match": part, "contract": part['contract'], "code": result['code'], "verification": verification}
+                   for part, (result, verification) in zip(parts, generated)]
+        with span("seal", parts=len(parts)):
+            contract, verification, seal = await self._blocking(seal_composite, self.sealer, requirement, records,
+                                                                 tracer=tracer)
+        return {
+            "requirement": requirement,
+            "contract": contract,
+            "model": next((result.get('model') for result, _ in generated if result.get('model')), None),
+            "tokens_used": sum(result.get('tokens_used') or 0 for result, _ in generated),
+            "verification": verification,
+            "seal": seal,
+            "parts": [{
+                "artifact_type": record['contract']['artifact_type'],
+                "score": record['match']['score'],
+                "contract": record['contract'],
+                "code": record['code'],
+                "cached": bool(result.get('cached')),
+                "prompt": result.get('prompt'),
+                "resilience": result.get('resilience'),
+                "verification": record['verification'],
+                "seal": record['seal'],
+            } for record, (result, _) in zip(records, generated)],
+        }
+
+    async def verify(self, body: dict) -> dict:
+        self._require(body, "code")
+        verifier = self._verifier(body.get("mode"))
+        hints = body.get("verification_hints")
+        if hints is None:
+            self._require(body, "artifact_type")
+            artifact = self.contract_gen.standards['artifacts'].get(body["artifact_type"])
+            if artifact is None:
+                raise HttpError(422, f"未知的产出物类型: {body['artifact_type']}")
+            hints = artifact.get('verification_hints', {})
+        key = self._key("verify", {"code": body["code"], "hints": hints, "mode": verifier.mode})
+        return await self._coalesced(key, lambda: self._blocking(verifier.verify, body["code"], hints))
+
+    async def seal(self, body: dict) -> dict:
+        # 每次封存都是一条独立记录，不合并
+        self._require(body, "requirement", "contract", "code", "verification")
+        return await self._blocking(self.sealer.seal, body["requirement"], body["contract"], body["code"],
+                                    body["verification"])
+
+    def health(self) -> Tuple[int, dict]:
+        payload = {
+            "status": "draining" if self.draining else "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            "in_flight": self.active,
+            "coalescing": len(self._inflight),
+            **self.stats,
+            "verify_mode": self.verify_mode,
+            "seal_backend": self.sealer.backend.name,
+            "seal_batches": self.seal_writer.stats["batches"],
+            "generate_available": self.code_gen is not None,
+            "llm": self.code_gen.health.stats() if self.code_gen is not None else None,
+            "dynamic": ({"workers": self.dynamic.workers, **self.dynamic.stats}
+                        if self.dynamic is not None else None),
+            "artifact_types": len(self.contract_gen.standards.get('artifacts', {})),
+            "matcher": self.contract_gen.matcher,
+        }
+        return (503 if self.draining else 200), payload
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, object]:
+        """返回 (状态码, JSON 对象或 Prometheus 文本)"""
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        if method == "GET" and path == "/health":
+            return self.health()
+        if method == "GET" and path == "/metrics":
+            return 200, METRICS.to_prometheus()
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                raise HttpError(405, f"{path} 只支持 POST")
+            raise HttpError(404, f"未知接口: {path}")
+        if self.draining:
+            raise HttpError(503, "服务正在排空，不再接收新请求")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "请求体不是合法的 JSON")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "请求体必须是 JSON 对象")
+        self.active += 1
+        self.stats["requests"] += 1
+        try:
+            return 200, await handler(payload)
+        finally:
+            self.active -= 1
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.seal_writer.close()
+        if self.dynamic is not None:
+            self.dynamic.close()
+
+
+class OddServer:
+    """最小的 HTTP/1.1 服务端 (支持 keep-alive 与 Content-Length 请求体)"""
+
+    def __init__(self, service: OddService, host: str = "127.0.0.1", port: int = 8080):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+        self._stopped = None
+
+    async def start(self):
+        self._stopped = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve(self, drain_timeout: float = 30.0):
+        """运行直到收到 SIGTERM/SIGINT (或调用 stop())，然后排空"""
+        if self._server is None:
+            await self.start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError, AttributeError):
+                # Windows 不支持 add_signal_handler，依靠 KeyboardInterrupt 退出
+                pass
+        await self._stopped.wait()
+        await self.drain(drain_timeout)
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def drain(self, timeout: float):
+        """停止接收新连接，等待进行中的请求完成 (最多 timeout 秒)，再关闭剩余的 keep-alive 连接"""
+        self.service.draining = True
+        self._server.close()
+        deadline = time.monotonic() + timeout
+        while self.service.active and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in list(self._connections):
+            task.cancel()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        await asyncio.get_running_loop().run_in_executor(None, self.service.close)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 413, {"error": True, "message": "请求头过大"}, keep_alive=False)
+                    return
+                keep_alive = await self._handle_request(head, reader, writer)
+                if not keep_alive:
+                    return
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _handle_request(self, head: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        try:
+            request_line, *header_lines = head.decode('latin-1').rstrip("\r\n").split("\r\n")
+            method, path, version = request_line.split(" ", 2)
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            await self._respond(writer, 400, {"error": True, "message": "无法解析请求"}, keep_alive=False)
+            return False
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        body_read = False
+        try:
+            if "transfer-encoding" in headers:
+                raise HttpError(400, "不支持分块请求体，请使用 Content-Length")
+            length = int(headers.get("content-length") or 0)
+            if length < 0:
+                raise ValueError(length)
+            if length > MAX_BODY_BYTES:
+                raise HttpError(413, f"请求体超过 {MAX_BODY_BYTES} 字节")
+            body = await reader.readexactly(length) if length else b""
+            body_read = True
+            status, payload = await self.service.dispatch(method.upper(), path, body)
+        except HttpError as e:
+            status, payload = e.status, {"error": True, "message": e.message}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return False
+        except ValueError:
+            status, payload = 400, {"error": True, "message": "Content-Length 无效"}
+        except Exception as e:
+            status, payload = 500, {"error": True, "message": f"{type(e).__name__}: {e}"}
+        if status >= 400:
+            self.service.stats["errors"] += 1
+        # 请求体未读取就拒绝时，连接中剩余的字节会被当作下一个请求解析：必须关闭连接
+        keep_alive = keep_alive and body_read and not self.service.draining
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        try:
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, drain_timeout: float = 30.0, on_ready=None,
+                **service_kwargs):
+    """构造预热的服务并运行到收到终止信号"""
+    service = OddService(**service_kwargs)
+    server = OddServer(service, host, port)
+    await server.start()
+    if on_ready:
+        on_ready(server)
+    await server.serve(drain_timeout)
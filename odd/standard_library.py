@@ -0,0 +1,333 @@
+"""
+标准库加载器 (Standard Library Loader)
+将 standard_library.yaml 编译为二进制快照，并在进程内缓存，按源文件 mtime/哈希失效
+
+除单文件布局外还支持分片布局 (shard_library 由单文件拆分得到)：
+  <dir>/index.yaml            layout: sharded，每个产出物只含 name/description/keywords 与分片文件及其 SHA-256
+  <dir>/artifacts/<id>.yaml   单个产出物的完整定义
+加载 (及快照) 只涉及索引；产出物主体在首次使用时读取并校验，缓存在有界 LRU 中。
+"""
+
+import os
+import re
+import sys
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .contract_template import ContractTemplate
+from .telemetry import span
+
+# 快照格式版本：StandardLibrary 的字段变化时递增，使旧快照失效
+SNAPSHOT_VERSION = 3
+
+# 分片布局的索引文件名与分片目录
+INDEX_FILE = "index.yaml"
+SHARD_DIR = "artifacts"
+
+# 分片 LRU 默认容量 (产出物数)，可由 ODD_SHARD_CACHE_SIZE 覆盖
+DEFAULT_SHARD_CACHE_SIZE = 128
+
+
+def _parse_yaml(text: str):
+    """仅在快照失效时才需要解析 YAML，因此 yaml 在此按需导入；有 libyaml 时使用 C 实现的解析器"""
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(text, Loader=loader)
+
+
+def _summary(config: dict) -> dict:
+    """匹配需求所需的字段 (也是分片索引中每个产出物保存的内容)"""
+    return {"name": config.get('name'), "description": config.get('description', ''),
+            "keywords": list(config.get('keywords', []) or [])}
+
+
+def _keyword_table(summaries: Dict[str, dict]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    # ((artifact_id, (小写关键词, ...)), ...)，匹配时无需再对关键词调用 lower()
+    return tuple((artifact_id, tuple(str(kw).lower() for kw in summary['keywords']))
+                 for artifact_id, summary in summaries.items())
+
+
+class StandardLibrary:
+    """已解析的产出物标准库及其预计算的关键词表与冻结的契约模板"""
+
+    def __init__(self, standards: dict, source_sha256: str, source_mtime_ns: int, source_size: int):
+        self.standards = standards
+        self.source_sha256 = source_sha256
+        self.source_mtime_ns = source_mtime_ns
+        self.source_size = source_size
+        self.snapshot_version = SNAPSHOT_VERSION
+        # {artifact_id: {name, description, keywords}}，关键词表与 n-gram 索引只依赖这些字段
+        self.summaries = {artifact_id: _summary(config)
+                          for artifact_id, config in (standards.get('artifacts') or {}).items()}
+        self.keyword_table = _keyword_table(self.summaries)
+        # {artifact_id: ContractTemplate}，契约主体及其规范化 JSON/哈希只计算一次
+        self.templates = {artifact_id: ContractTemplate(artifact_id, config)
+                          for artifact_id, config in (standards.get('artifacts') or {}).items()}
+
+    @property
+    def artifacts(self) -> Mapping:
+        return self.standards.get('artifacts') or {}
+
+    def matches_stat(self, st: os.stat_result) -> bool:
+        return st.st_mtime_ns == self.source_mtime_ns and st.st_size == self.source_size
+
+    def locate(self, source_path: Path):
+        """加载 (含从快照恢复) 后记录源文件位置；单文件布局无需处理"""
+
+
+def _shard_cache_size() -> int:
+    return max(1, int(os.getenv("ODD_SHARD_CACHE_SIZE", DEFAULT_SHARD_CACHE_SIZE)))
+
+
+class ShardedArtifacts(Mapping):
+    """分片布局的产出物表：键与长度来自索引，取值时才读取分片文件
+
+    读取的分片先按索引中的 SHA-256 校验，再解析 YAML 并构建契约模板，(定义, 模板) 一起放入有界 LRU。
+    淘汰后再次访问会重新读取分片，得到新的模板对象；已生成的契约仍引用原模板，哈希不受影响。
+    """
+
+    def __init__(self, entries: Dict[str, dict], cache_size: int = None):
+        self.entries = entries
+        self.root: Optional[Path] = None
+        self.cache_size = cache_size or _shard_cache_size()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"loads": 0, "hits": 0, "evictions": 0}
+
+    def __getstate__(self):
+        # 快照只保存索引；缓存、锁与位置在加载后重建
+        return {"entries": self.entries}
+
+    def __setstate__(self, state):
+        self.__init__(state["entries"])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, artifact_id):
+        return artifact_id in self.entries
+
+    def __getitem__(self, artifact_id: str) -> dict:
+        return self._load(artifact_id)[0]
+
+    def template(self, artifact_id: str) -> ContractTemplate:
+        return self._load(artifact_id)[1]
+
+    def _load(self, artifact_id: str) -> tuple:
+        with self._lock:
+            cached = self._cache.get(artifact_id)
+            if cached is not None:
+                self._cache.move_to_end(artifact_id)
+                self.stats["hits"] += 1
+                return cached
+        entry = self.entries[artifact_id]
+        if self.root is None:
+            raise RuntimeError("分片标准库尚未定位到索引文件所在目录")
+        path = self.root / entry['file']
+        with span("standards.load_shard", artifact=artifact_id):
+            with open(path, 'rb') as f:
+                raw = f.read()
+            if hashlib.sha256(raw).hexdigest() != entry.get('sha256'):
+                raise ValueError(f"标准库分片校验和不一致: {path} (分片在拆分后被修改，请重新运行 shard-library)")
+            config = _parse_yaml(raw.decode('utf-8')) or {}
+            loaded = (config, ContractTemplate(artifact_id, config))
+        with self._lock:
+            # 并发首次访问时可能重复读取，以先放入缓存的为准，保证同一时刻只有一个模板对象
+            cached = self._cache.setdefault(artifact_id, loaded)
+            self._cache.move_to_end(artifact_id)
+            if cached is loaded:
+                self.stats["loads"] += 1
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+            return cached
+
+
+class ShardedTemplates(Mapping):
+    """{artifact_id: ContractTemplate} 的惰性视图，与单文件布局的 templates 用法一致"""
+
+    def __init__(self, artifacts: ShardedArtifacts):
+        self._artifacts = artifacts
+
+    def __len__(self):
+        return len(self._artifacts)
+
+    def __iter__(self):
+        return iter(self._artifacts)
+
+    def __contains__(self, artifact_id):
+        return artifact_id in self._artifacts
+
+    def __getitem__(self, artifact_id: str) -> ContractTemplate:
+        return self._artifacts.template(artifact_id)
+
+
+class ShardedStandardLibrary(StandardLibrary):
+    """分片布局的标准库：只加载索引，产出物主体见 ShardedArtifacts"""
+
+    def __init__(self, index: dict, source_sha256: str, source_mtime_ns: int, source_size: int):
+        self.source_sha256 = source_sha256
+        self.source_mtime_ns = source_mtime_ns
+        self.source_size = source_size
+        self.snapshot_version = SNAPSHOT_VERSION
+        entries = index.get('artifacts') or {}
+        self.summaries = {artifact_id: _summary(entry) for artifact_id, entry in entries.items()}
+        self.keyword_table = _keyword_table(self.summaries)
+        shards = ShardedArtifacts({artifact_id: {"file": entry['file'], "sha256": entry['sha256']}
+                                   for artifact_id, entry in entries.items()})
+        self.standards = {**{key: value for key, value in index.items() if key != 'artifacts'}, "artifacts": shards}
+        self.templates = ShardedTemplates(shards)
+
+    def locate(self, source_path: Path):
+        self.artifacts.root = source_path.parent
+
+
+def snapshot_path(source_path: Path) -> Path:
+    """快照文件位置：与源文件同目录的 __pycache__ 下，按 Python 版本区分"""
+    tag = sys.implementation.cache_tag or "py"
+    return source_path.parent / "__pycache__" / f"{source_path.name}.{tag}.snapshot"
+
+
+def _read_snapshot(path: Path) -> Optional[StandardLibrary]:
+    try:
+        with open(path, 'rb') as f:
+            library = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(library, StandardLibrary) or getattr(library, 'snapshot_version', None) != SNAPSHOT_VERSION:
+        return None
+    return library
+
+
+def _write_snapshot(path: Path, library: StandardLibrary):
+    """原子写入快照；目录只读等情况下静默跳过，下次仍可从 YAML 加载"""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            pickle.dump(library, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _compile(source_path: Path, st: os.stat_result, use_snapshot: bool) -> StandardLibrary:
+    snap_path = snapshot_path(source_path)
+    with span("standards.read_snapshot"):
+        snapshot = _read_snapshot(snap_path) if use_snapshot else None
+    if snapshot is not None and snapshot.matches_stat(st):
+        return snapshot
+
+    with open(source_path, 'rb') as f:
+        raw = f.read()
+    sha256 = hashlib.sha256(raw).hexdigest()
+    if snapshot is not None and snapshot.source_sha256 == sha256:
+        # 内容未变，仅 mtime 变化 (如 git checkout)：沿用快照并刷新 stat
+        snapshot.source_mtime_ns, snapshot.source_size = st.st_mtime_ns, st.st_size
+        library = snapshot
+    else:
+        with span("standards.parse_yaml", bytes=len(raw)):
+            standards = _parse_yaml(raw.decode('utf-8')) or {}
+        layout = ShardedStandardLibrary if standards.get('layout') == 'sharded' else StandardLibrary
+        library = layout(standards, sha256, st.st_mtime_ns, st.st_size)
+    if use_snapshot:
+        with span("standards.write_snapshot"):
+            _write_snapshot(snap_path, library)
+    return library
+
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+
+def load_standard_library(source_path, use_snapshot: bool = True) -> StandardLibrary:
+    """加载标准库：进程内缓存 → 二进制快照 → YAML 解析，逐级回退
+
+    进程内缓存命中时只需一次 os.stat；源文件 mtime/大小变化时校验 SHA-256 决定是否重新解析。
+    source_path 为目录时加载其中的分片索引 (index.yaml)。
+    返回的实例在进程内共享，调用方不应修改其中的数据。
+    """
+    source_path = Path(source_path)
+    if source_path.is_dir():
+        source_path = source_path / INDEX_FILE
+    if not source_path.exists():
+        raise FileNotFoundError(f"标准库文件不存在: {source_path}")
+    key = str(source_path.resolve())
+    st = source_path.stat()
+    with _libraries_lock:
+        library = _libraries.get(key)
+        if library is not None and library.matches_stat(st):
+            return library
+        library = _compile(source_path, st, use_snapshot)
+        library.locate(source_path)
+        _libraries[key] = library
+        return library
+
+
+def clear_cache():
+    """清空进程内缓存 (不删除磁盘快照)"""
+    with _libraries_lock:
+        _libraries.clear()
+
+
+def _shard_filename(artifact_id: str, used: set) -> str:
+    """分片文件名：非法字符替换为下划线，(忽略大小写) 重名时追加 id 的哈希前缀"""
+    name = re.sub(r'[^\w.-]', '_', artifact_id).strip('.') or "artifact"
+    if name.lower() in used:
+        name = f"{name}-{hashlib.sha256(artifact_id.encode('utf-8')).hexdigest()[:8]}"
+    used.add(name.lower())
+    return f"{name}.yaml"
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def shard_library(source_path, target_dir) -> dict:
+    """把单文件标准库拆分为分片布局：target_dir/index.yaml + target_dir/artifacts/<id>.yaml
+
+    先写分片，最后原子替换索引，拆分中断不会留下指向缺失分片的索引；上次拆分遗留、已不在索引中的分片会被删除。
+    """
+    import yaml
+    dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    source_path = Path(source_path)
+    with open(source_path, 'r', encoding='utf-8') as f:
+        standards = _parse_yaml(f.read()) or {}
+    if standards.get('layout') == 'sharded':
+        raise ValueError(f"{source_path} 已经是分片索引")
+
+    target = Path(target_dir)
+    shard_dir = target / SHARD_DIR
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    used, entries, shard_bytes = set(), {}, 0
+    for artifact_id, config in (standards.get('artifacts') or {}).items():
+        filename = _shard_filename(str(artifact_id), used)
+        raw = yaml.dump(config, Dumper=dumper, allow_unicode=True, sort_keys=False).encode('utf-8')
+        _write_atomic(shard_dir / filename, raw)
+        shard_bytes += len(raw)
+        entries[artifact_id] = {**_summary(config), "file": f"{SHARD_DIR}/{filename}",
+                                "sha256": hashlib.sha256(raw).hexdigest()}
+
+    index = {key: value for key, value in standards.items() if key != 'artifacts'}
+    index.update({"layout": "sharded", "artifacts": entries})
+    raw_index = yaml.dump(index, Dumper=dumper, allow_unicode=True, sort_keys=False).encode('utf-8')
+    _write_atomic(target / INDEX_FILE, raw_index)
+
+    removed = 0
+    for path in shard_dir.glob("*.yaml"):
+        if path.name.lower().removesuffix(".yaml") not in used:
+            path.unlink()
+            removed += 1
+    return {"artifacts": len(entries), "index": str(target / INDEX_FILE), "index_bytes": len(raw_index),
+            "shard_bytes": shard_bytes, "removed_stale": removed}
@@ -0,0 +1,371 @@
+"""
+追踪与指标 (Telemetry)
+为 ODD 流程的各步骤及子操作记录耗时 span，汇总为按 artifact_type/模型区分的直方图，
+可导出为 Prometheus 文本格式或附加到封存记录的 JSON。
+
+未启用追踪时，span() 只做一次 ContextVar 读取并返回共享的空 span，开销可忽略。
+"""
+
+import io
+import os
+import time
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PROFILERS = ("cprofile", "tracemalloc")
+
+# 当前 span；没有活动的追踪时为 None
+_current: ContextVar[Optional["Span"]] = ContextVar("odd_current_span", default=None)
+
+
+class _NoopSpan:
+    """未启用追踪时共享的空 span"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一次计时操作；进入时挂到当前 span 之下并成为新的当前 span"""
+
+    __slots__ = ("tracer", "name", "attrs", "children", "start", "duration", "profile", "_token", "_profiler")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict, profile: bool = False):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.children: List[Span] = []
+        self.start = None
+        self.duration = None
+        self.profile = profile
+        self._token = None
+        self._profiler = None
+
+    def __enter__(self):
+        parent = _current.get()
+        if parent is not None:
+            parent.children.append(self)
+        self._token = _current.set(self)
+        if self.profile and self.tracer.profile:
+            self._profiler = _start_profiler(self.tracer.profile, self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if self._profiler is not None:
+            self._profiler.stop(self)
+            self._profiler = None
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _current.reset(self._token)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self, origin: float) -> dict:
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            # 尚未结束的 span (如封存时仍在进行的 seal) 没有 duration
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+def span(name: str, profile: bool = False, **attrs):
+    """在当前追踪中开启子 span；没有活动追踪时返回共享的空 span
+
+    profile=True 的 span 在追踪器启用了 cProfile/tracemalloc 时采集剖析数据 (用于四个步骤级 span)。
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.tracer, name, attrs, profile)
+
+
+def record_span(name: str, start: float, end: float, **attrs):
+    """把一段已结束的区间 (perf_counter 时间) 作为子 span 记录，如首 token 延迟"""
+    parent = _current.get()
+    if parent is None:
+        return
+    child = Span(parent.tracer, name, attrs)
+    child.start, child.duration = start, end - start
+    parent.children.append(child)
+
+
+def current_tracer() -> Optional["Tracer"]:
+    parent = _current.get()
+    return parent.tracer if parent is not None else None
+
+
+class Tracer:
+    """一次流程运行的追踪；profile 为 "cprofile" 或 "tracemalloc" 时对步骤级 span 做剖析"""
+
+    def __init__(self, profile: str = None):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"未知的剖析器: {profile}，可选 {PROFILERS}")
+        self.profile = profile
+        self.trace_id = os.urandom(16).hex()
+        self.root: Optional[Span] = None
+
+    def trace(self, name: str = "odd.run", **attrs) -> Span:
+        """根 span：with tracer.trace(): 内部的 span() 调用都会记录到本追踪"""
+        self.root = Span(self, name, attrs)
+        return self.root
+
+    def spans(self) -> Iterator[Span]:
+        return self.root.walk() if self.root is not None else iter(())
+
+    def find(self, name: str) -> List[Span]:
+        return [s for s in self.spans() if s.name == name]
+
+    def to_dict(self) -> dict:
+        if self.root is None:
+            return {"trace_id": self.trace_id, "spans": []}
+        return {"trace_id": self.trace_id, "profile": self.profile, "spans": [self.root.to_dict(self.root.start)]}
+
+
+class _CProfileCapture:
+    TOP = 15
+
+    def __init__(self):
+        import cProfile
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self, owner: Span):
+        import pstats
+        self.profiler.disable()
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        stats.sort_stats("cumulative")
+        top = []
+        for func in stats.fcn_list[:self.TOP]:
+            calls, _primitive, tottime, cumtime, _callers = stats.stats[func]
+            filename, line, name = func
+            top.append({"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls,
+                        "tottime_ms": round(tottime * 1000, 3), "cumtime_ms": round(cumtime * 1000, 3)})
+        owner.attrs["profile"] = {"kind": "cprofile", "top": top}
+
+
+# tracemalloc 的开关与峰值是进程级状态：并发的 span (batch -w N、serve、并发候选) 共用一次 start/stop，
+# 由第一个开始的 span 启动、最后一个结束的 span 停止；只有全程独占的 span 才报告峰值
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_active = 0
+_tracemalloc_owned = False
+_tracemalloc_starts = 0
+
+
+class _TracemallocCapture:
+    TOP = 10
+
+    def __init__(self):
+        global _tracemalloc_active, _tracemalloc_owned, _tracemalloc_starts
+        import tracemalloc
+        self.tracemalloc = tracemalloc
+        with _tracemalloc_lock:
+            self.shared = _tracemalloc_active > 0
+            if not self.shared:
+                _tracemalloc_owned = not tracemalloc.is_tracing()
+                if _tracemalloc_owned:
+                    tracemalloc.start()
+                tracemalloc.reset_peak()
+            _tracemalloc_active += 1
+            _tracemalloc_starts += 1
+            self.generation = _tracemalloc_starts
+            self.before = tracemalloc.take_snapshot()
+            self.base_current, _ = tracemalloc.get_traced_memory()
+
+    def stop(self, owner: Span):
+        global _tracemalloc_active
+        tm = self.tracemalloc
+        with _tracemalloc_lock:
+            current, peak = tm.get_traced_memory()
+            after = tm.take_snapshot()
+            # 期间有其他 span 开始过：分配量与峰值包含其他 span 的分配
+            shared = self.shared or _tracemalloc_starts != self.generation
+            _tracemalloc_active -= 1
+            if _tracemalloc_active == 0 and _tracemalloc_owned:
+                tm.stop()
+        top = [{"location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                "size_diff_kb": round(stat.size_diff / 1024, 2), "count_diff": stat.count_diff}
+               for stat in after.compare_to(self.before, "lineno")[:self.TOP]]
+        owner.attrs["profile"] = {"kind": "tracemalloc", "allocated_kb": round((current - self.base_current) / 1024, 2),
+                                  "peak_kb": None if shared else round((peak - self.base_current) / 1024, 2),
+                                  "top": top}
+        if shared:
+            owner.attrs["profile_error"] = "与其他 span 的 tracemalloc 剖析重叠，分配量包含其他 span 的分配，不报告峰值"
+
+
+def _start_profiler(kind: str, owner: Span):
+    try:
+        return _CProfileCapture() if kind == "cprofile" else _TracemallocCapture()
+    except ValueError as e:
+        # 同一进程中另一个剖析器已在运行 (如批量并发时)，跳过本 span 的剖析
+        owner.attrs["profile_error"] = str(e)
+        return None
+
+
+# --- 指标 ---
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+METRIC_HELP = {
+    "odd_stage_duration_seconds": "ODD 流程各步骤及子操作耗时",
+    "odd_llm_tokens": "单次生成消耗的 token 数",
+    "odd_runs_total": "ODD 流程运行次数",
+}
+
+
+class Histogram:
+    """累积直方图 (Prometheus 语义：每个桶统计 <= le 的观测数)"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self) -> dict:
+        return {"buckets": dict(zip(map(_format_number, self.buckets), self.counts)),
+                "sum": self.sum, "count": self.count}
+
+
+class MetricsRegistry:
+    """进程内指标：直方图与计数器按 (指标名, 标签) 区分，可在批量/服务运行中跨请求累计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._counters: Dict[tuple, float] = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe_trace(self, tracer: Tracer, artifact_type: str, model: str, tokens_used: int = None,
+                      error: bool = False):
+        """把一次运行的全部 span 耗时与 token 数记入直方图"""
+        labels = {"artifact_type": artifact_type or "unknown", "model": model or "unknown"}
+        for s in tracer.spans():
+            if s.duration is not None and s is not tracer.root:
+                self.observe("odd_stage_duration_seconds", s.duration, stage=s.name, **labels)
+        if tracer.root is not None and tracer.root.duration is not None:
+            self.observe("odd_stage_duration_seconds", tracer.root.duration, stage="total", **labels)
+        if tokens_used:
+            self.observe("odd_llm_tokens", tokens_used, buckets=TOKEN_BUCKETS, **labels)
+        self.inc("odd_runs_total", status="error" if error else "ok", **labels)
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式 (可供 node_exporter textfile collector 读取)"""
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            counters = sorted(self._counters.items(), key=lambda item: item[0])
+            lines = []
+            seen = set()
+            for (name, labels), hist in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} histogram")
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f"{name}_bucket{_labels(labels, le=_format_number(bound))} {count}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {hist.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_format_number(hist.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+            for (name, labels), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": [{"name": name, "labels": dict(labels), **hist.to_dict()}
+                               for (name, labels), hist in sorted(self._histograms.items(), key=lambda i: i[0])],
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in sorted(self._counters.items(), key=lambda i: i[0])],
+            }
+
+    def write_prometheus(self, path):
+        """原子写入 (先写临时文件再替换)，采集端不会读到半个文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _format_number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: tuple, **extra) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+# 进程内默认指标注册表
+METRICS = MetricsRegistry()
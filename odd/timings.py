@@ -0,0 +1,51 @@
+"""
+耗时记录 (Timings)
+记录 CLI 的模块导入与各阶段耗时，用于 --timings 输出；未启用时开销可忽略
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, Tuple
+
+
+class Timings:
+    """按名称累计耗时；同名阶段多次出现时累加并计数"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._totals = {}
+        self._order: List[str] = []
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            if name not in self._totals:
+                self._totals[name] = [0.0, 0]
+                self._order.append(name)
+            self._totals[name][0] += seconds
+            self._totals[name][1] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def items(self) -> List[Tuple[str, float, int]]:
+        with self._lock:
+            return [(name, *self._totals[name]) for name in self._order]
+
+    def report(self) -> str:
+        """纯文本报告 (毫秒)，写到 stderr 以免混入命令输出"""
+        lines = [f"{'stage':<36} {'ms':>10} {'count':>6}"]
+        for name, seconds, count in self.items():
+            lines.append(f"{name:<36} {seconds * 1000:>10.2f} {count:>6}")
+        lines.append(f"{'total (since main.py load)':<36} {(time.perf_counter() - self.started) * 1000:>10.2f}")
+        return "\n".join(lines)
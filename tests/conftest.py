@@ -0,0 +1,23 @@
+"""测试共用的夹具：本地假 LLM 服务 (benchmarks/fake_llm.py)，经 OPENAI_BASE_URL 接入"""
+
+import pytest
+
+from benchmarks.fake_llm import FakeLLMServer
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """启动假 LLM 服务并设置 OPENAI_* 环境变量；返回的函数按 FakeLLMConfig 参数启动服务"""
+    servers = []
+
+    def start(**config) -> FakeLLMServer:
+        server = FakeLLMServer(**config).start()
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_MODEL", "fake-model")
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
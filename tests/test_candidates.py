@@ -0,0 +1,91 @@
+"""Best-of-N 候选：首个通过 critical 规则的候选取消其余候选、按严重度选优、全部生成失败"""
+
+import asyncio
+
+from odd.candidates import generate_best_of_n
+
+TEMPERATURES = [0.1, 0.2, 0.3]
+CONTRACT = {"contract": {"verification_hints": {}}}
+
+
+class StubCodeGen:
+    """按给定顺序依次完成的候选：order 中的候选等前一个完成后才返回，不在 order 中的候选一直挂起直到被取消
+
+    outcomes[i] 为候选 i 的代码，None 表示生成失败。
+    """
+
+    temperature = TEMPERATURES[0]
+
+    def __init__(self, outcomes: dict, order: list):
+        self.outcomes = outcomes
+        self.order = order
+        self.done = {i: asyncio.Event() for i in outcomes}
+        self.cancelled = set()
+
+    async def generate_code_async(self, contract: dict, temperature: float) -> dict:
+        index = TEMPERATURES.index(temperature)
+        try:
+            if index not in self.order:
+                await asyncio.Event().wait()
+            position = self.order.index(index)
+            if position:
+                await self.done[self.order[position - 1]].wait()
+        except asyncio.CancelledError:
+            self.cancelled.add(index)
+            raise
+        self.done[index].set()
+        if self.outcomes[index] is None:
+            return {"error": True, "message": f"候选 {index} 生成失败"}
+        return {"code": self.outcomes[index], "tokens_used": 10 + index}
+
+
+def _verification(failed: str) -> dict:
+    """代码即未通过规则的严重度列表 (逗号分隔)"""
+    severities = [s for s in failed.split(",") if s]
+    checks = [{"rule": f"{s}-{i}", "severity": s, "passed": False} for i, s in enumerate(severities)]
+    checks.append({"rule": "ok", "severity": "critical", "passed": True})
+    return {"passed": not severities, "critical_failed": "critical" in severities, "checks": checks}
+
+
+async def _verify(code: str) -> dict:
+    return _verification(code)
+
+
+def _run(code_gen: StubCodeGen):
+    return asyncio.run(asyncio.wait_for(
+        generate_best_of_n(code_gen, CONTRACT, _verify, len(TEMPERATURES), TEMPERATURES), 5))
+
+
+def test_first_candidate_without_critical_failure_cancels_the_rest():
+    code_gen = StubCodeGen({0: "critical", 1: "medium", 2: ""}, order=[1])
+    result, verification = _run(code_gen)
+    assert code_gen.cancelled == {0, 2}
+    assert result["candidate"] == 1 and result["temperature"] == 0.2 and result["tokens_used"] == 11
+    assert [c["status"] for c in verification["candidates"]] == ["cancelled", "verified", "cancelled"]
+    assert verification["candidates"][1]["selected"] and verification["candidates"][1]["score"] == 3
+
+
+def test_lowest_severity_score_wins_and_ties_go_to_the_first_finished():
+    # 全部候选都未通过 critical 规则，不会提前结束：得分 110、100、100，候选 2 先于候选 1 完成
+    code_gen = StubCodeGen({0: "critical,high", 1: "critical", 2: "critical"}, order=[2, 0, 1])
+    result, verification = _run(code_gen)
+    assert not code_gen.cancelled
+    assert result["candidate"] == 2 and result["code"] == "critical"
+    assert result["tokens_used"] == 10 + 11 + 12
+    assert [c["score"] for c in verification["candidates"]] == [110, 100, 100]
+    assert [c.get("selected", False) for c in verification["candidates"]] == [False, False, True]
+    assert verification["critical_failed"]
+
+
+def test_failed_generations_are_skipped_when_ranking():
+    code_gen = StubCodeGen({0: None, 1: "critical,low", 2: None}, order=[0, 2, 1])
+    result, verification = _run(code_gen)
+    assert result["candidate"] == 1 and result["tokens_used"] == 11
+    assert [c["status"] for c in verification["candidates"]] == ["error", "verified", "error"]
+
+
+def test_all_candidates_failed_returns_the_first_error():
+    code_gen = StubCodeGen({0: None, 1: None, 2: None}, order=[2, 1, 0])
+    result, verification = _run(code_gen)
+    assert verification is None
+    assert result == {"error": True, "message": "候选 0 生成失败"}
@@ -0,0 +1,99 @@
+"""组合产出物：各部分并发生成、任一部分失败即取消其余部分、组合封存列出各部分的 seal_id 与完整性哈希"""
+
+import asyncio
+
+from odd.composite import COMPOSITE_TYPE, generate_parts, seal_composite
+from odd.contract_generator import ContractGenerator
+from odd.contract_verifier import ContractVerifier
+from odd.seal_auditor import SealAuditor
+from odd.seal_manager import SealManager
+from odd.seal_store import JsonSealBackend
+
+REQUIREMENT = "创建用户登录API和用户增删改查接口"
+
+CODE = "import bcrypt\n\ndef handler(request):\n    return bcrypt.checkpw(request.password, stored)\n"
+
+
+class StubCodeGen:
+    """全部部分都已开始生成后才返回；failing 中的产出物类型立即返回错误，其余部分随后挂起直到被取消"""
+
+    def __init__(self, parts: int, failing=()):
+        self.parts = parts
+        self.failing = set(failing)
+        self.started = []
+        self.cancelled = set()
+        self.all_started = asyncio.Event()
+
+    async def generate_code_async(self, contract: dict) -> dict:
+        artifact_type = contract['artifact_type']
+        self.started.append(artifact_type)
+        if len(self.started) == self.parts:
+            self.all_started.set()
+        try:
+            await self.all_started.wait()
+            if artifact_type in self.failing:
+                return {"error": True, "message": f"{artifact_type} 生成失败"}
+            if self.failing:
+                await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled.add(artifact_type)
+            raise
+        return {"code": CODE, "tokens_used": 10}
+
+
+def _contracts() -> list:
+    return [part['contract'] for part in ContractGenerator().decompose(REQUIREMENT)]
+
+
+async def _verify(code: str, hints: dict) -> dict:
+    return ContractVerifier().verify(code, hints)
+
+
+def _run(code_gen, contracts):
+    return asyncio.run(asyncio.wait_for(generate_parts(code_gen, contracts, _verify), 5))
+
+
+def test_parts_are_generated_concurrently():
+    contracts = _contracts()
+    assert [c['artifact_type'] for c in contracts] == ["auth_login", "crud_api"]
+    # 串行生成时第一个部分会一直等待第二个部分开始，wait_for 超时
+    code_gen = StubCodeGen(len(contracts))
+    results = _run(code_gen, contracts)
+    assert sorted(code_gen.started) == ["auth_login", "crud_api"]
+    assert [result['code'] for result, _ in results] == [CODE, CODE]
+    assert all(verification is not None and "checks" in verification for _, verification in results)
+
+
+def test_failing_part_cancels_the_rest():
+    contracts = _contracts() * 2
+    code_gen = StubCodeGen(len(contracts), failing={"crud_api"})
+    results = _run(code_gen, contracts)
+    assert code_gen.cancelled == {"auth_login"}
+    failed = [result for result, _ in results if result is not None]
+    assert failed and all(result['error'] and result['message'] == "crud_api 生成失败" for result in failed)
+    assert all(verification is None for _, verification in results)
+    # 被取消的 auth_login 部分为 (None, None)
+    assert results[0] == (None, None) and results[2] == (None, None)
+
+
+def test_composite_seal_lists_each_part(tmp_path):
+    backend = JsonSealBackend(tmp_path)
+    matches = ContractGenerator().decompose(REQUIREMENT)
+    parts = [{"match": match, "contract": match['contract'], "code": CODE,
+              "verification": ContractVerifier().verify(CODE, match['contract']['contract']['verification_hints'])}
+             for match in matches]
+    contract, verification, seal = seal_composite(SealManager(backend=backend), REQUIREMENT, parts)
+
+    assert contract['artifact_type'] == COMPOSITE_TYPE
+    assert [(p['artifact_type'], p['seal_id'], p['integrity']) for p in contract['parts']] == [
+        (part['contract']['artifact_type'], part['seal']['seal_id'], part['seal']['integrity']) for part in parts]
+    for listed in contract['parts']:
+        assert backend.get(listed['seal_id'])['integrity'] == listed['integrity']
+    assert [p['seal_id'] for p in verification['parts']] == [part['seal']['seal_id'] for part in parts]
+    assert verification['passed'] == all(part['verification']['passed'] for part in parts)
+
+    stored = backend.get(seal['seal_id'])
+    assert stored['artifacts']['contract']['parts'] == contract['parts']
+    assert stored['artifacts']['code'] == ""
+    report = SealAuditor(backend, workers=1).audit()
+    assert report["audited"] == 3 and report["failed"] == 0
@@ -0,0 +1,44 @@
+"""动态验证沙箱：审计钩子拒绝网络与子进程，且生成代码无法改写已安装钩子的拒绝列表"""
+
+import pytest
+
+from odd.dynamic_verifier import IMPORT_RULE, DynamicVerifier
+
+CONNECT = "import socket\nsocket.socket().connect(('127.0.0.1', 9))\n"
+SUBPROCESS = "import subprocess\nsubprocess.run(['true'])\n"
+TAMPER = "import sys\nsys.modules['odd.dynamic_verifier'].BLOCKED_EVENTS = frozenset()\n"
+
+
+@pytest.fixture(scope="module")
+def verifier():
+    verifier = DynamicVerifier(workers=1, wall_s=10).start()
+    yield verifier
+    verifier.close()
+
+
+def _import_check(result: dict) -> dict:
+    return next(check for check in result['checks'] if check['rule'] == IMPORT_RULE)
+
+
+@pytest.mark.parametrize("code, event", [(CONNECT, "socket.connect"), (SUBPROCESS, "subprocess.Popen")])
+def test_blocked_events_are_refused(verifier, code, event):
+    check = _import_check(verifier.run(code))
+    assert not check['passed']
+    assert f"沙箱禁止: {event}" in check['found']
+
+
+def test_rewriting_blocked_events_does_not_disable_the_hook(verifier):
+    # 同一任务中改写后立即尝试，以及复用同一工作进程的后续任务
+    check = _import_check(verifier.run(TAMPER + CONNECT))
+    assert not check['passed'] and "沙箱禁止: socket.connect" in check['found']
+    check = _import_check(verifier.run(SUBPROCESS))
+    assert not check['passed'] and "沙箱禁止: subprocess.Popen" in check['found']
+
+
+def test_hook_cannot_be_found_through_gc(verifier):
+    check = _import_check(verifier.run("import gc\ngc.get_objects()\n"))
+    assert not check['passed'] and "沙箱禁止: gc.get_objects" in check['found']
+
+
+def test_clean_code_passes(verifier):
+    assert all(check['passed'] for check in verifier.run("x = 1\n")['checks'])
@@ -0,0 +1,83 @@
+"""文件验证器：按块扫描 (含 mmap 与多字节字符跨块) 的结果与 ContractVerifier.verify 一致"""
+
+import hashlib
+
+import pytest
+
+from odd.contract_generator import ContractGenerator
+from odd.contract_verifier import ContractVerifier
+from odd.file_verifier import FileVerifier, scan_chunks
+
+HINTS = ContractGenerator().generate_contract("创建一个用户登录API")['contract']['verification_hints']
+
+# 中文注释让模式前后都是多字节字符，偏移按字符计
+CODE = ("# 用户登录：校验密码哈希，失败时抛出异常\n"
+        "import bcrypt  # 密码哈希\n\n"
+        "def login(username, password):\n"
+        "    \"\"\"登录并签发会话令牌\"\"\"\n"
+        "    if not bcrypt.checkpw(password, stored):  # 校验\n"
+        "        raise ValueError('密码错误')\n"
+        "    return make_token(username)  # 令牌 🔑\n"
+        "print(password)  # 日志泄露\n")
+
+CONTENTS = {
+    "utf8": CODE.encode('utf-8'),
+    # 非法字节替换为 U+FFFD，与整体解码的结果相同
+    "invalid_bytes": CODE.encode('utf-8').replace("抛出".encode('utf-8'), b"\xff\xfe", 1),
+}
+
+
+def _expected(data: bytes) -> dict:
+    return ContractVerifier().verify(data.decode('utf-8', errors='replace'), HINTS)
+
+
+def _split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("name", sorted(CONTENTS))
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64])
+def test_scan_chunks_matches_verify(name, chunk_size):
+    data = CONTENTS[name]
+    assert scan_chunks(HINTS, _split(data, chunk_size)) == _expected(data)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 5])
+def test_scan_chunks_hashes_every_chunk(chunk_size):
+    data = CONTENTS["utf8"]
+    hasher = hashlib.sha256()
+    assert scan_chunks(HINTS, _split(data, chunk_size), hasher) == _expected(data)
+    assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+@pytest.mark.parametrize("name", sorted(CONTENTS))
+@pytest.mark.parametrize("chunk_size", [3, 5, 1 << 20])
+@pytest.mark.parametrize("incremental", [False, True])
+def test_file_verifier_matches_verify(tmp_path, name, chunk_size, incremental):
+    data = CONTENTS[name]
+    path = tmp_path / "app.py"
+    path.write_bytes(data)
+    cache_path = tmp_path / "cache.sqlite" if incremental else None
+    records = []
+    FileVerifier(HINTS, workers=1, chunk_size=chunk_size, cache_path=cache_path).run([str(path)],
+                                                                                    on_result=records.append)
+    record, = records
+    expected = _expected(data)
+    assert not record.get('error') and not record['cached']
+    assert record['checks'] == expected['checks']
+    assert record['passed'] == expected['passed']
+    assert record['sha256'] == (hashlib.sha256(data).hexdigest() if incremental else None)
+
+
+def test_incremental_cache_hits_for_copied_content(tmp_path):
+    data = CONTENTS["utf8"]
+    cache_path = tmp_path / "cache.sqlite"
+    (tmp_path / "a.py").write_bytes(data)
+    FileVerifier(HINTS, workers=1, cache_path=cache_path).run([str(tmp_path / "a.py")])
+
+    # 大小与 mtime 都没有记录的新文件：内容哈希命中，不再扫描
+    (tmp_path / "b.py").write_bytes(data)
+    records = []
+    summary = FileVerifier(HINTS, workers=1, cache_path=cache_path).run([str(tmp_path)], on_result=records.append)
+    assert summary["cached"] == 2 and summary["files"] == 2
+    assert all(record['checks'] == _expected(data)['checks'] for record in records)
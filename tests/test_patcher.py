@@ -0,0 +1,39 @@
+"""补丁应用器：difflib 生成的 unified diff 应用后还原为新代码"""
+
+import difflib
+import random
+
+from odd.patcher import apply_patch
+
+
+def _diff(old: str, new: str, n: int) -> str:
+    return "".join(difflib.unified_diff(old.splitlines(keepends=True), new.splitlines(keepends=True),
+                                        "a/code.py", "b/code.py", n=n))
+
+
+def test_pure_insertion_goes_after_the_given_line():
+    original = "a\nb\nc\nd\ne\n"
+    code, _ = apply_patch(original, "@@ -5,0 +6,1 @@\n+f\n")
+    assert code == "a\nb\nc\nd\ne\nf\n"
+    code, _ = apply_patch(original, "@@ -0,0 +1,1 @@\n+z\n")
+    assert code == "z\na\nb\nc\nd\ne\n"
+
+
+def test_round_trip_difflib_without_context():
+    rng = random.Random(0)
+    for _ in range(300):
+        old = [f"line {i}" for i in range(rng.randint(1, 30))]
+        new = list(old)
+        for _ in range(rng.randint(1, 4)):
+            op = rng.choice(("insert", "delete", "replace"))
+            i = rng.randint(0, len(new))
+            if op == "insert":
+                new[i:i] = [f"new {rng.random():.6f}" for _ in range(rng.randint(1, 3))]
+            elif new and i < len(new):
+                new[i:i + 1] = [] if op == "delete" else [f"changed {rng.random():.6f}"]
+        original, target = "\n".join(old) + "\n", "\n".join(new) + "\n"
+        if original == target:
+            continue
+        for n in (0, 3):
+            code, _ = apply_patch(original, _diff(original, target, n))
+            assert code == target
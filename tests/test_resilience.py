@@ -0,0 +1,123 @@
+"""熔断器状态转换，以及被取消的半开探测请求归还探测名额"""
+
+import asyncio
+
+import pytest
+
+from odd.resilience import CircuitBreaker
+
+
+def test_breaker_opens_after_threshold_and_rejects_during_cooldown():
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 1
+    assert not breaker.allow() and breaker.rejected == 1
+    assert breaker.retry_in() > 0
+
+
+def test_half_open_admits_one_probe_then_closes_or_reopens():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    token = breaker.acquire()
+    assert token and breaker.state == CircuitBreaker.HALF_OPEN
+    # 探测期间其余请求被拒绝
+    assert breaker.acquire() is None
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 2
+
+    assert breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.acquire() == 0
+
+
+def test_released_probe_frees_the_slot_and_stale_release_is_ignored():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    first = breaker.acquire()
+    breaker.release(first)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    second = breaker.acquire()
+    assert second and second != first
+    # 已经归还过的令牌不能释放后来者的探测名额
+    breaker.release(first)
+    assert breaker.acquire() is None
+    breaker.release(second)
+    assert breaker.acquire()
+
+
+def test_disabled_breaker_always_allows():
+    breaker = CircuitBreaker(threshold=0)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.acquire() == 0 and breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_does_not_jam_the_breaker(fake_llm):
+    pytest.importorskip("openai")
+    from odd.code_generator import CodeGenerator
+    from odd.contract_generator import ContractGenerator
+    from odd.resilience import ResiliencePolicy
+
+    fake_llm(latency_ms=500)
+    generator = CodeGenerator(use_cache=False, resilience=ResiliencePolicy(
+        max_retries=0, hedge=False, breaker_threshold=1, breaker_cooldown=0))
+    breaker = generator.health.breaker
+    contract = ContractGenerator().generate_contract("创建一个用户登录API")
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(generator.generate_code_async(contract))
+        await asyncio.sleep(0.1)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 下一个请求作为新的探测被放行，成功后关闭熔断器
+    result = asyncio.run(generator.generate_code_async(contract))
+    assert not result['error'], result.get('message')
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hedge_reservation_is_settled(fake_llm, monkeypatch):
+    pytest.importorskip("openai")
+    from odd.code_generator import CodeGenerator
+    from odd.contract_generator import ContractGenerator
+    from odd.resilience import ResiliencePolicy
+
+    server = fake_llm(latency_ms=5)
+    generator = CodeGenerator(use_cache=False, resilience=ResiliencePolicy(max_retries=0, hedge=True, hedge_ratio=1.0))
+    contract = ContractGenerator().generate_contract("创建一个用户登录API")
+    for _ in range(25):
+        assert not generator.generate_code(contract)['error']
+
+    limiter = generator.rate_limiter
+    calls = {"reserved": 0, "settled": []}
+    real_try_reserve, real_settle = limiter.try_reserve, limiter.settle
+
+    def try_reserve(tokens):
+        ok = real_try_reserve(tokens)
+        calls["reserved"] += ok
+        return ok
+
+    def settle(estimated, actual):
+        calls["settled"].append(actual)
+        real_settle(estimated, actual)
+
+    monkeypatch.setattr(limiter, "try_reserve", try_reserve)
+    monkeypatch.setattr(limiter, "settle", settle)
+    # 之后的请求都远慢于观测到的 p95：每次都发出对冲，落后的请求被取消
+    server.config.slow_fraction, server.config.slow_ms = 1.0, 200
+
+    result = asyncio.run(generator.generate_code_async(contract))
+    assert not result['error'] and result['resilience']['hedges'] == 1
+    assert calls["reserved"] == 1
+    # 主请求一次 (实际用量) + 对冲请求一次
+    assert len(calls["settled"]) == 2 and all(actual is not None for actual in calls["settled"])
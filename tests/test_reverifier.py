@@ -0,0 +1,90 @@
+"""增量重新验证：规则变化后只重新封存受影响的封存，再次运行不做任何事"""
+
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from odd.contract_generator import ContractGenerator
+from odd.contract_verifier import ContractVerifier
+from odd.reverifier import Reverifier
+from odd.seal_manager import SealManager
+from odd.seal_store import JsonSealBackend, SQLiteSealBackend
+
+CODE = ("import bcrypt\n\ndef login(username, password):\n"
+        "    if not bcrypt.checkpw(password, stored):\n        raise ValueError('bad')\n"
+        "    return issue_credential(username)\n")
+
+REQUIREMENTS = ("创建一个用户登录API", "实现账号登录接口", "创建一个用户管理的CRUD接口")
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        return JsonSealBackend(tmp_path)
+    return SQLiteSealBackend(tmp_path / "seals.sqlite")
+
+
+def _seal_all(backend) -> dict:
+    generator = ContractGenerator()
+    seals = {}
+    for requirement in REQUIREMENTS:
+        contract = generator.generate_contract(requirement)
+        verification = ContractVerifier().verify(CODE, contract['contract'].get('verification_hints', {}))
+        seal = SealManager(backend=backend).seal(requirement, contract, CODE, verification)
+        seals.setdefault(contract['artifact_type'], []).append(seal['seal_id'])
+    return seals
+
+
+def _seal_ids(backend) -> set:
+    return {record['seal_id'] for record in backend.iter_records()}
+
+
+def _edited_library():
+    """auth_login 的一条规则增加一个模式，其余产出物类型不变"""
+    artifacts = copy.deepcopy(dict(ContractGenerator().library.artifacts))
+    rule = artifacts['auth_login']['verification_hints']['must_contain_any'][1]
+    rule['patterns'] = list(rule['patterns']) + ['issue_credential']
+    return SimpleNamespace(artifacts=artifacts)
+
+
+def test_edited_rule_reseals_only_affected_seals(backend):
+    seals = _seal_all(backend)
+    assert len(seals['auth_login']) == 2 and len(seals['crud_api']) == 1
+
+    unchanged = Reverifier(backend, ContractGenerator().library, workers=1)
+    try:
+        first = unchanged.run()
+    finally:
+        unchanged.close()
+    assert first["synced"]["indexed"] == 3
+    assert first["affected"] == 0 and first["reverified"] == 0
+
+    before = _seal_ids(backend)
+    reverifier = Reverifier(backend, _edited_library(), workers=1)
+    try:
+        report = reverifier.run()
+        assert report["affected"] == 2 and report["reverified"] == 2 and not report["errors"]
+        assert sorted(s['parent_seal_id'] for s in report["seals"]) == sorted(seals['auth_login'])
+        stale, = report["plan"]["artifact_types"]["auth_login"]["stale"]
+        assert stale["changes"]["modified"] == ["must_contain_any:必须生成会话令牌"]
+        crud = report["plan"]["artifact_types"]["crud_api"]
+        assert crud["up_to_date"] == 1 and crud["stale"] == []
+        # 原封存缺少会话令牌而未通过，新规则下通过
+        assert len(report["newly_passing"]) == 2 and not report["newly_failing"]
+
+        new = _seal_ids(backend) - before
+        assert new == {s['seal_id'] for s in report["seals"]}
+        for seal_id in new:
+            verification = backend.get(seal_id)['artifacts']['verification']
+            assert verification['reverification']['parent_seal_id'] in seals['auth_login']
+            token_check, = (c for c in verification['checks'] if c['rule'] == "必须生成会话令牌")
+            assert token_check['passed'] and token_check['found'] == "issue_credential"
+
+        again = reverifier.run()
+    finally:
+        reverifier.close()
+    assert again["synced"] == {"indexed": 0, "removed": 0}
+    assert again["affected"] == 0 and again["reverified"] == 0
+    assert again["index"] == {"seals": 5, "active": 3}
+    assert _seal_ids(backend) == before | new
@@ -0,0 +1,86 @@
+"""封存审计器：增量审计必须发现审计之后被篡改的 SQLite 内容块"""
+
+import os
+import zlib
+
+from odd.contract_generator import ContractGenerator
+from odd.contract_verifier import ContractVerifier
+from odd.seal_auditor import SealAuditor
+from odd.seal_manager import SealManager
+from odd.seal_store import JsonSealBackend, SQLiteSealBackend
+
+CODE = "import bcrypt\n\ndef login(username, password):\n    return bcrypt.checkpw(password, stored)\n"
+
+
+def _seal(backend, requirement="创建一个用户登录API"):
+    contract = ContractGenerator().generate_contract(requirement)
+    verification = ContractVerifier().verify(CODE, contract['contract'].get('verification_hints', {}))
+    return SealManager(backend=backend).seal(requirement, contract, CODE, verification)
+
+
+def test_incremental_audit_detects_tampered_blob(tmp_path):
+    backend = SQLiteSealBackend(tmp_path / "seals.sqlite")
+    seal = _seal(backend)
+    auditor = SealAuditor(backend, workers=1)
+    first = auditor.audit()
+    assert first["failed"] == 0 and first["audited"] == 1
+
+    # 原地改写代码内容块，seals 表的哈希列保持不变
+    code_hash = backend._connect().execute(
+        "SELECT code_hash FROM seals WHERE seal_id = ?", (seal['seal_id'],)).fetchone()[0]
+    tampered = zlib.compress(CODE.replace("bcrypt.checkpw", "password ==").encode('utf-8'))
+    backend._connect().execute("UPDATE blobs SET data = ?, size = ? WHERE hash = ?",
+                               (tampered, len(tampered), code_hash))
+
+    second = auditor.audit()
+    assert second["audited"] == 1 and second["skipped"] == 0
+    assert second["failed"] == 1
+    assert "code 哈希不一致" in second["failures"][0]["errors"]
+
+
+def test_incremental_audit_detects_same_size_json_edit(tmp_path):
+    backend = JsonSealBackend(tmp_path)
+    seal = _seal(backend)
+    auditor = SealAuditor(backend, workers=1)
+    assert auditor.audit()["failed"] == 0
+
+    # 等长改写契约并还原 mtime：大小与 mtime 都不变
+    path, = backend.seal_files()
+    st = path.stat()
+    text = path.read_text(encoding='utf-8')
+    assert '"artifact_type": "auth_login"' in text
+    path.write_text(text.replace('"artifact_type": "auth_login"', '"artifact_type": "auth_logon"', 1),
+                    encoding='utf-8')
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert path.stat().st_size == st.st_size
+
+    second = auditor.audit()
+    assert second["audited"] == 1 and second["skipped"] == 0
+    assert second["failures"][0]["seal_id"] == seal['seal_id']
+    assert "contract 哈希不一致" in second["failures"][0]["errors"]
+
+
+def test_unchanged_sqlite_seals_are_skipped(tmp_path):
+    backend = SQLiteSealBackend(tmp_path / "seals.sqlite")
+    _seal(backend)
+    auditor = SealAuditor(backend, workers=1)
+    auditor.audit()
+    again = auditor.audit()
+    assert again["skipped"] == 1 and again["audited"] == 0 and again["failed"] == 0
+
+
+def test_backends_keep_separate_audit_state(tmp_path):
+    json_backend = JsonSealBackend(tmp_path)
+    sqlite_backend = SQLiteSealBackend(tmp_path / "seals.sqlite")
+    _seal(json_backend)
+    _seal(sqlite_backend)
+    json_auditor = SealAuditor(json_backend, workers=1)
+    sqlite_auditor = SealAuditor(sqlite_backend, workers=1)
+    assert json_auditor.state_path != sqlite_auditor.state_path
+
+    json_auditor.audit()
+    sqlite_auditor.audit()
+    # 另一个后端的审计不会丢弃本后端的增量状态
+    again = json_auditor.audit()
+    assert again["skipped"] == 1 and again["audited"] == 0
+    assert again["changed_since_last"] == {"added": [], "removed": [], "modified": []}
@@ -0,0 +1,127 @@
+"""ODD 服务：路由分发、相同请求合并、排空，以及提前拒绝的请求关闭 keep-alive 连接"""
+
+import json
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from odd.server import MAX_BODY_BYTES, HttpError, OddServer, OddService  # noqa: E402
+
+LATENCY_MS = 300
+
+
+@pytest.fixture
+def service(fake_llm, tmp_path):
+    server = fake_llm(latency_ms=LATENCY_MS)
+    service = OddService(output_dir=str(tmp_path), use_cache=False, workers=2)
+    service.fake_llm = server
+    yield service
+    service.close()
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').rstrip("\r\n").split("\r\n")
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(":") for line in header_lines)}
+    body = await reader.readexactly(int(headers["content-length"]))
+    return int(status_line.split(" ")[1]), headers, json.loads(body)
+
+
+async def _post(port: int, path: str, payload: dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    try:
+        return await _read_response(reader)
+    finally:
+        writer.close()
+
+
+def test_dispatch_routes_and_errors(service):
+    async def run():
+        status, health = await service.dispatch("GET", "/health", b"")
+        assert status == 200 and health["status"] == "ok" and health["generate_available"]
+        status, contract = await service.dispatch("POST", "/contract/", "{\"requirement\": \"创建一个用户登录API\"}"
+                                                  .encode('utf-8'))
+        assert status == 200 and contract["artifact_type"] == "auth_login"
+        status, result = await service.dispatch("POST", "/verify", json.dumps(
+            {"code": "import bcrypt\n", "artifact_type": "auth_login"}).encode('utf-8'))
+        assert status == 200 and "checks" in result
+        for method, path, body, expected in (("GET", "/verify", b"", 405), ("POST", "/nope", b"{}", 404),
+                                             ("POST", "/contract", b"not json", 400),
+                                             ("POST", "/contract", b"[]", 400), ("POST", "/contract", b"{}", 400)):
+            with pytest.raises(HttpError) as error:
+                await service.dispatch(method, path, body)
+            assert error.value.status == expected
+
+    asyncio.run(run())
+
+
+def test_identical_concurrent_generates_are_coalesced(service):
+    async def run():
+        server = OddServer(service, port=0)
+        await server.start()
+        try:
+            payload = {"requirement": "创建一个用户登录API"}
+            first, second = await asyncio.gather(_post(server.port, "/generate", payload),
+                                                 _post(server.port, "/generate", payload))
+        finally:
+            await server.drain(5)
+        return first, second
+
+    (status_a, _, a), (status_b, _, b) = asyncio.run(run())
+    assert status_a == status_b == 200
+    assert a["seal"]["seal_id"] == b["seal"]["seal_id"]
+    assert service.stats["coalesced"] == 1
+    assert service.fake_llm.requests == 1
+
+
+def test_drain_finishes_in_flight_requests_and_rejects_new_ones(service):
+    async def run():
+        server = OddServer(service, port=0)
+        await server.start()
+        in_flight = asyncio.ensure_future(_post(server.port, "/generate", {"requirement": "创建一个用户登录API"}))
+        await asyncio.sleep(LATENCY_MS / 1000 / 3)
+        assert service.active == 1
+        drained = asyncio.ensure_future(server.drain(5))
+        await asyncio.sleep(0)
+        status, _ = await service.dispatch("GET", "/health", b"")
+        with pytest.raises(HttpError) as error:
+            await service.dispatch("POST", "/contract", b"{\"requirement\": \"x\"}")
+        await drained
+        return status, error.value.status, await in_flight
+
+    health_status, rejected_status, (status, _, result) = asyncio.run(run())
+    assert health_status == 503 and rejected_status == 503
+    assert status == 200 and result["seal"]["seal_id"]
+
+
+@pytest.mark.parametrize("headers", [
+    "Transfer-Encoding: chunked\r\n",
+    f"Content-Length: {MAX_BODY_BYTES + 1}\r\n",
+])
+def test_rejected_unread_body_closes_keep_alive_connection(service, headers):
+    async def run():
+        server = OddServer(service, port=0)
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            # 请求体看起来像另一个请求：连接保持时它会被当作下一个请求解析
+            writer.write(f"POST /verify HTTP/1.1\r\nHost: test\r\n{headers}\r\n".encode('latin-1')
+                         + b"GET /health HTTP/1.1\r\n\r\n")
+            await writer.drain()
+            status, response_headers, _ = await _read_response(reader)
+            rest = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return status, response_headers, rest
+        finally:
+            await server.drain(5)
+
+    status, response_headers, rest = asyncio.run(run())
+    assert status in (400, 413)
+    assert response_headers["connection"] == "close"
+    assert rest == b""